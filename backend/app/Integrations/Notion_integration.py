@@ -1,42 +1,110 @@
 import os
-from fastapi import APIRouter, HTTPException
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from fastapi import APIRouter, HTTPException, Request, Response
 from .db import engine
-from .models import platform_accounts, projects
-from sqlalchemy import select, insert
+from .models import truncate_content, FULL_CONTENT_KEY
+from .project_sync import load_stored_projects, save_projects, set_missing_upstream
+from .accounts import get_student_id_from_token, token_digest
+from .http_cache import cached_call
+from .project_queries import dumps
+from .response_cache import NOTION_SCOPE, cached_response, invalidate_student
+from .http_client import notion_http_client
+from .notion_content import get_page_tree, render_markdown
 from notion_client import Client
 
-# Load token from .env
-NOTION_TOKEN = os.getenv("NOTION_API_KEY")
-print("NOTION TOKEN LOADED:", NOTION_TOKEN)
-print("ENV NOTION TOKEN RAW:", repr(os.getenv("NOTION_API_KEY")))
-# New Notion SDK format for ntn_ tokens
-notion = Client(auth=os.environ["NOTION_TOKEN"])
+# Integration token (ntn_...); without it the Notion routes answer 503 instead of the app failing to start
+NOTION_TOKEN = os.getenv("NOTION_TOKEN")
+# Overridable so the benchmarks (and local stand-ins) can point the integration elsewhere
+NOTION_BASE_URL = os.getenv("NOTION_BASE_URL", "https://api.notion.com").rstrip("/")
+
+# Notion has no conditional requests, so reads are cached for a fixed time instead
+NOTION_CACHE_TTL = float(os.getenv("NOTION_CACHE_TTL", "60"))
+
+_notion: Optional[Client] = None
+_notion_lock = threading.Lock()
+
+
+def notion_token() -> str:
+    """The integration token; raises 503 when NOTION_TOKEN is not set."""
+    if not NOTION_TOKEN:
+        raise HTTPException(status_code=503, detail="Notion integration is not configured (NOTION_TOKEN is not set).")
+    return NOTION_TOKEN
+
+
+def get_notion() -> Client:
+    """The shared Notion client, built on first use."""
+    global _notion
+    with _notion_lock:
+        if _notion is None:
+            _notion = Client(auth=notion_token(), client=notion_http_client(), base_url=NOTION_BASE_URL)
+        return _notion
+
+
+def notion_cache_scope() -> str:
+    """Cache entries are scoped to the integration token they were read with."""
+    return token_digest(notion_token())
 
 router = APIRouter()
 
 
-# --------------------------
-# Helper: Find student by token
-# --------------------------
-def get_student_id_from_token(access_token: str) -> int:
-    stmt = select(platform_accounts.c.student_id).where(
-        platform_accounts.c.access_token == access_token
+def search_pages(start_cursor: Optional[str] = None):
+    """One page (up to 100 results) of notion.search over pages, served from the HTTP cache when fresh."""
+    kwargs = {"query": "", "filter": {"value": "page", "property": "object"}, "page_size": 100}
+    if start_cursor:
+        kwargs["start_cursor"] = start_cursor
+    return cached_call(
+        "notion.search", (notion_cache_scope(), "page", start_cursor), NOTION_CACHE_TTL,
+        lambda: get_notion().search(**kwargs),
     )
-    with engine.connect() as conn:
-        student_id = conn.execute(stmt).scalar_one_or_none()
-        if student_id is None:
-            raise HTTPException(
-                status_code=404,
-                detail="Student not found for this access token."
-            )
-        return student_id
+
+
+def iter_search_pages() -> Iterator[List[Dict[str, Any]]]:
+    """Yields every page shared with the integration, 100 at a time, following next_cursor."""
+    cursor = None
+    while True:
+        response = search_pages(cursor)
+        yield response.get("results", [])
+        if not response.get("has_more"):
+            return
+        cursor = response.get("next_cursor")
+
+
+def page_title(item: Dict[str, Any]) -> str:
+    """
+    The page's title as plain text. Notion returns it as a property of type "title"
+    holding a rich-text array: named "title" for standalone pages, and whatever the
+    database calls its title column (e.g. "Name") for database rows.
+    """
+    properties = item.get("properties") or {}
+    title_prop = properties.get("title")
+    if not isinstance(title_prop, dict) or title_prop.get("type") != "title":
+        title_prop = next(
+            (prop for prop in properties.values() if isinstance(prop, dict) and prop.get("type") == "title"), {}
+        )
+    title = "".join(part.get("plain_text", "") for part in title_prop.get("title") or [])
+    return title or "Untitled Page"
+
+
+def retrieve_page(page_id: str):
+    """notion.pages.retrieve, served from the HTTP cache when fresh."""
+    return cached_call(
+        "notion.pages.retrieve", (notion_cache_scope(), page_id), NOTION_CACHE_TTL,
+        lambda: get_notion().pages.retrieve(page_id),
+    )
+
+
+def page_markdown(page_id: str, last_edited_time: str) -> str:
+    """The page's full block tree rendered to markdown; only re-walked when the page was edited."""
+    return render_markdown(get_page_tree(get_notion(), notion_cache_scope(), page_id, last_edited_time))
+
 
 #Test whether notion even works
 @router.get("/notion/test")
 def notion_test():
     try:
         # Just do a simple search for any page
-        response = notion.search(page_size=1)
+        response = get_notion().search(page_size=1)
         results = response.get("results", [])
         
         if results:
@@ -58,41 +126,41 @@ def notion_test():
 # --------------------------
 # 1. LIST ALL PAGES (works with teamspaces)
 # --------------------------
-@router.get("/notion/pages")
-def list_notion_pages():
+def _notion_pages_response() -> Response:
     try:
-        results = notion.search(query="", filter={"value": "page", "property": "object"})
-
         pages = []
-        for item in results["results"]:
-            title_prop = item["properties"].get("title", [])
-            title = ""
-
-            if title_prop:
-                text_list = title_prop[0].get("title", [])
-                if text_list:
-                    title = text_list[0].get("plain_text", "")
+        for results in iter_search_pages():
+            for item in results:
+                pages.append({
+                    "id": item["id"],
+                    "title": page_title(item)
+                })
 
-            pages.append({
-                "id": item["id"],
-                "title": title or "Untitled Page"
-            })
-
-        return pages
+        return Response(content=dumps(pages), media_type="application/json")
 
     except Exception as e:
         print("NOTION ERROR:", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/notion/pages")
+def list_notion_pages(request: Request):
+    """Id and title of every shared page; cached for NOTION_CACHE_TTL seconds, with ETag/304 support."""
+    notion_token()
+    return cached_response(request, NOTION_SCOPE, _notion_pages_response, ttl=NOTION_CACHE_TTL)
+
+
 # --------------------------
 # 2. GET PAGE CONTENT (blocks)
 # --------------------------
 @router.get("/notion/page/{page_id}")
 def get_page_content(page_id: str):
+    """All blocks of the page, nested children included, plus the page rendered as markdown."""
+    notion_token()
     try:
-        blocks = notion.blocks.children.list(page_id)
-        return blocks
+        page = retrieve_page(page_id)
+        blocks = get_page_tree(get_notion(), notion_cache_scope(), page_id, page["last_edited_time"])
+        return {"object": "list", "results": blocks, "markdown": render_markdown(blocks)}
     except Exception as e:
         print("NOTION ERROR:", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -101,42 +169,93 @@ def get_page_content(page_id: str):
 # --------------------------
 # 3. IMPORT ALL PAGES INTO PROJECTS TABLE
 # --------------------------
-@router.get("/notion/load_pages")
-def load_notion_pages(access_token: str):
-    student_id = get_student_id_from_token(access_token)
+def build_page_row(student_id: int, item: Dict[str, Any], markdown: str) -> Dict[str, Any]:
+    """Maps a Notion page (with its content rendered to markdown) onto a projects row."""
+    return {
+        "student_id": student_id,
+        "title": page_title(item),
+        "content": truncate_content(markdown) or f"Imported Notion Page ID: {item['id']}",
+        "skills": {"source": "Notion"},
+        "context": "Notes",
+        "type": "Documentation",
+        "source_platform": "Notion",
+        "external_id": item["id"],
+        "source_updated_at": item["last_edited_time"],
+        "missing_upstream": False,
+        FULL_CONTENT_KEY: markdown,
+    }
 
-    try:
-        results = notion.search(query="", filter={"value": "page", "property": "object"})
-        pages = results["results"]
 
-        with engine.connect() as conn:
-            for item in pages:
-                # Extract page title
-                title_prop = item["properties"].get("title", [])
-                title = ""
+def plan_notion_page(items: List[Dict[str, Any]], stored):
+    """Splits a page of search results into pages edited since the last import and the ids of unchanged ones that reappeared."""
+    changed = [
+        item for item in items
+        if item["id"] not in stored or stored[item["id"]][0] != item["last_edited_time"]
+    ]
+    changed_ids = {item["id"] for item in changed}
+    reappeared = [
+        item["id"] for item in items
+        if item["id"] in stored and stored[item["id"]][1] and item["id"] not in changed_ids
+    ]
+    return changed, reappeared
+
+
+def save_notion_rows(conn, student_id: int, rows: List[Dict[str, Any]], reappeared: List[str]) -> None:
+    save_projects(
+        conn, rows,
+        update_columns=("title", "content", "skills", "context", "type", "source_updated_at", "missing_upstream"),
+    )
+    set_missing_upstream(conn, student_id, "Notion", reappeared, missing=False)
 
-                if title_prop:
-                    text_list = title_prop[0].get("title", [])
-                    if text_list:
-                        title = text_list[0].get("plain_text", "")
 
-                title = title or "Untitled Page"
+def finish_notion_sync(conn, student_id: int, stored, seen) -> None:
+    """After a complete listing: flags pages that are no longer shared."""
+    disappeared = [page_id for page_id, (_, missing) in stored.items() if page_id not in seen and not missing]
+    set_missing_upstream(conn, student_id, "Notion", disappeared, missing=True)
 
-                record = {
-                    "student_id": student_id,
-                    "title": title,
-                    "content": f"Imported Notion Page ID: {item['id']}",
-                    "skills": {"source": "Notion"},
-                    "context": "Notes",
-                    "type": "Documentation",
-                    "source_platform": "Notion"
-                }
 
-                conn.execute(insert(projects).values(**record))
+def import_notion_pages(student_id: int, progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Imports the Notion pages shared with the integration as projects of the student.
 
-            conn.commit()
+    Pages are upserted on their Notion page id, so reruns never duplicate rows, and
+    only pages whose last_edited_time moved are re-fetched and rewritten. Pages that
+    are no longer shared are flagged with missing_upstream.
+    Returns the number of pages processed.
+    """
+    with engine.connect() as conn:
+        stored = load_stored_projects(conn, student_id, "Notion")
+    seen = set()
 
-        return {"message": f"Imported {len(pages)} Notion pages."}
+    processed = 0
+    for items in iter_search_pages():
+        seen.update(item["id"] for item in items)
+        changed, reappeared = plan_notion_page(items, stored)
+        rows = [build_page_row(student_id, item, page_markdown(item["id"], item["last_edited_time"])) for item in changed]
+
+        with engine.begin() as conn:
+            save_notion_rows(conn, student_id, rows, reappeared)
+        invalidate_student(student_id)
+
+        processed += len(items)
+        if progress is not None:
+            progress(processed)
+
+    with engine.begin() as conn:
+        finish_notion_sync(conn, student_id, stored, seen)
+    invalidate_student(student_id)
+
+    return processed
+
+
+@router.get("/notion/load_pages")
+def load_notion_pages(access_token: str):
+    student_id = get_student_id_from_token(access_token)
+    notion_token()
+
+    try:
+        imported = import_notion_pages(student_id)
+        return {"message": f"Imported {imported} Notion pages."}
 
     except Exception as e:
         print("NOTION ERROR:", e)
@@ -0,0 +1,84 @@
+import hashlib
+import os
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from .db import engine, get_async_engine
+from .models import platform_accounts
+from .ttl_cache import TTLCache
+
+# Resolved token -> student lookups are cached per process. Tokens are only ever
+# rotated through github_callback, which invalidates the old entry, so the TTL
+# just bounds how long a token revoked elsewhere keeps resolving.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+_student_by_digest: TTLCache[int] = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+
+def token_digest(access_token: str) -> str:
+    """Fixed-length (64 hex chars) SHA-256 digest used to index and cache access tokens."""
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+def invalidate_token(access_token: str) -> None:
+    """Forgets the cached student for a token, e.g. after it has been rotated."""
+    _student_by_digest.pop(token_digest(access_token))
+
+
+def _lookup_student_id(conn, access_token: str, digest: str):
+    student_id = conn.execute(
+        select(platform_accounts.c.student_id).where(platform_accounts.c.token_digest == digest)
+    ).scalar_one_or_none()
+    if student_id is not None:
+        return student_id
+
+    # Rows linked before token_digest existed: match on the raw token once and backfill
+    legacy = conn.execute(
+        select(platform_accounts.c.id, platform_accounts.c.student_id).where(
+            (platform_accounts.c.access_token == access_token) & (platform_accounts.c.token_digest.is_(None))
+        )
+    ).first()
+    if legacy is None:
+        return None
+    conn.execute(
+        update(platform_accounts).where(platform_accounts.c.id == legacy.id).values(token_digest=digest)
+    )
+    conn.commit()
+    return legacy.student_id
+
+
+def get_student_id_from_token(access_token: str) -> int:
+    """
+    Retrieves the student_id associated with the given access token.
+    Served from the in-process cache when possible, otherwise via the indexed token digest.
+    """
+    digest = token_digest(access_token)
+    student_id = _student_by_digest.get(digest)
+    if student_id is not None:
+        return student_id
+
+    with engine.connect() as conn:
+        student_id = _lookup_student_id(conn, access_token, digest)
+
+    if student_id is None:
+        raise HTTPException(status_code=404, detail="Student not found for this access token. Please link your account first.")
+
+    _student_by_digest.set(digest, student_id)
+    return student_id
+
+
+async def get_student_id_from_token_async(access_token: str) -> int:
+    """get_student_id_from_token for the async routes; shares the same cache."""
+    digest = token_digest(access_token)
+    student_id = _student_by_digest.get(digest)
+    if student_id is not None:
+        return student_id
+
+    async with get_async_engine().connect() as conn:
+        student_id = await conn.run_sync(_lookup_student_id, access_token, digest)
+
+    if student_id is None:
+        raise HTTPException(status_code=404, detail="Student not found for this access token. Please link your account first.")
+
+    _student_by_digest.set(digest, student_id)
+    return student_id
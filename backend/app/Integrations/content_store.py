@@ -0,0 +1,163 @@
+import hashlib
+import zlib
+from typing import Dict, Iterable, Optional, Set
+from fastapi import APIRouter, HTTPException, Request, Response
+from sqlalchemy import delete, exists, select
+from .accounts import get_student_id_from_token
+from .db import read_engine, utcnow
+from .models import content_blobs, project_contents, projects
+from .response_cache import CACHE_CONTROL, etag_matches
+from .search import index_project_bodies
+from .upsert import upsert_rows
+
+router = APIRouter()
+
+# -------------------------------------------------
+# Full project bodies (READMEs, Notion markdown), stored compressed outside the
+# projects table so list queries never read them. Blobs are content-addressed:
+# identical bodies (forks, unchanged pages) are stored once, and a project whose
+# body hash did not change costs no write at all.
+# -------------------------------------------------
+
+CONTENT_ENCODING = "zlib"
+ZLIB_LEVEL = 6
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), ZLIB_LEVEL)
+
+
+def decompress(body: bytes, encoding: str) -> str:
+    if encoding != CONTENT_ENCODING:
+        raise ValueError(f"Unknown content encoding: {encoding}")
+    return zlib.decompress(body).decode("utf-8")
+
+
+def save_project_contents(conn, bodies: Dict[int, str]) -> int:
+    """
+    Stores the full body of each project ({project_id: text}). Projects whose stored
+    hash already matches are skipped, blobs that already exist are reused, and blobs
+    no project points to anymore are deleted. Returns the number of projects updated.
+    """
+    if not bodies:
+        return 0
+
+    hashes = {project_id: content_hash(text) for project_id, text in bodies.items()}
+    current = {
+        row.project_id: row.content_hash
+        for row in conn.execute(
+            select(project_contents.c.project_id, project_contents.c.content_hash)
+            .where(project_contents.c.project_id.in_(list(hashes)))
+        )
+    }
+    changed = {project_id: digest for project_id, digest in hashes.items() if current.get(project_id) != digest}
+    if not changed:
+        return 0
+
+    new_hashes = set(changed.values())
+    stored = set(conn.execute(select(content_blobs.c.content_hash).where(content_blobs.c.content_hash.in_(new_hashes))).scalars())
+    blobs, seen = [], set()
+    for project_id, digest in changed.items():
+        if digest in stored or digest in seen:
+            continue
+        seen.add(digest)
+        text = bodies[project_id]
+        blobs.append({
+            "content_hash": digest,
+            "encoding": CONTENT_ENCODING,
+            "body": compress(text),
+            "size": len(text.encode("utf-8")),
+        })
+    # An upsert rather than an insert, in case a concurrent import stored the same body first
+    upsert_rows(conn, content_blobs, blobs, key_columns=("content_hash",), update_columns=("encoding",))
+
+    now = utcnow()
+    upsert_rows(
+        conn, project_contents,
+        [{"project_id": project_id, "content_hash": digest, "updated_at": now} for project_id, digest in changed.items()],
+        key_columns=("project_id",), update_columns=("content_hash", "updated_at"),
+    )
+
+    # Before unused blobs are deleted: the index needs the old text to drop it
+    index_project_bodies(
+        conn,
+        {project_id: current[project_id] for project_id in changed if project_id in current},
+        {project_id: bodies[project_id] for project_id in changed},
+    )
+
+    _release_blobs(conn, {current[project_id] for project_id in changed if project_id in current} - new_hashes)
+    return len(changed)
+
+
+def delete_project_contents(conn, project_ids: Iterable[int]) -> int:
+    """
+    Removes the stored body of each project (e.g. its README was deleted upstream)
+    and its search index entry. Blobs no project points to anymore are deleted.
+    Returns the number of projects that had a body.
+    """
+    project_ids = list(project_ids)
+    if not project_ids:
+        return 0
+    current = dict(conn.execute(
+        select(project_contents.c.project_id, project_contents.c.content_hash)
+        .where(project_contents.c.project_id.in_(project_ids))
+    ).all())
+    if not current:
+        return 0
+    index_project_bodies(conn, current, {})
+    conn.execute(delete(project_contents).where(project_contents.c.project_id.in_(list(current))))
+    _release_blobs(conn, set(current.values()))
+    return len(current)
+
+
+def _release_blobs(conn, hashes: Set[str]) -> None:
+    if hashes:
+        still_used = exists().where(project_contents.c.content_hash == content_blobs.c.content_hash)
+        conn.execute(delete(content_blobs).where(content_blobs.c.content_hash.in_(hashes) & ~still_used))
+
+
+def load_project_content(conn, project_id: int) -> Optional[str]:
+    """The project's full body, or None when only the projects.content preview exists."""
+    row = conn.execute(
+        select(content_blobs.c.encoding, content_blobs.c.body)
+        .join(project_contents, project_contents.c.content_hash == content_blobs.c.content_hash)
+        .where(project_contents.c.project_id == project_id)
+    ).first()
+    return None if row is None else decompress(row.body, row.encoding)
+
+
+@router.get("/projects/{project_id}/content")
+def get_project_content(request: Request, project_id: int, access_token: str):
+    """
+    Full README / page body of one of the student's projects, as markdown.
+    Projects imported before full bodies were kept return their 2000-character preview.
+    The ETag is the content hash, so If-None-Match is answered without reading the body.
+    """
+    current_student_id = get_student_id_from_token(access_token)
+
+    with read_engine.connect() as conn:
+        project = conn.execute(
+            select(projects.c.content, project_contents.c.content_hash)
+            .select_from(projects.outerjoin(project_contents, project_contents.c.project_id == projects.c.id))
+            .where((projects.c.id == project_id) & (projects.c.student_id == current_student_id))
+        ).first()
+        if project is None:
+            raise HTTPException(status_code=404, detail="Project not found.")
+
+        digest = project.content_hash or content_hash(project.content or "")
+        etag = f'"{digest}"'
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        text = load_project_content(conn, project_id) if project.content_hash else None
+
+    return Response(
+        content=text if text is not None else (project.content or ""),
+        media_type="text/markdown; charset=utf-8",
+        headers=headers,
+    )
@@ -1,11 +1,136 @@
 import os
+from datetime import datetime, timezone
+from typing import Any, Dict
 from sqlalchemy import create_engine
+from .metrics import instrument_engine
+
+# The one place engines are created. Everything else imports `engine` (writes and
+# reads that must see them) or `read_engine` (read-only endpoints) from here.
 
 # Use environment variable if set, otherwise fallback to a local SQLite database for testing
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./test.db")
+# Optional replica for read-only endpoints; defaults to the primary
+READ_DATABASE_URL = os.environ.get("READ_DATABASE_URL") or None
+
+# SQL_ECHO=1 logs every statement (noisy; for debugging only)
+SQL_ECHO = os.environ.get("SQL_ECHO", "0") == "1"
+
+# Pool settings. Each engine of each worker process holds at most
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so a deployment opens at most
+# workers * engines * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections to MySQL.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+# Recycle before MySQL's wait_timeout (or a proxy's idle timeout) drops the connection
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    if url.startswith("sqlite"):
+        # SQLite connections are local file handles: no pool tuning, but they are shared across threads
+        return {"echo": SQL_ECHO, "connect_args": {"check_same_thread": False}}
+    return {
+        "echo": SQL_ECHO,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+instrument_engine("primary", engine)
 
-# For SQLite, add connect_args
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+if READ_DATABASE_URL:
+    read_engine = create_engine(READ_DATABASE_URL, **_engine_options(READ_DATABASE_URL))
+    instrument_engine("replica", read_engine)
 else:
-    engine = create_engine(DATABASE_URL)
+    read_engine = engine
+
+
+# Async driver equivalents of the sync drivers, for the async integration routes
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+
+def _async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+ASYNC_READ_DATABASE_URL = os.environ.get("ASYNC_READ_DATABASE_URL") or (
+    _async_url(READ_DATABASE_URL) if READ_DATABASE_URL else None
+)
+
+_async_engine = None
+_async_read_engine = None
+
+
+def _create_async_engine(url: str, name: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    options = _engine_options(url)
+    options.pop("connect_args", None)
+    async_engine = create_async_engine(url, **options)
+    instrument_engine(name, async_engine.sync_engine)
+    return async_engine
+
+
+def get_async_engine():
+    """
+    The async engine (sqlalchemy.ext.asyncio.AsyncEngine), created on first use so
+    the sync-only setup never needs greenlet or an async driver.
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = _create_async_engine(ASYNC_DATABASE_URL, "async")
+    return _async_engine
+
+
+def get_async_read_engine():
+    """The async engine for read-only endpoints: the replica when configured, else get_async_engine()."""
+    global _async_read_engine
+    if not ASYNC_READ_DATABASE_URL:
+        return get_async_engine()
+    if _async_read_engine is None:
+        _async_read_engine = _create_async_engine(ASYNC_READ_DATABASE_URL, "async_replica")
+    return _async_read_engine
+
+
+def init_db(bind=None) -> None:
+    """
+    Creates missing tables, upgrades existing ones to the current models (see
+    migrations.py) and builds derived indexes (full-text index, skills backfill).
+    Run once per process at startup (see the lifespan in main.py), never at import time.
+    """
+    from .models import metadata
+    from .migrations import upgrade_schema
+    from .search import ensure_search_index
+    from .skills import ensure_skill_index
+
+    bind = bind if bind is not None else engine
+    metadata.create_all(bind=bind)
+    upgrade_schema(bind)
+    ensure_search_index(bind)
+    ensure_skill_index(bind)
+
+
+async def dispose_engines() -> None:
+    """Closes every pooled connection (on shutdown)."""
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+    for async_engine in (_async_engine, _async_read_engine):
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, which is how DateTime columns are stored (SQLite drops the timezone)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
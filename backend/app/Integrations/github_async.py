@@ -0,0 +1,205 @@
+import asyncio
+import httpx
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional
+from . import github_integration as gh
+from . import http_client
+from .db import get_async_engine, get_async_read_engine, utcnow
+from .accounts import get_student_id_from_token_async, invalidate_token
+from .http_cache import cached_get_async
+from .github_graphql import aiter_graphql_repo_pages
+from .response_cache import cached_response_async, invalidate_student_async, student_scope
+from .project_queries import dumps, ndjson_lines, next_cursor_headers, parse_fields, projects_page_stmt, validate_list_params
+
+# Async versions of the GitHub routes (enabled with INTEGRATIONS_ASYNC=1). Upstream
+# calls use the shared httpx AsyncClient and the database is reached through the
+# async engine; the row building, change detection and upsert logic is shared
+# with github_integration through AsyncConnection.run_sync.
+router = APIRouter()
+
+# Same paths and behavior as the sync router
+router.add_api_route("/github/login", gh.github_login, methods=["GET"])
+
+
+async def get_repo_readme(access_token: str, owner: str, repo_name: str) -> Any:
+    """Async get_repo_readme: the README's raw content, None if missing, or gh.README_UNAVAILABLE if the request fails."""
+    try:
+        res = await cached_get_async(
+            f"{gh.API_URL}/repos/{owner}/{repo_name}/readme",
+            access_token,
+            headers={"Accept": "application/vnd.github.v3.raw"},
+            timeout=httpx.Timeout(gh.README_FETCH_TIMEOUT, connect=http_client.HTTP_CONNECT_TIMEOUT),
+        )
+    except (httpx.HTTPError, HTTPException) as e:
+        print(f"Error fetching README for {owner}/{repo_name}: {e}")
+        return gh.README_UNAVAILABLE
+
+    if res.status_code == 200:
+        return res.text
+    if res.status_code == 404:
+        return None
+    print(f"Error fetching README for {owner}/{repo_name}: Status {res.status_code}, {res.text}")
+    return gh.README_UNAVAILABLE
+
+
+async def fetch_readmes(access_token: str, repos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fetches READMEs concurrently, at most GITHUB_README_CONCURRENCY at a time."""
+    semaphore = asyncio.Semaphore(gh.README_FETCH_CONCURRENCY)
+
+    async def fetch(repo: Dict[str, Any]) -> Any:
+        async with semaphore:
+            return await get_repo_readme(access_token, repo["owner"]["login"], repo["name"])
+
+    contents = await asyncio.gather(*(fetch(repo) for repo in repos))
+    return {f'{repo["owner"]["login"]}/{repo["name"]}': content for repo, content in zip(repos, contents)}
+
+
+async def aiter_repo_pages(access_token: str) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Async iter_repo_pages: one page of /user/repos at a time, following Link: rel="next"."""
+    url = f"{gh.API_URL}/user/repos"
+    params: Optional[Dict[str, Any]] = {"per_page": gh.REPOS_PER_PAGE}
+
+    while url:
+        res = await cached_get_async(
+            url, access_token, params=params,
+            timeout=httpx.Timeout(gh.REPOS_PAGE_TIMEOUT, connect=http_client.HTTP_CONNECT_TIMEOUT),
+        )
+        if res.status_code != 200:
+            raise HTTPException(status_code=res.status_code, detail=f"Failed to fetch repositories: {res.text}")
+
+        yield res.json()
+
+        url = res.links.get("next", {}).get("url")
+        params = None
+
+
+async def import_github_repos(student_id: int, access_token: str, mode: Optional[str] = None) -> int:
+    """Async import_github_repos: same paging, incremental sync and upserts."""
+    mode = (mode or gh.GITHUB_INGEST_MODE).lower()
+    if mode not in gh.GITHUB_INGEST_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown GitHub ingest mode: {mode}")
+
+    pages = aiter_graphql_repo_pages(access_token) if mode == "graphql" else aiter_repo_pages(access_token)
+    engine = get_async_engine()
+
+    sync_started_at = utcnow()
+    async with engine.connect() as conn:
+        watermark, stored = await conn.run_sync(gh.read_sync_state, student_id, access_token)
+    seen = set()
+
+    processed = 0
+    async for repos in pages:
+        seen.update(str(repo["id"]) for repo in repos)
+        changed, reappeared = gh.plan_repo_page(repos, stored, watermark)
+
+        if mode == "graphql":
+            readmes = {f'{repo["owner"]["login"]}/{repo["name"]}': repo["readme"] for repo in changed}
+        else:
+            readmes = await fetch_readmes(access_token, changed)
+        rows = [
+            gh.build_repo_row(student_id, repo, readmes.get(f'{repo["owner"]["login"]}/{repo["name"]}'))
+            for repo in changed
+        ]
+
+        async with engine.begin() as conn:
+            await conn.run_sync(gh.save_repo_page, student_id, rows, reappeared)
+        await invalidate_student_async(student_id)
+
+        processed += len(repos)
+        print(f"GitHub import for student {student_id}: {processed} repositories processed")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(gh.finish_sync, student_id, access_token, stored, seen, sync_started_at)
+    await invalidate_student_async(student_id)
+
+    return processed
+
+
+@router.get("/github/callback")
+async def github_callback(code: str):
+    # OAuth codes are single use, so the exchange is never retried
+    token_res = await http_client.apost(
+        f"{gh.GITHUB_BASE_URL}/login/oauth/access_token",
+        headers={"Accept": "application/json"},
+        data={
+            "client_id": gh.GITHUB_CLIENT_ID,
+            "client_secret": gh.GITHUB_CLIENT_SECRET,
+            "code": code,
+        },
+        retries=0,
+    )
+
+    token_json = token_res.json()
+    if "access_token" not in token_json:
+        error_detail = token_json.get("error_description", "GitHub token exchange failed.")
+        raise HTTPException(status_code=400, detail=error_detail)
+
+    access_token = token_json["access_token"]
+    user_res = await cached_get_async(f"{gh.API_URL}/user", access_token)
+    if user_res.status_code != 200:
+        raise HTTPException(status_code=user_res.status_code, detail="Failed to fetch GitHub user data.")
+
+    async with get_async_engine().begin() as conn:
+        old_access_token = await conn.run_sync(gh.link_github_account, user_res.json(), access_token)
+
+    if old_access_token and old_access_token != access_token:
+        invalidate_token(old_access_token)
+
+    return {"message": "GitHub account linked!", "access_token": access_token}
+
+
+@router.get("/github/repos")
+async def list_repos(access_token: str, mode: Optional[str] = None):
+    """List repositories and store them in projects table"""
+    current_student_id = await get_student_id_from_token_async(access_token)
+    saved = await import_github_repos(current_student_id, access_token, mode=mode)
+    return {"message": f"{saved} repositories has been saved to database"}
+
+
+async def _stream_projects(stmt) -> AsyncIterator[bytes]:
+    async with get_async_read_engine().connect() as conn:
+        result = await conn.stream(stmt)
+        async for partition in result.partitions(gh.PROJECTS_STREAM_BATCH):
+            for line in ndjson_lines(partition):
+                yield line
+
+
+async def _projects_page_response(stmt, student_id: int, limit: Optional[int]) -> Response:
+    try:
+        async with get_async_read_engine().connect() as conn:
+            result = await conn.execute(stmt)
+            projects_list = [dict(row._mapping) for row in result]
+    except Exception as e:
+        print(f"Error fetching projects for student {student_id}: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while fetching projects from the database.")
+
+    return Response(
+        content=dumps(projects_list),
+        media_type="application/json",
+        headers=next_cursor_headers(projects_list, limit),
+    )
+
+
+@router.get("/github/projects", response_model=List[Dict[str, Any]])
+async def get_all_projects(
+    request: Request,
+    access_token: str,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    format: str = "json",
+):
+    """Retrieves stored projects for the student; same paging, projection and NDJSON options as the sync route."""
+    validate_list_params(format, limit)
+    field_names = parse_fields(fields)
+    current_student_id = await get_student_id_from_token_async(access_token)
+    stmt = projects_page_stmt(current_student_id, field_names, after, limit)
+
+    if format == "ndjson":
+        return StreamingResponse(_stream_projects(stmt), media_type="application/x-ndjson")
+
+    return await cached_response_async(
+        request, student_scope(current_student_id),
+        lambda: _projects_page_response(stmt, current_student_id, limit),
+    )
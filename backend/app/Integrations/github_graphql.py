@@ -0,0 +1,138 @@
+import os
+import httpx
+from . import http_client
+from fastapi import HTTPException
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+GRAPHQL_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/") + "/graphql"
+GRAPHQL_PAGE_TIMEOUT = float(os.getenv("GITHUB_GRAPHQL_TIMEOUT", "60"))
+
+# 100 is the largest page GitHub's GraphQL API allows for a connection
+GRAPHQL_REPOS_PER_PAGE = 100
+GRAPHQL_LANGUAGES_PER_REPO = 25
+
+# GraphQL has no equivalent of REST's /readme lookup, so the usual file names
+# are requested as aliased blobs and the first one that exists wins
+README_EXPRESSIONS = {
+    "readmeMd": "HEAD:README.md",
+    "readmeLowerMd": "HEAD:readme.md",
+    "readmeRst": "HEAD:README.rst",
+    "readmePlain": "HEAD:README",
+}
+
+_README_FIELDS = "\n".join(
+    f'        {alias}: object(expression: "{expression}") {{ ... on Blob {{ text }} }}'
+    for alias, expression in README_EXPRESSIONS.items()
+)
+
+# Mirrors the default affiliations of REST's GET /user/repos
+REPOS_QUERY = f"""
+query($cursor: String) {{
+  viewer {{
+    repositories(first: {GRAPHQL_REPOS_PER_PAGE}, after: $cursor, ownerAffiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER]) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+        databaseId
+        name
+        description
+        pushedAt
+        updatedAt
+        owner {{ login }}
+        primaryLanguage {{ name }}
+        languages(first: {GRAPHQL_LANGUAGES_PER_REPO}, orderBy: {{field: SIZE, direction: DESC}}) {{
+          edges {{ size node {{ name }} }}
+        }}
+{_README_FIELDS}
+      }}
+    }}
+  }}
+}}
+"""
+
+
+def _normalize_repo(node: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reshapes a GraphQL repository node into the REST /user/repos shape used by the
+    importer, plus the README text and the language breakdown (bytes per language).
+    """
+    readme: Optional[str] = None
+    for alias in README_EXPRESSIONS:
+        blob = node.get(alias) or {}
+        if blob.get("text"):
+            readme = blob["text"]
+            break
+
+    languages = {
+        edge["node"]["name"]: edge["size"]
+        for edge in (node.get("languages") or {}).get("edges", [])
+    }
+
+    return {
+        "id": node.get("databaseId"),
+        "name": node["name"],
+        "description": node.get("description"),
+        "owner": {"login": node["owner"]["login"]},
+        "language": (node.get("primaryLanguage") or {}).get("name"),
+        "pushed_at": node.get("pushedAt"),
+        "updated_at": node.get("updatedAt"),
+        "readme": readme,
+        "languages": languages,
+    }
+
+
+def _parse_page(res):
+    """The normalized repositories of one GraphQL response and the cursor of the next page (None on the last)."""
+    if res.status_code != 200:
+        raise HTTPException(status_code=res.status_code, detail=f"Failed to fetch repositories: {res.text}")
+
+    payload = res.json()
+    data = payload.get("data") or {}
+    if payload.get("errors"):
+        # Partial errors (e.g. an unreadable blob) still come with usable data
+        print(f"GitHub GraphQL errors: {payload['errors']}")
+        if not data.get("viewer"):
+            raise HTTPException(status_code=502, detail="GitHub GraphQL query failed.")
+
+    connection = data["viewer"]["repositories"]
+    repos = [_normalize_repo(node) for node in connection["nodes"] if node]
+    page_info = connection["pageInfo"]
+    return repos, page_info["endCursor"] if page_info["hasNextPage"] else None
+
+
+def iter_graphql_repo_pages(access_token: str) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields the viewer's repositories 100 at a time, README text and languages
+    included, so a whole import costs one API call per 100 repositories.
+    """
+    cursor: Optional[str] = None
+
+    while True:
+        res = http_client.post(
+            GRAPHQL_URL,
+            token=access_token,
+            headers={"Authorization": f"Bearer {access_token}"},
+            json={"query": REPOS_QUERY, "variables": {"cursor": cursor}},
+            timeout=(http_client.HTTP_CONNECT_TIMEOUT, GRAPHQL_PAGE_TIMEOUT),
+        )
+        repos, cursor = _parse_page(res)
+        yield repos
+        if cursor is None:
+            break
+
+
+async def aiter_graphql_repo_pages(access_token: str) -> AsyncIterator[List[Dict[str, Any]]]:
+    """iter_graphql_repo_pages for the async client."""
+    cursor: Optional[str] = None
+
+    while True:
+        res = await http_client.apost(
+            GRAPHQL_URL,
+            token=access_token,
+            headers={"Authorization": f"Bearer {access_token}"},
+            json={"query": REPOS_QUERY, "variables": {"cursor": cursor}},
+            timeout=httpx.Timeout(GRAPHQL_PAGE_TIMEOUT, connect=http_client.HTTP_CONNECT_TIMEOUT),
+        )
+        repos, cursor = _parse_page(res)
+        yield repos
+        if cursor is None:
+            break
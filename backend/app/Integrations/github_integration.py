@@ -1,34 +1,80 @@
 from ast import stmt
 import os
 import requests
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 from sqlalchemy import select, update, insert
-from .db import engine
-from .models import platform_accounts, projects, students
+from .db import engine, read_engine, utcnow
+from .models import platform_accounts, projects, students, truncate_content, FULL_CONTENT_KEY
+from .github_graphql import iter_graphql_repo_pages
+from .project_sync import load_stored_projects, save_projects, set_missing_upstream
+from .accounts import get_student_id_from_token, invalidate_token, token_digest
+from .http_cache import cached_get
+from .response_cache import cached_response, invalidate_student, student_scope
+from . import http_client
+from .project_queries import dumps, ndjson_lines, next_cursor_headers, parse_fields, projects_page_stmt, validate_list_params
 import base64 # this is for reading the read me files
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Dict, Any, Optional
 router = APIRouter()
 
 # env variables
 GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID")
 GITHUB_CLIENT_SECRET = os.getenv("GITHUB_CLIENT_SECRET")
 
+# README fetching is I/O bound, so it runs on a small thread pool. GitHub's secondary
+# rate limits start pushing back at roughly 100 concurrent requests per token, so the
+# default stays well below that.
+README_FETCH_CONCURRENCY = int(os.getenv("GITHUB_README_CONCURRENCY", "8"))
+README_FETCH_TIMEOUT = float(os.getenv("GITHUB_README_TIMEOUT", "10"))
+
+# /user/repos is paginated; 100 is the largest page size GitHub allows
+REPOS_PER_PAGE = 100
+REPOS_PAGE_TIMEOUT = float(os.getenv("GITHUB_REPOS_PAGE_TIMEOUT", "30"))
+
+# "rest" lists repos over REST and fetches each README separately; "graphql" pulls
+# repos, READMEs and language breakdowns in one query per 100 repositories
+GITHUB_INGEST_MODES = ("rest", "graphql")
+GITHUB_INGEST_MODE = os.getenv("GITHUB_INGEST_MODE", "rest").lower()
+
+# Rows fetched from the DB cursor at a time when streaming /github/projects as NDJSON
+PROJECTS_STREAM_BATCH = 500
+
+# Called with the running count of imported items after each committed page
+ProgressCallback = Callable[[int], None]
+
 GITHUB_BASE_URL = "https://github.com"
-API_URL = "https://api.github.com"
+# Overridable so the benchmarks (and local stand-ins) can point the integration elsewhere
+API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+# What get_repo_readme() returns when the README could not be fetched (timeout, 5xx,
+# retries exhausted), as opposed to None for a repository that has none. Rows built
+# from it keep their stored content and change stamp, so the next sync tries again.
+README_UNAVAILABLE = object()
+# Marks such rows between build_repo_row() and save_repo_rows()
+README_UNAVAILABLE_KEY = "readme_unavailable"
 
-def get_repo_readme(access_token: str, owner: str, repo_name: str) -> str:
+
+def get_repo_readme(access_token: str, owner: str, repo_name: str, timeout: float = README_FETCH_TIMEOUT) -> Any:
     """
     Fetches the content of the README.md file for a given repository.
-    Returns the decoded content as a string, or a fallback message if not found.
+    Returns the decoded content as a string, None if the repository has no README,
+    or README_UNAVAILABLE if the request failed.
     """
     readme_url = f"{API_URL}/repos/{owner}/{repo_name}/readme"
     
     # Request the README content using the 'raw' Accept header
-    res = requests.get(
-        readme_url,
-        headers={"Authorization": f"Bearer {access_token}", "Accept": "application/vnd.github.v3.raw"}
-    )
+    try:
+        res = cached_get(
+            readme_url,
+            access_token,
+            headers={"Accept": "application/vnd.github.v3.raw"},
+            timeout=(http_client.HTTP_CONNECT_TIMEOUT, timeout),
+        )
+    except (requests.RequestException, HTTPException) as e:
+        print(f"Error fetching README for {owner}/{repo_name}: {e}")
+        return README_UNAVAILABLE
     
     if res.status_code == 200:
         # If the raw header is used, the response text is the file content
@@ -40,18 +86,23 @@ def get_repo_readme(access_token: str, owner: str, repo_name: str) -> str:
     else:
         # Handle other potential errors
         print(f"Error fetching README for {owner}/{repo_name}: Status {res.status_code}, {res.text}")
-        return None
+        return README_UNAVAILABLE
 
-def get_student_id_from_token(access_token: str) -> int:
-    #Retrieves the student_id associated with the given access token
-    stmt= select(platform_accounts.c.student_id).where(
-        platform_accounts.c.access_token == access_token
-    )
-    with engine.connect() as conn:
-        student_id = conn.execute(stmt).scalar_one_or_none()
-        if student_id is None:
-            raise HTTPException(status_code=404, detail="Student not found for this access token. Please link your Github account first")
-        return student_id
+def fetch_readmes(access_token: str, repos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fetches the READMEs of many repositories in parallel.
+    Returns a mapping of repo full name ("owner/name") to get_repo_readme()'s result.
+    """
+    if not repos:
+        return {}
+
+    def fetch(repo: Dict[str, Any]) -> Any:
+        return get_repo_readme(access_token, repo["owner"]["login"], repo["name"])
+
+    workers = max(1, min(README_FETCH_CONCURRENCY, len(repos)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="readme") as pool:
+        contents = pool.map(fetch, repos)
+        return {f'{repo["owner"]["login"]}/{repo["name"]}': content for repo, content in zip(repos, contents)}
 
 @router.get("/github/login")
 def github_login():
@@ -61,11 +112,91 @@ def github_login():
     )
 
 
+def link_github_account(conn, user_data: Dict[str, Any], access_token: str) -> Optional[str]:
+    """
+    Creates or updates the student and platform account for a GitHub user and stores
+    the new access token. Returns the token it replaced, if any. The caller commits.
+    """
+    # Get Unique Id (must be converted to string as per the DB model)
+    github_user_id = str(user_data.get("id"))
+    
+    if not github_user_id:
+        raise HTTPException(status_code=400, detail="Could not retrieve unique GitHub User ID.")
+
+
+    # Extract key data from GitHub response
+    full_name_or_login = user_data.get("name")
+    if full_name_or_login is None:
+        full_name_or_login = user_data.get("login", "")
+        
+    name_parts = full_name_or_login.split()
+
+    first_name = name_parts[0] if name_parts else user_data.get("login")
+    last_name = name_parts[-1] if len(name_parts) > 1 else ""
+    user_email = user_data.get("email", f"user_{github_user_id}@github.com")
+    
+    current_student_id = None
+    
+    # 1. Check if platform account exists
+    stmt = select(platform_accounts.c.student_id).where(
+        platform_accounts.c.platform_user_id == github_user_id
+    )
+    existing_student_id = conn.execute(stmt).scalar_one_or_none()
+    
+    if existing_student_id is None:
+        # 2. New user: Insert into students
+        student_insert_stmt = insert(students).values( # Use standard insert
+            name=first_name,
+            surname=last_name,
+            university="Not Provided (GitHub)",
+            email=user_email
+        )
+        result = conn.execute(student_insert_stmt)
+        # Retrieve the new unique ID (will work on most databases)
+        current_student_id = result.lastrowid
+
+        # 3. New user: Insert into platform_accounts
+        conn.execute(
+            insert(platform_accounts).values( # Use standard insert
+                student_id=current_student_id,
+                platform_name="GitHub",
+                access_token=access_token,
+                token_digest=token_digest(access_token),
+                platform_user_id=github_user_id 
+            )
+        )
+    else:
+        # 2. Existing user: Update student profile
+        current_student_id = existing_student_id
+
+        conn.execute(
+            update(students).where(students.c.id == current_student_id).values(
+                name=first_name,
+                surname=last_name,
+                email=user_email
+            )
+        )
+    
+    # 4. Always update the access token, handing the old one back so its cached lookup can be dropped
+    old_access_token = conn.execute(
+        select(platform_accounts.c.access_token).where(
+            platform_accounts.c.platform_user_id == github_user_id
+        )
+    ).scalar_one_or_none()
+    conn.execute(
+        update(platform_accounts).where(
+            platform_accounts.c.platform_user_id == github_user_id
+        ).values(access_token=access_token, token_digest=token_digest(access_token))
+    )
+    return old_access_token
+
+
 @router.get("/github/callback")
 def github_callback(code: str):
     # Exchanges code into access token
     
-    token_res = requests.post(
+    # OAuth codes are single use, so the exchange is never retried
+    token_res = http_client.post(
         f"{GITHUB_BASE_URL}/login/oauth/access_token",
         headers={"Accept": "application/json"},
         data={
@@ -73,6 +204,7 @@ def github_callback(code: str):
             "client_secret": GITHUB_CLIENT_SECRET,
             "code": code,
         },
+        retries=0,
     )
 
     token_json = token_res.json()
@@ -82,186 +214,295 @@ def github_callback(code: str):
         raise HTTPException(status_code=400, detail=error_detail)
 
     access_token = token_json["access_token"]
-    user_res = requests.get(f"{API_URL}/user",headers={"Authorization": f"Bearer {access_token}"})
+    user_res = cached_get(f"{API_URL}/user", access_token)
     
     if user_res.status_code != 200:
         raise HTTPException(status_code=user_res.status_code, detail="Failed to fetch GitHub user data.")
 
     user_data = user_res.json()
 
-    # Get Unique Id (must be converted to string as per the DB model)
-    github_user_id = str(user_data.get("id"))
-    
-    if not github_user_id:
-        raise HTTPException(status_code=400, detail="Could not retrieve unique GitHub User ID.")
+    # Save token in platform_accounts
+    with engine.connect() as conn:
+        old_access_token = link_github_account(conn, user_data, access_token)
+        conn.commit()
 
+    if old_access_token and old_access_token != access_token:
+        invalidate_token(old_access_token)
 
-    # Extract key data from GitHub response
-    full_name_or_login = user_data.get("name")
-    if full_name_or_login is None:
-        full_name_or_login = user_data.get("login", "")
-        
-    name_parts = full_name_or_login.split()
+    return {"message": "GitHub account linked!", "access_token": access_token}
 
-    first_name = name_parts[0] if name_parts else user_data.get("login")
-    last_name = name_parts[-1] if len(name_parts) > 1 else ""
-    user_email = user_data.get("email", f"user_{github_user_id}@github.com")
-    
-    current_student_id = None
-    
-    # Save token in platform_accounts
-    with engine.connect() as conn:
-        
-        # 1. Check if platform account exists
-        stmt = select(platform_accounts.c.student_id).where(
-            platform_accounts.c.platform_user_id == github_user_id
+
+def iter_repo_pages(access_token: str) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields the authenticated user's repositories one page at a time,
+    following the Link: rel="next" header until GitHub runs out of pages.
+    """
+    url = f"{API_URL}/user/repos"
+    params: Optional[Dict[str, Any]] = {"per_page": REPOS_PER_PAGE}
+
+    while url:
+        res = cached_get(url, access_token, params=params, timeout=(http_client.HTTP_CONNECT_TIMEOUT, REPOS_PAGE_TIMEOUT))
+        if res.status_code != 200:
+            raise HTTPException(status_code=res.status_code, detail=f"Failed to fetch repositories: {res.text}")
+
+        yield res.json()
+
+        # The next link already carries per_page and the page cursor
+        url = res.links.get("next", {}).get("url")
+        params = None
+
+
+def build_repo_skills(repo: Dict[str, Any]) -> Dict[str, Any]:
+    """Primary language, plus the full breakdown (bytes per language) when GraphQL provided it."""
+    skills: Dict[str, Any] = {"language": repo["language"] or ""}
+    if repo.get("languages"):
+        skills["languages"] = repo["languages"]
+    return skills
+
+
+def build_repo_row(student_id: int, repo: Dict[str, Any], readme: Any) -> Dict[str, Any]:
+    """Maps a GitHub repository (plus its README, as get_repo_readme() returns it) onto a projects row."""
+    if readme is README_UNAVAILABLE:
+        # Only inserted as is for a new repository; existing rows keep their content (see save_repo_rows).
+        # Without FULL_CONTENT_KEY the stored README is left alone rather than removed.
+        row = {**build_repo_row(student_id, repo, None), "source_updated_at": None, README_UNAVAILABLE_KEY: True}
+        del row[FULL_CONTENT_KEY]
+        return row
+
+    #This makes sure the description is truncuated after it reaches 2000 characters to avoid errors
+    body = readme if readme else repo["description"]
+    project_content = truncate_content(body)
+
+    return {
+        "student_id": student_id,
+        "title": repo["name"],
+        "content": project_content or "No description or README provided.", 
+        "skills": build_repo_skills(repo),
+        "context": "Extracurricular",
+        "type": "Code",
+        "source_platform": "GitHub",
+        "external_id": str(repo["id"]),
+        "source_updated_at": repo_change_stamp(repo),
+        "missing_upstream": False,
+        # The untruncated README, stored compressed alongside (see content_store.py)
+        FULL_CONTENT_KEY: body,
+    }
+
+
+def save_repo_rows(conn, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserts new projects and refreshes the title/content/skills of existing ones.
+    Rows whose README could not be fetched only update the title and missing_upstream:
+    the stored README, skills and change stamp stay, so the next sync fetches it again.
+    """
+    fetched = [row for row in rows if not row.get(README_UNAVAILABLE_KEY)]
+    unavailable = [
+        {k: v for k, v in row.items() if k != README_UNAVAILABLE_KEY} for row in rows if row.get(README_UNAVAILABLE_KEY)
+    ]
+    save_projects(conn, fetched, update_columns=("title", "content", "skills", "source_updated_at", "missing_upstream"))
+    save_projects(conn, unavailable, update_columns=("title", "missing_upstream"), sync_skills=False)
+
+
+def repo_change_stamp(repo: Dict[str, Any]) -> Optional[str]:
+    """
+    The latest of pushed_at (code/README changes) and updated_at (metadata changes).
+    Both are ISO-8601 UTC strings in the same format, so they compare as strings.
+    """
+    stamps = [stamp for stamp in (repo.get("pushed_at"), repo.get("updated_at")) if stamp]
+    return max(stamps) if stamps else None
+
+
+def _parse_stamp(stamp: str) -> datetime:
+    return datetime.fromisoformat(stamp.replace("Z", "+00:00")).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def repo_has_changed(repo: Dict[str, Any], stored_stamp: Optional[str], watermark: Optional[datetime]) -> bool:
+    """
+    Whether a repository needs its README re-fetched: it is new, has no usable
+    stamp, or changed since it was stored or since the account's last sync.
+    """
+    stamp = repo_change_stamp(repo)
+    if stamp is None or stored_stamp is None or stamp != stored_stamp:
+        return True
+    return watermark is not None and _parse_stamp(stamp) > watermark
+
+
+def read_sync_state(conn, student_id: int, access_token: str):
+    """The account's sync watermark and the stored GitHub projects as {repo id: (stamp, missing_upstream)}."""
+    watermark = conn.execute(
+        select(platform_accounts.c.last_synced_at).where(
+            platform_accounts.c.token_digest == token_digest(access_token)
         )
-        existing_student_id = conn.execute(stmt).scalar_one_or_none()
-        
-        if existing_student_id is None:
-            # 2. New user: Insert into students
-            student_insert_stmt = insert(students).values( # Use standard insert
-                name=first_name,
-                surname=last_name,
-                university="Not Provided (GitHub)",
-                email=user_email
-            )
-            result = conn.execute(student_insert_stmt)
-            # Retrieve the new unique ID (will work on most databases)
-            current_student_id = result.lastrowid
-
-            # 3. New user: Insert into platform_accounts
-            conn.execute(
-                insert(platform_accounts).values( # Use standard insert
-                    student_id=current_student_id,
-                    platform_name="GitHub",
-                    access_token=access_token,
-                    platform_user_id=github_user_id 
-                )
-            )
+    ).scalar_one_or_none()
+    return watermark, load_stored_projects(conn, student_id, "GitHub")
+
+
+def plan_repo_page(repos: List[Dict[str, Any]], stored, watermark: Optional[datetime]):
+    """
+    Splits a page of repositories into the ones that changed since the last sync
+    (and need their README re-fetched) and the ids of unchanged ones that reappeared.
+    """
+    changed = [
+        repo for repo in repos
+        if str(repo["id"]) not in stored or repo_has_changed(repo, stored[str(repo["id"])][0], watermark)
+    ]
+    changed_ids = {str(repo["id"]) for repo in changed}
+    reappeared = [
+        str(repo["id"]) for repo in repos
+        if str(repo["id"]) in stored and stored[str(repo["id"])][1] and str(repo["id"]) not in changed_ids
+    ]
+    return changed, reappeared
+
+
+def save_repo_page(conn, student_id: int, rows: List[Dict[str, Any]], reappeared: List[str]) -> None:
+    save_repo_rows(conn, rows)
+    set_missing_upstream(conn, student_id, "GitHub", reappeared, missing=False)
+
+
+def finish_sync(conn, student_id: int, access_token: str, stored, seen, sync_started_at: datetime) -> None:
+    """After a complete listing: flags repositories that were not seen and advances the watermark."""
+    disappeared = [external_id for external_id, (_, missing) in stored.items() if external_id not in seen and not missing]
+    set_missing_upstream(conn, student_id, "GitHub", disappeared, missing=True)
+    conn.execute(
+        update(platform_accounts).where(
+            platform_accounts.c.token_digest == token_digest(access_token)
+        ).values(last_synced_at=sync_started_at)
+    )
+
+
+def import_github_repos(
+    student_id: int,
+    access_token: str,
+    progress: Optional[ProgressCallback] = None,
+    mode: Optional[str] = None,
+) -> int:
+    """
+    Imports every repository of the token's owner into the projects table.
+
+    Repositories are processed page by page and each page is committed before the
+    next one is requested, so memory use stays bounded by the page size no matter
+    how many repos the user can see. In "rest" mode each page's READMEs are fetched
+    in parallel; in "graphql" mode they arrive with the page itself.
+
+    Syncs are incremental: READMEs are only fetched for repositories that are new
+    or whose pushed_at/updated_at moved since the last sync, and repositories that
+    no longer come back from GitHub are flagged with missing_upstream.
+    Returns the number of repositories processed.
+    """
+    mode = (mode or GITHUB_INGEST_MODE).lower()
+    if mode not in GITHUB_INGEST_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown GitHub ingest mode: {mode}")
+
+    pages = iter_graphql_repo_pages(access_token) if mode == "graphql" else iter_repo_pages(access_token)
+
+    sync_started_at = utcnow()
+    with engine.connect() as conn:
+        watermark, stored = read_sync_state(conn, student_id, access_token)
+    seen = set()
+
+    processed = 0
+    fetched = 0
+    for page_number, repos in enumerate(pages, start=1):
+        seen.update(str(repo["id"]) for repo in repos)
+
+        # Only repositories that changed since the last sync get their README (re)fetched
+        changed, reappeared = plan_repo_page(repos, stored, watermark)
+
+        if mode == "graphql":
+            readmes = {f'{repo["owner"]["login"]}/{repo["name"]}': repo["readme"] for repo in changed}
         else:
-            # 2. Existing user: Update student profile
-            current_student_id = existing_student_id
-
-            conn.execute(
-                update(students).where(students.c.id == current_student_id).values(
-                    name=first_name,
-                    surname=last_name,
-                    email=user_email
-                )
-            )
-        
-        # 4. Always update the access token
-        conn.execute(
-            update(platform_accounts).where(
-                platform_accounts.c.platform_user_id == github_user_id
-            ).values(access_token=access_token)
-        )
-        conn.commit()
+            readmes = fetch_readmes(access_token, changed)
+        rows = [
+            build_repo_row(student_id, repo, readmes.get(f'{repo["owner"]["login"]}/{repo["name"]}'))
+            for repo in changed
+        ]
 
-    return {"message": "GitHub account linked!", "access_token": access_token}
+        with engine.begin() as conn:
+            save_repo_page(conn, student_id, rows, reappeared)
+        invalidate_student(student_id)
+
+        processed += len(repos)
+        fetched += len(rows)
+        print(f"GitHub import for student {student_id}: page {page_number} done, {processed} repositories processed, {fetched} updated")
+        if progress is not None:
+            progress(processed)
+
+    # The listing completed, so anything stored but not seen is gone upstream
+    with engine.begin() as conn:
+        finish_sync(conn, student_id, access_token, stored, seen, sync_started_at)
+    invalidate_student(student_id)
+
+    return processed
 
 
 @router.get("/github/repos")
-def list_repos(access_token: str):
+def list_repos(access_token: str, mode: Optional[str] = None):
     """List repositories and store them in projects table"""
     
     # finds student_id dynamically from the token
-    stmt = select(platform_accounts.c.student_id).where(
-        platform_accounts.c.access_token == access_token
-    )
-    
-    with engine.connect() as conn:
-        current_student_id = conn.execute(stmt).scalar_one_or_none()
-        
-        if current_student_id is None:
-            raise HTTPException(status_code=404, detail="Student not found for this access token. Please link your GitHub account first.")
+    current_student_id = get_student_id_from_token(access_token)
 
-        
-        res = requests.get(
-            f"{API_URL}/user/repos",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-    
-        if res.status_code != 200:
-            raise HTTPException(status_code=res.status_code, detail=f"Failed to fetch repositories: {res.text}")
+    saved = import_github_repos(current_student_id, access_token, mode=mode)
 
-        repos = res.json()
-        
-        
-        for repo in repos:
-            owner = repo["owner"]["login"]
-            repo_name = repo["name"]
-            
-            read_me_content = get_repo_readme(access_token,owner, repo_name)
-            project_content = read_me_content if read_me_content else repo["description"]
-
-            #This makes sure the description is truncuated after it reaches 2000 characters to avoid errors
-            if project_content and len(project_content) > 2000:
-                project_content = project_content[:1997] + "..." 
+    return {"message": f"{saved} repositories has been saved to database"}
+
+def _stream_projects(stmt) -> Iterator[bytes]:
+    # Runs while the response is being sent; rows are encoded as they come off the cursor
+    with read_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=PROJECTS_STREAM_BATCH).execute(stmt)
+        yield from ndjson_lines(result)
+
+
+def _projects_page_response(stmt, student_id: int, limit: Optional[int]) -> Response:
+    try:
+        with read_engine.connect() as conn:
+            # row._mapping converts the ResultRow to a dictionary for the response
+            projects_list = [dict(row._mapping) for row in conn.execute(stmt)]
                 
-            
-            
-            repo_values = {
-                "student_id": current_student_id,
-                "title": repo["name"],
-                "content": project_content or "No description or README provided.", 
-                "skills": {"language": repo["language"] or ""},
-                "context": "Extracurricular",
-                "type": "Code",
-                "source_platform": "GitHub",
-            }
-            
-            # 2. Check if project already exists for this student
-            project_exists_stmt = select(projects.c.id).where(
-                (projects.c.student_id == current_student_id) & (projects.c.title == repo_name)
-            )
-            existing_project_id = conn.execute(project_exists_stmt).scalar_one_or_none()
-            
-            if existing_project_id:
-                # 3. Project exists: UPDATE the content and skills
-                conn.execute(
-                    update(projects).where(projects.c.id == existing_project_id).values(
-                        content=repo_values["content"],
-                        skills=repo_values["skills"]
-                    )
-                )
-            else:
-                # 4. Project does not exist: INSERT new record
-                conn.execute(
-                    insert(projects).values(**repo_values)
-                )
-        conn.commit()
+    except Exception as e:
+        # Log the error and raise an HTTPException
+        print(f"Error fetching projects for student {student_id}: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while fetching projects from the database.")
+
+    return Response(
+        content=dumps(projects_list),
+        media_type="application/json",
+        headers=next_cursor_headers(projects_list, limit),
+    )
 
-    return {"message": f"{len(repos)} repositories has been saved to database"}
 
 @router.get("/github/projects", response_model=List[Dict[str, Any]])
-def get_all_projects(access_token: str) -> List[Dict[str, Any]]:
+def get_all_projects(
+    request: Request,
+    access_token: str,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    format: str = "json",
+):
     """
-    Retrieves all stored projects for the student linked to the provided access_token.
+    Retrieves stored projects for the student linked to the provided access_token.
+
+    Pass `limit` (and the returned X-Next-Cursor as `after`) to page through them,
+    `fields` to select columns (e.g. `fields=id,title,source_platform` to skip content),
+    and `format=ndjson` to stream one JSON object per line.
+
+    JSON responses are cached until the student's next import and carry an ETag;
+    send it back as If-None-Match to get a 304 when nothing changed.
     """
-    
+    validate_list_params(format, limit)
+    field_names = parse_fields(fields)
+
     # 1. Get the student ID using the token
     current_student_id = get_student_id_from_token(access_token)
     
-    # 2. Select all projects for that student ID
-    stmt = select(projects).where(
-        projects.c.student_id == current_student_id
-    )
-    
-    projects_list = []
-    
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(stmt)
-            # Fetch all rows and convert them to a list of dictionaries
-            # row._mapping converts the ResultRow to a dictionary for FastAPI response
-            for row in result:
-                projects_list.append(dict(row._mapping))
-                
-    except Exception as e:
-        # Log the error and raise an HTTPException
-        print(f"Error fetching projects for student {current_student_id}: {e}")
-        raise HTTPException(status_code=500, detail="An error occurred while fetching projects from the database.")
+    # 2. Select the requested page of projects for that student ID
+    stmt = projects_page_stmt(current_student_id, field_names, after, limit)
 
-    return projects_list
\ No newline at end of file
+    if format == "ndjson":
+        return StreamingResponse(_stream_projects(stmt), media_type="application/x-ndjson")
+
+    return cached_response(
+        request, student_scope(current_student_id),
+        lambda: _projects_page_response(stmt, current_student_id, limit),
+    )
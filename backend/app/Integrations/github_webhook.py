@@ -0,0 +1,354 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, status
+from sqlalchemy import select
+from .db import engine
+from .models import platform_accounts, projects
+from .github_integration import API_URL, build_repo_row, get_repo_readme, save_repo_rows
+from .project_sync import set_missing_upstream
+from .response_cache import invalidate_student
+from .http_cache import cached_get
+from .http_client import retry_delay
+from .sync_scheduler import GITHUB_KIND, mark_revoked
+
+router = APIRouter()
+
+# -------------------------------------------------
+# GitHub webhooks: push / repository / installation events refresh just the
+# affected repository (its projects row and README) instead of a full resync.
+#
+# Deliveries are acknowledged as soon as their signature checks out; the work
+# goes onto a coalescing queue keyed by repository id, so a burst of pushes to
+# one repo costs a single fetch. The queue is per process and in memory: a
+# restart drops pending refreshes, which the next full sync picks up anyway.
+# -------------------------------------------------
+
+# Shared secret configured on the GitHub webhook; deliveries are rejected without it
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
+# Events for a repository arriving within this many seconds of the first one are merged
+WEBHOOK_COALESCE_SECONDS = float(os.getenv("GITHUB_WEBHOOK_COALESCE_SECONDS", "2"))
+WEBHOOK_WORKERS = int(os.getenv("GITHUB_WEBHOOK_WORKERS", "2"))
+# Times a repository update is put back after rate limits or upstream errors before it is
+# dropped (the next full sync still picks the change up)
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("GITHUB_WEBHOOK_MAX_ATTEMPTS", "5"))
+
+ACTION_REFRESH = "refresh"
+ACTION_REMOVE = "remove"
+
+# repository event actions after which the repo is gone for its owner
+_REPOSITORY_REMOVED = {"deleted"}
+# installation / installation_repositories actions that grant access to repositories
+_INSTALLATION_ADDED = {"created", "added", "unsuspend", "new_permissions_accepted"}
+
+
+class RepoEvent(NamedTuple):
+    action: str
+    repo_id: int
+    full_name: str
+    # GitHub user ids whose linked accounts may own or see the repo (owner, sender)
+    user_ids: Tuple[str, ...]
+    # Times the update was already put back (see Deferred)
+    attempts: int = 0
+
+
+def merge_repo_events(pending: RepoEvent, new: RepoEvent) -> RepoEvent:
+    """The newest action wins; the accounts of both events stay affected."""
+    user_ids = pending.user_ids + tuple(user_id for user_id in new.user_ids if user_id not in pending.user_ids)
+    return new._replace(full_name=new.full_name or pending.full_name, user_ids=user_ids)
+
+
+class Deferred(Exception):
+    """Raised by a queue handler to have `item` handled again in `delay` seconds."""
+
+    def __init__(self, delay: float, item: Any):
+        super().__init__(f"retry in {delay:.1f}s")
+        self.delay = delay
+        self.item = item
+
+
+class CoalescingQueue:
+    """
+    Runs handler(key, item) on a small thread pool, at most once per key per burst.
+    An item submitted while the key is already pending is merged into the pending
+    item with merge(pending, new) (by default it replaces it); one submitted while
+    the key is being handled is run once more afterwards. A key is handled `delay`
+    seconds after its first pending submission. A handler raising Deferred has its
+    item queued again.
+    """
+
+    def __init__(
+        self, handler: Callable[[Hashable, Any], None], delay: float, workers: int, name: str,
+        merge: Callable[[Any, Any], Any] = lambda pending, new: new,
+    ):
+        self._handler = handler
+        self._delay = delay
+        self._merge = merge
+        self._name = name
+        # key -> (due time, latest item)
+        self._pending: Dict[Hashable, Tuple[float, Any]] = {}
+        self._running: set = set()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=name)
+        self._dispatcher: Optional[threading.Thread] = None
+        self.stats = {"received": 0, "coalesced": 0, "deferred": 0, "processed": 0, "failed": 0}
+
+    def submit(self, key: Hashable, item: Any) -> None:
+        with self._cond:
+            self.stats["received"] += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = (time.monotonic() + self._delay, item)
+            else:
+                self.stats["coalesced"] += 1
+                self._pending[key] = (pending[0], self._merge(pending[1], item))
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, daemon=True, name=f"{self._name}-dispatch")
+                self._dispatcher.start()
+            self._cond.notify_all()
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until nothing is pending or running. False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._running, timeout)
+
+    def _next_ready(self) -> Tuple[Optional[Hashable], Optional[float]]:
+        """The pending key that is due and not running, else (None, seconds until the next one is due)."""
+        now = time.monotonic()
+        wait = None
+        for key, (due, _) in self._pending.items():
+            if key in self._running:
+                continue
+            if due <= now:
+                return key, None
+            wait = due - now if wait is None else min(wait, due - now)
+        return None, wait
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                key, wait = self._next_ready()
+                while key is None:
+                    self._cond.wait(wait)
+                    key, wait = self._next_ready()
+                _, item = self._pending.pop(key)
+                self._running.add(key)
+            self._executor.submit(self._run, key, item)
+
+    def _run(self, key: Hashable, item: Any) -> None:
+        deferred = None
+        try:
+            self._handler(key, item)
+            outcome = "processed"
+        except Deferred as e:
+            print(f"Deferring {self._name} item {key}: {e}")
+            deferred, outcome = e, "deferred"
+        except Exception as e:
+            print(f"Error handling {self._name} item {key}: {e}")
+            outcome = "failed"
+        with self._cond:
+            self.stats[outcome] += 1
+            self._running.discard(key)
+            if deferred is not None:
+                # Anything submitted for the key meanwhile is newer, so it is merged into the deferred item
+                pending = self._pending.pop(key, None)
+                self._pending[key] = (time.monotonic() + deferred.delay, deferred.item)
+                if pending is not None:
+                    self._pending[key] = (pending[0], self._merge(deferred.item, pending[1]))
+            self._cond.notify_all()
+
+
+# --------------------------
+# Applying an event
+# --------------------------
+def linked_accounts(conn, event: RepoEvent) -> List[Tuple[int, str]]:
+    """
+    (student_id, access_token) of every linked GitHub account the repository matters to:
+    students who already have it as a project, and the accounts of its owner and the sender.
+    """
+    has_repo = select(projects.c.student_id).where(
+        (projects.c.source_platform == "GitHub") & (projects.c.external_id == str(event.repo_id))
+    )
+    stmt = select(platform_accounts.c.student_id, platform_accounts.c.access_token).where(
+        (platform_accounts.c.platform_name == "GitHub")
+        & (platform_accounts.c.student_id.in_(has_repo) | platform_accounts.c.platform_user_id.in_(event.user_ids))
+    )
+    accounts: Dict[int, str] = {}
+    for row in conn.execute(stmt):
+        accounts.setdefault(row.student_id, row.access_token)
+    return list(accounts.items())
+
+
+# fetch_repo() outcomes other than the repository itself
+FETCH_GONE = "gone"            # 404/410: deleted, or no longer visible to the token
+FETCH_REVOKED = "revoked"      # 401: the token no longer works
+FETCH_FORBIDDEN = "forbidden"  # 403 that is not a rate limit (e.g. SSO enforcement): says nothing about the repo
+FETCH_RETRY = "retry"          # rate limited or upstream error: try again later
+
+
+def fetch_repo(repo_id: int, access_token: str, attempt: int = 0) -> Tuple[str, Any]:
+    """
+    The repository as GET /user/repos returns it, as ("ok", repo), or one of the
+    FETCH_* outcomes; FETCH_RETRY comes with the seconds to wait before retrying.
+    """
+    # Looked up by id so renames and transfers in between don't matter
+    try:
+        res = cached_get(f"{API_URL}/repositories/{repo_id}", access_token)
+    except HTTPException as e:
+        # The local limiter would have had to wait too long for this token
+        if e.status_code == 429:
+            return FETCH_RETRY, retry_delay(attempt, e.status_code, e.headers)
+        raise
+    if res.status_code == 200:
+        return "ok", res.json()
+    if res.status_code in (404, 410):
+        return FETCH_GONE, None
+    if res.status_code == 401:
+        return FETCH_REVOKED, None
+    delay = retry_delay(attempt, res.status_code, res.headers)
+    if delay is not None:
+        return FETCH_RETRY, delay
+    if res.status_code == 403:
+        return FETCH_FORBIDDEN, None
+    raise HTTPException(status_code=res.status_code, detail=f"Failed to fetch repository {repo_id}: {res.text}")
+
+
+def apply_repo_event(repo_id: int, event: RepoEvent) -> None:
+    """
+    Refreshes (or flags as missing_upstream) one repository for every account it matters to.
+    Accounts whose token is revoked are skipped (and recorded as revoked for the
+    scheduler); if no token could read the repo because of rate limits or upstream
+    errors, the event is deferred.
+    """
+    with engine.connect() as conn:
+        accounts = linked_accounts(conn, event)
+    if not accounts:
+        return
+
+    external_id = str(event.repo_id)
+    repo = readme = None
+    gone, skipped = [], []
+    retry_in = None
+    if event.action == ACTION_REFRESH:
+        # One fetch serves every student: the first token that can still see the repo is used
+        for student_id, access_token in accounts:
+            outcome, value = fetch_repo(repo_id, access_token, event.attempts)
+            if outcome == "ok":
+                repo = value
+                readme = get_repo_readme(access_token, repo["owner"]["login"], repo["name"])
+                break
+            if outcome == FETCH_GONE:
+                gone.append(student_id)
+            elif outcome == FETCH_RETRY:
+                retry_in = value if retry_in is None else min(retry_in, value)
+            else:
+                skipped.append(student_id)
+                if outcome == FETCH_REVOKED:
+                    mark_revoked(student_id, GITHUB_KIND, access_token, "401 Bad credentials (webhook refresh)")
+        if repo is None and retry_in is not None:
+            if event.attempts + 1 >= WEBHOOK_MAX_ATTEMPTS:
+                raise RuntimeError(f"repository {event.full_name or repo_id} still unavailable after {WEBHOOK_MAX_ATTEMPTS} attempts")
+            raise Deferred(retry_in, event._replace(attempts=event.attempts + 1))
+    else:
+        gone = [student_id for student_id, _ in accounts]
+
+    with engine.begin() as conn:
+        for student_id in gone:
+            set_missing_upstream(conn, student_id, "GitHub", [external_id], missing=True)
+        if repo is not None:
+            # Accounts that could not check the repo themselves (revoked, forbidden) are left as they are
+            save_repo_rows(conn, [
+                build_repo_row(student_id, repo, readme)
+                for student_id, _ in accounts if student_id not in gone and student_id not in skipped
+            ])
+    for student_id, _ in accounts:
+        invalidate_student(student_id)
+    print(f"GitHub webhook: repository {event.full_name or repo_id} {event.action} applied for {len(accounts)} student(s)")
+
+
+webhook_queue = CoalescingQueue(
+    lambda repo_id, event: apply_repo_event(repo_id, event),
+    delay=WEBHOOK_COALESCE_SECONDS, workers=WEBHOOK_WORKERS, name="github-webhook", merge=merge_repo_events,
+)
+
+
+# --------------------------
+# Parsing deliveries
+# --------------------------
+def verify_signature(body: bytes, signature: Optional[str]) -> None:
+    """Checks X-Hub-Signature-256 (HMAC-SHA256 of the raw body with the webhook secret)."""
+    if not GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="GitHub webhook secret is not configured.")
+    expected = "sha256=" + hmac.new(GITHUB_WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    if not signature or not hmac.compare_digest(signature, expected):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature.")
+
+
+def _user_ids(*users: Optional[Dict[str, Any]]) -> Tuple[str, ...]:
+    return tuple(str(user["id"]) for user in users if user and user.get("id") is not None)
+
+
+def events_from_payload(event_name: str, payload: Dict[str, Any]) -> List[RepoEvent]:
+    """The repository refreshes/removals a delivery calls for (none for events that change nothing we store)."""
+    action = payload.get("action")
+    sender = payload.get("sender")
+
+    if event_name == "push":
+        repo = payload.get("repository") or {}
+        # READMEs and descriptions are read from the default branch; pushes elsewhere change nothing stored
+        if payload.get("ref") != f'refs/heads/{repo.get("default_branch") or repo.get("master_branch")}':
+            return []
+        return [RepoEvent(ACTION_REFRESH, repo["id"], repo.get("full_name", ""), _user_ids(repo.get("owner"), sender))]
+
+    if event_name == "repository":
+        repo = payload.get("repository") or {}
+        kind = ACTION_REMOVE if action in _REPOSITORY_REMOVED else ACTION_REFRESH
+        return [RepoEvent(kind, repo["id"], repo.get("full_name", ""), _user_ids(repo.get("owner"), sender))]
+
+    if event_name in ("installation", "installation_repositories"):
+        # Access here comes from the students' OAuth tokens, not the installation, so
+        # only repositories that became visible are fetched; removals are left to the next sync
+        if action not in _INSTALLATION_ADDED:
+            return []
+        account = (payload.get("installation") or {}).get("account")
+        repos = payload.get("repositories") if event_name == "installation" else payload.get("repositories_added")
+        return [
+            RepoEvent(ACTION_REFRESH, repo["id"], repo.get("full_name", ""), _user_ids(account, sender))
+            for repo in repos or []
+        ]
+
+    return []
+
+
+@router.post("/github/webhook", status_code=status.HTTP_202_ACCEPTED)
+async def github_webhook(request: Request):
+    """
+    Receives GitHub webhook deliveries (push, repository, installation and
+    installation_repositories events; ping is answered). Requires the
+    X-Hub-Signature-256 header signed with GITHUB_WEBHOOK_SECRET.
+    """
+    body = await request.body()
+    verify_signature(body, request.headers.get("x-hub-signature-256"))
+
+    event_name = request.headers.get("x-github-event", "")
+    if event_name == "ping":
+        return {"message": "pong"}
+
+    try:
+        payload = json.loads(body)
+        events = events_from_payload(event_name, payload)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed {event_name or 'webhook'} payload: {e}")
+
+    for event in events:
+        webhook_queue.submit(event.repo_id, event)
+    return {"message": f"{len(events)} repository update(s) queued.", "event": event_name}
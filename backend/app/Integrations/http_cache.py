@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+from . import http_client
+
+# Responses from GitHub/Notion are cached in a local SQLite file, shared by every
+# worker on the host. GitHub answers conditional requests that match with a 304
+# that does not count against the rate limit.
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "./http_cache.db")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Only the headers needed to rebuild a usable response are kept
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+# An entry's LRU timestamp is only rewritten when it is older than this, so hits are mostly read-only
+_ACCESS_RESOLUTION = 60.0
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "revalidations": 0, "stores": 0, "evictions": 0}
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of this process since start."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _db() -> sqlite3.Connection:
+    # sqlite3 connections cannot be shared between threads, so each thread opens its own
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(HTTP_CACHE_PATH, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " status INTEGER,"
+            " headers TEXT,"
+            " body BLOB,"
+            " size INTEGER,"
+            " stored_at REAL,"
+            " accessed_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)")
+        # Running total of responses.size, kept in step by _store/_evict so writes never SUM the table
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 1), total INTEGER NOT NULL)")
+        if conn.execute("SELECT 1 FROM cache_size").fetchone() is None:
+            conn.execute("INSERT OR IGNORE INTO cache_size (id, total) SELECT 1, COALESCE(SUM(size), 0) FROM responses")
+        _local.conn = conn
+    return conn
+
+
+def _cache_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _lookup(key: str) -> Optional[sqlite3.Row]:
+    conn = _db()
+    row = conn.execute(
+        "SELECT etag, last_modified, status, headers, body, stored_at, accessed_at FROM responses WHERE key = ?", (key,)
+    ).fetchone()
+    now = time.time()
+    if row is not None and now - row[6] > _ACCESS_RESOLUTION:
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+    return row
+
+
+def _store(key: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+    now = time.time()
+    conn = _db()
+    # One write transaction, so the size total stays exact with several workers sharing the file
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        previous = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, etag, last_modified, status, headers, body, size, stored_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, headers.get("ETag"), headers.get("Last-Modified"), status, json.dumps(headers), body, len(body), now, now),
+        )
+        total = conn.execute(
+            "UPDATE cache_size SET total = total + ? WHERE id = 1 RETURNING total",
+            (len(body) - (previous[0] if previous else 0),),
+        ).fetchone()[0]
+        if total > HTTP_CACHE_MAX_BYTES:
+            _evict(conn, total)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    _count("stores")
+
+
+def _evict(conn: sqlite3.Connection, total: int) -> None:
+    """Drops least recently used entries until the cache fits in HTTP_CACHE_MAX_BYTES. Runs inside _store's transaction."""
+    freed = 0
+    while total - freed > HTTP_CACHE_MAX_BYTES:
+        oldest = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at LIMIT 64").fetchall()
+        if not oldest:
+            break
+        for key, size in oldest:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            freed += size
+            _count("evictions")
+            if total - freed <= HTTP_CACHE_MAX_BYTES:
+                break
+    conn.execute("UPDATE cache_size SET total = total - ? WHERE id = 1", (freed,))
+
+
+def _to_response(url: str, status: int, headers_json: str, body: bytes) -> requests.Response:
+    res = requests.Response()
+    res.status_code = status
+    res.headers = CaseInsensitiveDict(json.loads(headers_json))
+    res._content = body
+    res.url = url
+    res.encoding = requests.utils.get_encoding_from_headers(res.headers) or "utf-8"
+    return res
+
+
+def _conditional_request(url: str, access_token: str, headers: Optional[Dict[str, str]], params: Any):
+    """Cache key, cached entry (if any) and request headers with the validators added."""
+    headers = {"Authorization": f"Bearer {access_token}", **(headers or {})}
+    key = _cache_key("GET", url, params, headers.get("Accept"), hashlib.sha256(access_token.encode("utf-8")).hexdigest())
+    cached = _lookup(key)
+    if cached is not None:
+        etag, last_modified = cached[0], cached[1]
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    return key, cached, headers
+
+
+def _store_response(key: str, status_code: int, headers, content: bytes) -> None:
+    _count("misses")
+    if status_code == 200 and ("ETag" in headers or "Last-Modified" in headers):
+        stored = {name: headers[name] for name in _STORED_HEADERS if name in headers}
+        _store(key, status_code, stored, content)
+
+
+def cached_get(url: str, access_token: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> requests.Response:
+    """
+    http_client.get with a conditional-request cache in front of it.
+
+    Cached entries are keyed by URL, query params, Accept header and token, and are
+    revalidated with If-None-Match/If-Modified-Since. A 304 is answered from the cache.
+    """
+    if not HTTP_CACHE_ENABLED:
+        headers = {"Authorization": f"Bearer {access_token}", **(headers or {})}
+        return http_client.get(url, token=access_token, headers=headers, **kwargs)
+
+    key, cached, headers = _conditional_request(url, access_token, headers, kwargs.get("params"))
+    res = http_client.get(url, token=access_token, headers=headers, **kwargs)
+
+    if res.status_code == 304 and cached is not None:
+        _count("hits")
+        _count("revalidations")
+        return _to_response(url, cached[2], cached[3], cached[4])
+
+    _store_response(key, res.status_code, res.headers, res.content)
+    return res
+
+
+# The async versions run the SQLite reads and writes on worker threads: they can wait
+# up to the connection timeout for another writer, which must not stall the event loop.
+async def cached_get_async(url: str, access_token: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> httpx.Response:
+    """cached_get for the async client; returns an httpx.Response."""
+    if not HTTP_CACHE_ENABLED:
+        headers = {"Authorization": f"Bearer {access_token}", **(headers or {})}
+        return await http_client.aget(url, token=access_token, headers=headers, **kwargs)
+
+    key, cached, headers = await asyncio.to_thread(_conditional_request, url, access_token, headers, kwargs.get("params"))
+    res = await http_client.aget(url, token=access_token, headers=headers, **kwargs)
+
+    if res.status_code == 304 and cached is not None:
+        _count("hits")
+        _count("revalidations")
+        return httpx.Response(
+            cached[2],
+            headers=json.loads(cached[3]),
+            content=cached[4],
+            request=httpx.Request("GET", url),
+        )
+
+    await asyncio.to_thread(_store_response, key, res.status_code, res.headers, res.content)
+    return res
+
+
+def cached_call(namespace: str, key_parts: Any, ttl: float, fetch: Callable[[], Any]) -> Any:
+    """
+    Time-based cache for JSON-serializable results of SDK calls that cannot be
+    revalidated (e.g. the Notion client). Entries older than `ttl` seconds are refetched.
+    """
+    if not HTTP_CACHE_ENABLED or ttl <= 0:
+        return fetch()
+
+    key = _cache_key(namespace, key_parts)
+    cached = _fresh(key, ttl)
+    if cached is not None:
+        return cached
+
+    result = fetch()
+    _store(key, 200, {}, json.dumps(result).encode("utf-8"))
+    return result
+
+
+async def cached_call_async(namespace: str, key_parts: Any, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """cached_call for coroutines (e.g. the async Notion client)."""
+    if not HTTP_CACHE_ENABLED or ttl <= 0:
+        return await fetch()
+
+    key = _cache_key(namespace, key_parts)
+    cached = await asyncio.to_thread(_fresh, key, ttl)
+    if cached is not None:
+        return cached
+
+    result = await fetch()
+    await asyncio.to_thread(_store, key, 200, {}, json.dumps(result).encode("utf-8"))
+    return result
+
+
+def _fresh(key: str, ttl: float) -> Any:
+    """The decoded cached result under `key` if it is younger than `ttl`, counting the hit or miss."""
+    cached = _lookup(key)
+    if cached is not None and cached[5] + ttl > time.time():
+        _count("hits")
+        return json.loads(cached[4])
+    _count("misses")
+    return None
@@ -0,0 +1,300 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+import httpx
+import requests
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+from .metrics import observe_upstream, observe_upstream_wait
+
+# Every outbound call of the integrations goes through this module: one pooled
+# keep-alive session, strict timeouts, per-token throttling and retries.
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+# Longest we are willing to block a caller waiting for a rate limit to reset
+HTTP_MAX_RATE_LIMIT_WAIT = float(os.getenv("HTTP_MAX_RATE_LIMIT_WAIT", "60"))
+# Local pacing per token; GitHub's secondary limits allow about 900 REST points a minute
+HTTP_TOKEN_RATE = float(os.getenv("HTTP_TOKEN_RATE", "15"))
+HTTP_TOKEN_BURST = float(os.getenv("HTTP_TOKEN_BURST", "30"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    # Retries are handled in request() so they can honor Retry-After and rate-limit headers
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = _make_session()
+
+
+# --------------------------
+# Per-token rate limiting
+# --------------------------
+@dataclass
+class _Bucket:
+    tokens: float = HTTP_TOKEN_BURST
+    updated_at: float = field(default_factory=time.monotonic)
+    # Primary limit as last reported by X-RateLimit-Remaining / X-RateLimit-Reset
+    remaining: Optional[int] = None
+    reset_at: float = 0.0
+
+
+class RateLimiter:
+    """
+    A token bucket per access token (HTTP_TOKEN_RATE requests/s, bursts of
+    HTTP_TOKEN_BURST) combined with the upstream's own X-RateLimit-Remaining/Reset
+    budget: once that reaches zero, callers wait for the reset instead of
+    collecting 403s.
+    """
+
+    def __init__(self, rate: float = HTTP_TOKEN_RATE, burst: float = HTTP_TOKEN_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str) -> float:
+        """Takes a slot for one request and returns how many seconds to wait before sending it."""
+        with self._lock:
+            bucket = self._buckets.setdefault(key, _Bucket(tokens=self.burst))
+            now = time.monotonic()
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+            bucket.updated_at = now
+            bucket.tokens -= 1
+            wait = -bucket.tokens / self.rate if bucket.tokens < 0 else 0.0
+
+            if bucket.remaining is not None:
+                if bucket.remaining <= 0 and bucket.reset_at > time.time():
+                    wait = max(wait, bucket.reset_at - time.time())
+                else:
+                    bucket.remaining -= 1
+            return wait
+
+    def primary_budget(self, key: str) -> Optional[Tuple[int, float]]:
+        """(remaining, reset epoch seconds) as last reported by the upstream for this key, or None if unknown."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or bucket.remaining is None:
+                return None
+            return bucket.remaining, bucket.reset_at
+
+    def observe(self, key: str, headers) -> None:
+        """Records the rate-limit headers of a response."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            bucket = self._buckets.setdefault(key, _Bucket(tokens=self.burst))
+            bucket.remaining = int(remaining)
+            bucket.reset_at = float(reset)
+
+
+rate_limiter = RateLimiter()
+
+
+def limiter_key(token: Optional[str]) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest() if token else "anonymous"
+
+
+def retry_delay(attempt: int, status_code: Optional[int] = None, headers=None) -> Optional[float]:
+    """
+    Seconds to wait before retry number `attempt` (0-based), or None if the
+    response should not be retried. Honors Retry-After and rate-limit resets.
+    """
+    if status_code is not None:
+        rate_limited = status_code == 403 and headers is not None and (
+            headers.get("Retry-After") is not None or headers.get("X-RateLimit-Remaining") == "0"
+        )
+        if status_code not in RETRY_STATUSES and not rate_limited:
+            return None
+
+        if headers is not None and headers.get("Retry-After") is not None:
+            try:
+                return float(headers["Retry-After"])
+            except ValueError:
+                pass
+        if headers is not None and headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+            return max(0.0, float(headers["X-RateLimit-Reset"]) - time.time())
+
+    backoff = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(backoff / 2, backoff)
+
+
+def _too_long(wait: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Upstream rate limit exhausted; retry in {int(wait) + 1} seconds.",
+        headers={"Retry-After": str(int(wait) + 1)},
+    )
+
+
+def request(method: str, url: str, token: Optional[str] = None, retries: int = HTTP_MAX_RETRIES, **kwargs: Any) -> requests.Response:
+    """
+    Sends a request on the shared session. `token` is the upstream access token the
+    request is made with; it is only used to pick the rate-limit bucket (callers
+    set the Authorization header themselves). Connection errors and retryable
+    responses are retried up to `retries` times with exponential backoff.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    key = limiter_key(token)
+
+    attempt = 0
+    while True:
+        wait = rate_limiter.reserve(key)
+        if wait > HTTP_MAX_RATE_LIMIT_WAIT:
+            raise _too_long(wait)
+        if wait > 0:
+            observe_upstream_wait(url, wait)
+            time.sleep(wait)
+
+        started = time.perf_counter()
+        try:
+            res = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            observe_upstream(url, method, "error", time.perf_counter() - started)
+            if attempt >= retries:
+                raise
+            delay = retry_delay(attempt)
+            observe_upstream_wait(url, delay)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        observe_upstream(url, method, res.status_code, time.perf_counter() - started)
+
+        rate_limiter.observe(key, res.headers)
+
+        delay = retry_delay(attempt, res.status_code, res.headers)
+        if delay is None or attempt >= retries:
+            return res
+        if delay > HTTP_MAX_RATE_LIMIT_WAIT:
+            raise _too_long(delay)
+        print(f"Retrying {method} {url} after status {res.status_code} in {delay:.1f}s")
+        observe_upstream_wait(url, delay)
+        time.sleep(delay)
+        attempt += 1
+
+
+def get(url: str, token: Optional[str] = None, **kwargs: Any) -> requests.Response:
+    return request("GET", url, token=token, **kwargs)
+
+
+def post(url: str, token: Optional[str] = None, **kwargs: Any) -> requests.Response:
+    return request("POST", url, token=token, **kwargs)
+
+
+# --------------------------
+# Async client (used by the async integration routes)
+# --------------------------
+ASYNC_DEFAULT_TIMEOUT = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+_ASYNC_LIMITS = httpx.Limits(max_connections=HTTP_POOL_SIZE * 4, max_keepalive_connections=HTTP_POOL_SIZE)
+
+_async_session: Optional[httpx.AsyncClient] = None
+
+
+def async_session() -> httpx.AsyncClient:
+    """The shared pooled AsyncClient, created on first use."""
+    global _async_session
+    if _async_session is None:
+        _async_session = httpx.AsyncClient(timeout=ASYNC_DEFAULT_TIMEOUT, limits=_ASYNC_LIMITS)
+    return _async_session
+
+
+async def arequest(method: str, url: str, token: Optional[str] = None, retries: int = HTTP_MAX_RETRIES, **kwargs: Any) -> httpx.Response:
+    """The async counterpart of request(): same rate limiting, retries and backoff, on httpx."""
+    key = limiter_key(token)
+
+    attempt = 0
+    while True:
+        wait = rate_limiter.reserve(key)
+        if wait > HTTP_MAX_RATE_LIMIT_WAIT:
+            raise _too_long(wait)
+        if wait > 0:
+            observe_upstream_wait(url, wait)
+            await asyncio.sleep(wait)
+
+        started = time.perf_counter()
+        try:
+            res = await async_session().request(method, url, **kwargs)
+        except httpx.TransportError:
+            observe_upstream(url, method, "error", time.perf_counter() - started)
+            if attempt >= retries:
+                raise
+            delay = retry_delay(attempt)
+            observe_upstream_wait(url, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        observe_upstream(url, method, res.status_code, time.perf_counter() - started)
+
+        rate_limiter.observe(key, res.headers)
+
+        delay = retry_delay(attempt, res.status_code, res.headers)
+        if delay is None or attempt >= retries:
+            return res
+        if delay > HTTP_MAX_RATE_LIMIT_WAIT:
+            raise _too_long(delay)
+        print(f"Retrying {method} {url} after status {res.status_code} in {delay:.1f}s")
+        observe_upstream_wait(url, delay)
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def aget(url: str, token: Optional[str] = None, **kwargs: Any) -> httpx.Response:
+    return await arequest("GET", url, token=token, **kwargs)
+
+
+async def apost(url: str, token: Optional[str] = None, **kwargs: Any) -> httpx.Response:
+    return await arequest("POST", url, token=token, **kwargs)
+
+
+# The Notion SDK drives these clients itself, so its calls are timed with event hooks
+def _mark_started(request: httpx.Request) -> None:
+    request.extensions["started"] = time.perf_counter()
+
+
+def _record_response(response: httpx.Response) -> None:
+    started = response.request.extensions.get("started")
+    elapsed = None if started is None else time.perf_counter() - started
+    observe_upstream(response.request.url, response.request.method, response.status_code, elapsed)
+
+
+async def _amark_started(request: httpx.Request) -> None:
+    _mark_started(request)
+
+
+async def _arecord_response(response: httpx.Response) -> None:
+    _record_response(response)
+
+
+def notion_http_client() -> httpx.Client:
+    """Pooled httpx client with the same timeouts, for the Notion SDK (which retries 429s itself)."""
+    return httpx.Client(
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+        event_hooks={"request": [_mark_started], "response": [_record_response]},
+    )
+
+
+def notion_async_http_client() -> httpx.AsyncClient:
+    """Pooled httpx AsyncClient for the async Notion SDK client."""
+    return httpx.AsyncClient(
+        timeout=ASYNC_DEFAULT_TIMEOUT, limits=_ASYNC_LIMITS,
+        event_hooks={"request": [_amark_started], "response": [_arecord_response]},
+    )
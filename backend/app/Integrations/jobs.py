@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, status
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from .db import engine, utcnow
+from .models import import_jobs
+from .accounts import get_student_id_from_token
+from .registry import kind_enabled
+
+router = APIRouter()
+
+# Size of the worker pool shared by all background imports in this process
+JOB_WORKERS = int(os.getenv("IMPORT_JOB_WORKERS", "4"))
+# A queued/running job nobody has touched for this long was lost to a restart or crash
+JOB_STALE_AFTER = timedelta(seconds=float(os.getenv("IMPORT_JOB_STALE_AFTER", "900")))
+# How often a process touches the jobs it is running, so they never look stale while it is alive
+JOB_HEARTBEAT_SECONDS = float(os.getenv("IMPORT_JOB_HEARTBEAT_SECONDS", "60"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+# Called with a finished job's outcome (see start_job)
+JobCallback = Callable[[Dict[str, Any]], None]
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="import-job")
+
+# (student_id, kind) -> job id of imports queued or running in this process
+_active: Dict[Tuple[int, str], str] = {}
+_active_lock = threading.RLock()
+_heartbeat: Optional[threading.Thread] = None
+
+
+# --------------------------
+# Importers
+# --------------------------
+# Imported lazily so this module does not depend on the integration modules at import time
+def _run_github_import(student_id: int, access_token: str, progress: Callable[[int], None], **options: Any) -> int:
+    from .github_integration import import_github_repos
+    return import_github_repos(student_id, access_token, progress=progress, mode=options.get("mode"))
+
+
+def _run_notion_import(student_id: int, access_token: str, progress: Callable[[int], None], **options: Any) -> int:
+    from .Notion_integration import import_notion_pages
+    return import_notion_pages(student_id, progress=progress)
+
+
+IMPORTERS: Dict[str, Callable[..., int]] = {
+    "github_repos": _run_github_import,
+    "notion_pages": _run_notion_import,
+}
+
+
+# --------------------------
+# Job bookkeeping
+# --------------------------
+def _job_to_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "kind": row.kind,
+        "student_id": row.student_id,
+        "state": row.state,
+        "items_processed": row.items_processed or 0,
+        "error": row.error,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+        "finished_at": row.finished_at.isoformat() if row.finished_at else None,
+    }
+
+
+def _is_local(job_id: str) -> bool:
+    with _active_lock:
+        return job_id in _active.values()
+
+
+def _is_stale(row) -> bool:
+    return (
+        row.state in ACTIVE_STATES
+        and not _is_local(row.id)
+        and row.updated_at is not None
+        and row.updated_at < utcnow() - JOB_STALE_AFTER
+    )
+
+
+def _active_key(student_id: int, kind: str) -> str:
+    return f"{student_id}:{kind}"
+
+
+def _set_job(job_id: str, **values: Any) -> None:
+    values["updated_at"] = utcnow()
+    if values.get("state") in (JOB_SUCCEEDED, JOB_FAILED):
+        values["active_key"] = None
+    with engine.begin() as conn:
+        conn.execute(update(import_jobs).where(import_jobs.c.id == job_id).values(**values))
+
+
+def _fail_stale(row) -> None:
+    # Only if nothing touched it since it was read: a heartbeat in between means its owner is alive
+    with engine.begin() as conn:
+        conn.execute(
+            update(import_jobs)
+            .where((import_jobs.c.id == row.id) & (import_jobs.c.updated_at == row.updated_at))
+            .values(
+                state=JOB_FAILED, error="Interrupted before finishing (server restart?)",
+                updated_at=utcnow(), finished_at=utcnow(), active_key=None,
+            )
+        )
+
+
+def _beat() -> None:
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with _active_lock:
+            job_ids = list(_active.values())
+        if not job_ids:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    update(import_jobs)
+                    .where(import_jobs.c.id.in_(job_ids) & import_jobs.c.state.in_(ACTIVE_STATES))
+                    .values(updated_at=utcnow())
+                )
+        except Exception as e:
+            print(f"Error touching running import jobs: {e}")
+
+
+def _ensure_heartbeat() -> None:
+    """Starts this process's heartbeat thread on its first job (call with _active_lock held)."""
+    global _heartbeat
+    if _heartbeat is None:
+        _heartbeat = threading.Thread(target=_beat, name="import-job-heartbeat", daemon=True)
+        _heartbeat.start()
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with engine.connect() as conn:
+        row = conn.execute(select(import_jobs).where(import_jobs.c.id == job_id)).first()
+    if row is None:
+        return None
+    if _is_stale(row):
+        _fail_stale(row)
+        return get_job(job_id)
+    return _job_to_dict(row)
+
+
+def _find_active_job(student_id: int, kind: str) -> Optional[Dict[str, Any]]:
+    """An import of the same kind for the same student that is still queued or running, in any process."""
+    stmt = select(import_jobs).where(
+        (import_jobs.c.student_id == student_id)
+        & (import_jobs.c.kind == kind)
+        & (import_jobs.c.state.in_(ACTIVE_STATES))
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(stmt).all()
+    for row in rows:
+        if _is_stale(row):
+            _fail_stale(row)
+        else:
+            return _job_to_dict(row)
+    return None
+
+
+def _run_job(
+    job_id: str, key: Tuple[int, str], access_token: str, options: Dict[str, Any], on_finish: Optional[JobCallback] = None
+) -> None:
+    student_id, kind = key
+    outcome: Dict[str, Any] = {"id": job_id, "state": JOB_FAILED, "items_processed": 0, "error": None, "status_code": None}
+
+    def progress(items_processed: int) -> None:
+        _set_job(job_id, items_processed=items_processed)
+
+    try:
+        _set_job(job_id, state=JOB_RUNNING)
+        items = IMPORTERS[kind](student_id, access_token, progress, **options)
+        _set_job(job_id, state=JOB_SUCCEEDED, items_processed=items, finished_at=utcnow())
+        outcome.update(state=JOB_SUCCEEDED, items_processed=items)
+    except HTTPException as e:
+        outcome.update(error=str(e.detail)[:2000], status_code=e.status_code)
+        _set_job(job_id, state=JOB_FAILED, error=outcome["error"], finished_at=utcnow())
+    except Exception as e:
+        print(f"Import job {job_id} ({kind}) failed: {e}")
+        # The Notion SDK reports the HTTP status as `status`
+        outcome.update(error=str(e)[:2000], status_code=getattr(e, "status", None))
+        _set_job(job_id, state=JOB_FAILED, error=outcome["error"], finished_at=utcnow())
+    finally:
+        with _active_lock:
+            _active.pop(key, None)
+        if on_finish is not None:
+            try:
+                on_finish(outcome)
+            except Exception as e:
+                print(f"Error in completion callback of import job {job_id}: {e}")
+
+
+def start_job(
+    kind: str, student_id: int, access_token: str, on_finish: Optional[JobCallback] = None, **options: Any
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    submit_job, also telling whether a new job was started (False when an active
+    one was returned). `on_finish` is called from the worker with the outcome
+    ({"id", "state", "items_processed", "error", "status_code"}) of a new job only.
+    """
+    if kind not in IMPORTERS:
+        raise ValueError(f"Unknown import kind: {kind}")
+    if not kind_enabled(kind):
+        raise HTTPException(status_code=404, detail=f"The {kind} import is not enabled on this server (ENABLED_INTEGRATIONS).")
+
+    key = (student_id, kind)
+    with _active_lock:
+        job_id = _active.get(key)
+        if job_id is not None:
+            return get_job(job_id), False
+
+        existing = _find_active_job(student_id, kind)
+        if existing is not None:
+            return existing, False
+
+        job_id = str(uuid.uuid4())
+        now = utcnow()
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(import_jobs).values(
+                    id=job_id,
+                    student_id=student_id,
+                    kind=kind,
+                    state=JOB_QUEUED,
+                    items_processed=0,
+                    created_at=now,
+                    updated_at=now,
+                    active_key=_active_key(student_id, kind),
+                ))
+        except IntegrityError:
+            # Another process started the same import between the check above and this insert
+            existing = _find_active_job(student_id, kind)
+            if existing is None:
+                raise HTTPException(status_code=409, detail="The same import is being started; try again.")
+            return existing, False
+        _active[key] = job_id
+        _ensure_heartbeat()
+        _executor.submit(_run_job, job_id, key, access_token, options, on_finish)
+
+    return get_job(job_id), True
+
+
+def submit_job(kind: str, student_id: int, access_token: str, **options: Any) -> Dict[str, Any]:
+    """
+    Queues an import on the shared worker pool and returns the job record.
+    If the same import is already queued or running for the student, that job is returned instead.
+    """
+    return start_job(kind, student_id, access_token, **options)[0]
+
+
+# --------------------------
+# Endpoints
+# --------------------------
+@router.post("/jobs/github/repos", status_code=status.HTTP_202_ACCEPTED)
+def submit_github_import(access_token: str, mode: Optional[str] = None):
+    """Starts a background GitHub repository import and returns its job."""
+    student_id = get_student_id_from_token(access_token)
+    return submit_job("github_repos", student_id, access_token, mode=mode)
+
+
+@router.post("/jobs/notion/load_pages", status_code=status.HTTP_202_ACCEPTED)
+def submit_notion_import(access_token: str):
+    """Starts a background Notion page import and returns its job."""
+    student_id = get_student_id_from_token(access_token)
+    return submit_job("notion_pages", student_id, access_token)
+
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str, access_token: str):
+    """The job's state and progress. Only the student who started it can see it."""
+    student_id = get_student_id_from_token(access_token)
+    job = get_job(job_id)
+    if job is None or job["student_id"] != student_id:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
@@ -0,0 +1,377 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+from sqlalchemy import event
+
+# -------------------------------------------------
+# Process-local metrics, rendered in the Prometheus text format at /metrics.
+#
+# Kept dependency-free: a counter and a histogram with fixed label names, plus
+# "collected" metrics whose samples are read from a callback at scrape time
+# (pool sizes, cache counters). Each worker process exposes its own numbers.
+# -------------------------------------------------
+
+# Seconds; covers quick DB reads up to slow full imports
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Collected:
+    """A gauge or counter whose samples come from `collect()` at scrape time."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str], collect: Callable[[], Iterable[Tuple[LabelValues, float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+_registry: List = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            # A failing collector must not take the whole scrape down
+            print(f"Error collecting metric {metric.name}: {e}")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------------------------
+# Inbound requests (recorded by the middleware in main.py)
+# -------------------------------------------------
+
+http_requests_total = register(Counter(
+    "http_requests_total", "HTTP requests served, by route template and status.", ("method", "route", "status"),
+))
+http_request_duration_seconds = register(Histogram(
+    "http_request_duration_seconds", "Time to produce the response (streamed bodies excluded).", ("method", "route"),
+))
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    http_requests_total.inc(method=method, route=route, status=str(status))
+    http_request_duration_seconds.observe(seconds, method=method, route=route)
+
+
+# -------------------------------------------------
+# Outbound calls to GitHub / Notion (recorded in http_client.py)
+# -------------------------------------------------
+
+upstream_requests_total = register(Counter(
+    "upstream_requests_total", "Outbound HTTP calls by upstream host and status (\"error\" for connection failures).",
+    ("host", "method", "status"),
+))
+upstream_request_duration_seconds = register(Histogram(
+    "upstream_request_duration_seconds", "Outbound HTTP call latency by upstream host.", ("host", "method"),
+))
+upstream_wait_seconds_total = register(Counter(
+    "upstream_wait_seconds_total", "Time spent waiting on rate limits and retry backoff before outbound calls.", ("host",),
+))
+
+
+def upstream_host(url) -> str:
+    return urlsplit(str(url)).hostname or "unknown"
+
+
+def observe_upstream(url, method: str, status, seconds: Optional[float]) -> None:
+    host = upstream_host(url)
+    upstream_requests_total.inc(host=host, method=method.upper(), status=str(status))
+    if seconds is not None:
+        upstream_request_duration_seconds.observe(seconds, host=host, method=method.upper())
+
+
+def observe_upstream_wait(url, seconds: float) -> None:
+    if seconds > 0:
+        upstream_wait_seconds_total.inc(seconds, host=upstream_host(url))
+
+
+# -------------------------------------------------
+# SQL (engine events) and connection pools
+# -------------------------------------------------
+
+db_query_duration_seconds = register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by engine and statement type.", ("engine", "operation"),
+))
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "ALTER", "DROP", "PRAGMA", "WITH", "REPLACE"}
+_instrumented: Dict[str, object] = {}
+
+
+def _sql_operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in _SQL_OPERATIONS else "OTHER"
+
+
+def instrument_engine(name: str, engine) -> None:
+    """Times every statement run on `engine` (a sync Engine, or an AsyncEngine's sync_engine) and exposes its pool."""
+    if name in _instrumented:
+        return
+    _instrumented[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["_query_started"].pop()
+        db_query_duration_seconds.observe(time.perf_counter() - started, engine=name, operation=_sql_operation(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("_query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+def _pool_samples(stat: str):
+    for name, engine in list(_instrumented.items()):
+        pool = engine.pool
+        reader = getattr(pool, stat, None)
+        if callable(reader):
+            yield (name,), reader()
+
+
+for _stat, _doc in (
+    ("size", "Configured pool size."),
+    ("checkedout", "Connections currently checked out of the pool."),
+    ("checkedin", "Idle connections in the pool."),
+    ("overflow", "Connections opened beyond the pool size."),
+):
+    register(Collected(f"db_pool_{_stat}", _doc, "gauge", ("engine",), lambda _stat=_stat: _pool_samples(_stat)))
+
+
+# -------------------------------------------------
+# Caches
+# -------------------------------------------------
+
+def _http_cache_samples():
+    from .http_cache import cache_stats
+    return [((event_name,), value) for event_name, value in cache_stats().items()]
+
+
+def _response_cache_samples():
+    from .response_cache import response_cache_stats
+    return [((event_name,), value) for event_name, value in response_cache_stats().items() if event_name != "entries"]
+
+
+register(Collected(
+    "http_cache_events_total", "Upstream response cache events (hits, misses, revalidations, stores, evictions).",
+    "counter", ("event",), _http_cache_samples,
+))
+register(Collected(
+    "response_cache_events_total", "Read-endpoint response cache events (hits, misses, not_modified).",
+    "counter", ("event",), _response_cache_samples,
+))
+
+
+# -------------------------------------------------
+# Webhooks
+# -------------------------------------------------
+
+# Read only when the GitHub integration is loaded, so scraping never imports it
+def _webhook_samples():
+    from .registry import is_enabled
+    if not is_enabled("github"):
+        return []
+    from .github_webhook import webhook_queue
+    return [((event_name,), value) for event_name, value in webhook_queue.stats.items()]
+
+
+def _webhook_depth_samples():
+    from .registry import is_enabled
+    if not is_enabled("github"):
+        return []
+    from .github_webhook import webhook_queue
+    return [((), webhook_queue.depth())]
+
+
+register(Collected(
+    "github_webhook_events_total", "Repository updates from GitHub webhooks (received, coalesced into a pending one, processed, failed).",
+    "counter", ("event",), _webhook_samples,
+))
+register(Collected(
+    "github_webhook_queue_depth", "Repository updates waiting to be applied.", "gauge", (), _webhook_depth_samples,
+))
+
+
+# -------------------------------------------------
+# Integrations (see registry.py)
+# -------------------------------------------------
+
+def _integration_import_samples():
+    from .registry import import_seconds
+    return [((name,), seconds) for name, seconds in import_seconds.items()]
+
+
+register(Collected(
+    "integration_import_seconds", "Seconds each enabled integration took to import at startup.",
+    "gauge", ("integration",), _integration_import_samples,
+))
+
+
+# -------------------------------------------------
+# Scheduled resyncs (see sync_scheduler.py)
+# -------------------------------------------------
+
+sync_runs_total = register(Counter(
+    "sync_runs_total", "Scheduled resyncs finished, by import kind and outcome (succeeded, failed, revoked).", ("kind", "outcome"),
+))
+sync_run_duration_seconds = register(Histogram(
+    "sync_run_duration_seconds", "Duration of scheduled resyncs, including time queued for a job worker.", ("kind",),
+))
+
+
+def observe_sync(kind: str, outcome: str, seconds: Optional[float]) -> None:
+    sync_runs_total.inc(kind=kind, outcome=outcome)
+    if seconds is not None:
+        sync_run_duration_seconds.observe(seconds, kind=kind)
+
+
+# -------------------------------------------------
+# Authentication (see auth/security.py)
+# -------------------------------------------------
+
+password_hash_seconds = register(Histogram(
+    "password_hash_seconds", "bcrypt time per call in the hashing pool.", ("operation",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0),
+))
+password_hash_queue_seconds = register(Histogram(
+    "password_hash_queue_seconds", "Time hashing calls waited for a free pool worker.", ("operation",),
+))
+password_hash_rejected_total = register(Counter(
+    "password_hash_rejected_total", "Hashing calls refused with 503 because PASSWORD_HASH_MAX_PENDING were in progress.",
+))
+
+
+def observe_password_hash(operation: str, waited: float, seconds: float) -> None:
+    password_hash_queue_seconds.observe(max(0.0, waited), operation=operation)
+    password_hash_seconds.observe(seconds, operation=operation)
+
+
+def _password_pending_samples():
+    from ..auth.security import password_pool_pending
+    return [((), password_pool_pending())]
+
+
+def _jwt_cache_samples():
+    from ..auth.security import jwt_cache_stats
+    return [((event_name,), value) for event_name, value in jwt_cache_stats().items()]
+
+
+register(Collected(
+    "password_hash_pending", "Hashing calls queued or running in the pool.", "gauge", (), _password_pending_samples,
+))
+register(Collected(
+    "jwt_cache_events_total", "Decoded access token cache events (hits skip signature verification).",
+    "counter", ("event",), _jwt_cache_samples,
+))
@@ -0,0 +1,251 @@
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+from sqlalchemy import Engine, MetaData, UniqueConstraint, delete, func, inspect, literal, select, update
+from sqlalchemy.schema import CreateTable
+from .accounts import token_digest
+from .models import metadata, platform_accounts, projects, project_contents, project_skills
+
+# -------------------------------------------------
+# Schema upgrades for databases created by older versions of the models.
+#
+# create_all() only creates missing tables, so columns, indexes and unique
+# constraints later added to an existing table are applied here, driven by the
+# models themselves. Each step checks the live schema first: on an up-to-date
+# database this costs a few inspector queries and changes nothing.
+#
+# Data fixes run before the constraints that need them, and only while those
+# constraints are still missing:
+# - platform_accounts.token_digest is filled from access_token
+# - projects.external_id is recovered for legacy Notion rows (their content was
+#   "Imported Notion Page ID: <id>"); legacy GitHub rows are claimed by title
+#   on their next import (see project_sync.adopt_legacy_projects)
+# - duplicate projects left by the old insert-every-time importers are removed
+#
+# Indexes and unique constraints the models dropped are removed (RETIRED_INDEXES).
+# -------------------------------------------------
+
+PROJECTS_UNIQUE = "uq_projects_student_source_external"
+TOKEN_DIGEST_INDEX = "ix_platform_accounts_token_digest"
+
+# {table name: names of indexes/unique constraints older models declared}
+RETIRED_INDEXES = {
+    # Replaced by uq_projects_student_source_external: titles are not unique on Notion
+    "projects": ("uq_projects_student_title",),
+}
+
+LEGACY_NOTION_PREFIX = "Imported Notion Page ID: "
+
+
+def _column_ddl(conn, column) -> str:
+    preparer = conn.dialect.identifier_preparer
+    ddl = f"{preparer.quote(column.name)} {column.type.compile(dialect=conn.dialect)}"
+    if not column.nullable:
+        # Existing rows need a value; the model's scalar default is used for them
+        default = literal(column.default.arg, column.type).compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" NOT NULL DEFAULT {default}"
+    return ddl
+
+
+def _add_missing_columns(conn, existing_tables: Set[str]) -> None:
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present:
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {_column_ddl(conn, column)}")
+                print(f"Added column {table.name}.{column.name}")
+
+
+def _missing_indexes(conn, existing_tables: Set[str]) -> Dict[str, List]:
+    """{table name: [Index or named UniqueConstraint of the models absent from the database]}"""
+    inspector = inspect(conn)
+    missing: Dict[str, List] = {}
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        present |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        wanted = list(table.indexes) + [
+            constraint for constraint in table.constraints
+            if isinstance(constraint, UniqueConstraint) and constraint.name
+        ]
+        absent = [item for item in wanted if item.name not in present]
+        if absent:
+            missing[table.name] = absent
+    return missing
+
+
+def _create_indexes(conn, table_name: str, items: List) -> None:
+    preparer = conn.dialect.identifier_preparer
+    for item in items:
+        if isinstance(item, UniqueConstraint):
+            # SQLite cannot add a constraint to an existing table; a unique index enforces the same
+            columns = ", ".join(preparer.quote(column.name) for column in item.columns)
+            conn.exec_driver_sql(
+                f"CREATE UNIQUE INDEX {preparer.quote(item.name)} ON {preparer.quote(table_name)} ({columns})"
+            )
+        else:
+            item.create(conn)
+        print(f"Created index {item.name} on {table_name}")
+
+
+def _rebuild_sqlite_table(conn, table) -> None:
+    """
+    SQLite cannot drop a constraint declared in CREATE TABLE, so the table is
+    recreated from the model and its rows copied over. Its indexes go with the old
+    table and are recreated like any other missing index.
+    """
+    preparer = conn.dialect.identifier_preparer
+    scratch = MetaData()
+    for other in metadata.sorted_tables:
+        if other is not table:
+            other.to_metadata(scratch)
+    staging = table.to_metadata(scratch, name=f"{table.name}__rebuild")
+
+    columns = ", ".join(preparer.quote(column.name) for column in table.columns)
+    conn.execute(CreateTable(staging))
+    conn.exec_driver_sql(
+        f"INSERT INTO {preparer.quote(staging.name)} ({columns}) SELECT {columns} FROM {preparer.quote(table.name)}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {preparer.quote(table.name)}")
+    conn.exec_driver_sql(f"ALTER TABLE {preparer.quote(staging.name)} RENAME TO {preparer.quote(table.name)}")
+
+
+def _drop_retired_indexes(conn, existing_tables: Set[str]) -> bool:
+    """Drops RETIRED_INDEXES still present; returns whether anything was dropped."""
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    dropped = False
+    for table_name, names in RETIRED_INDEXES.items():
+        if table_name not in existing_tables:
+            continue
+        indexes = {index["name"] for index in inspector.get_indexes(table_name)}
+        constraints = {constraint["name"] for constraint in inspector.get_unique_constraints(table_name)}
+        for name in names:
+            if name not in indexes and name not in constraints:
+                continue
+            if conn.dialect.name == "mysql":
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.quote(table_name)} DROP INDEX {preparer.quote(name)}")
+            elif name in indexes:
+                conn.exec_driver_sql(f"DROP INDEX {preparer.quote(name)}")
+            elif conn.dialect.name == "sqlite":
+                _rebuild_sqlite_table(conn, metadata.tables[table_name])
+            else:
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.quote(table_name)} DROP CONSTRAINT {preparer.quote(name)}")
+            print(f"Dropped retired index {name} on {table_name}")
+            dropped = True
+    return dropped
+
+
+def backfill_token_digests(conn) -> int:
+    """Fills token_digest for accounts linked before it existed."""
+    rows = conn.execute(
+        select(platform_accounts.c.id, platform_accounts.c.access_token).where(
+            platform_accounts.c.token_digest.is_(None) & platform_accounts.c.access_token.is_not(None)
+        )
+    ).all()
+    for row in rows:
+        conn.execute(
+            update(platform_accounts).where(platform_accounts.c.id == row.id).values(token_digest=token_digest(row.access_token))
+        )
+    return len(rows)
+
+
+def backfill_notion_external_ids(conn) -> int:
+    """Recovers the page id of Notion projects imported before external_id existed."""
+    rows = conn.execute(
+        select(projects.c.id, projects.c.content).where(
+            (projects.c.source_platform == "Notion")
+            & projects.c.external_id.is_(None)
+            & projects.c.content.like(f"{LEGACY_NOTION_PREFIX}%")
+        )
+    ).all()
+    for row in rows:
+        conn.execute(
+            update(projects).where(projects.c.id == row.id)
+            .values(external_id=row.content[len(LEGACY_NOTION_PREFIX):].strip())
+        )
+    return len(rows)
+
+
+def delete_projects(conn, project_ids: List[int]) -> None:
+    """Deletes projects with their skills and content links (SQLite does not enforce the cascades)."""
+    from .search import BODY_FTS_TABLE, index_project_bodies
+    from .skills import refresh_student_skill_counts
+
+    if not project_ids:
+        return
+    touched: Set[Tuple[int, str]] = {
+        (row.student_id, row.skill)
+        for row in conn.execute(
+            select(project_skills.c.student_id, project_skills.c.skill).where(project_skills.c.project_id.in_(project_ids))
+        )
+    }
+    conn.execute(delete(project_skills).where(project_skills.c.project_id.in_(project_ids)))
+    # On an old database the body index is only created later, by ensure_search_index
+    if BODY_FTS_TABLE in inspect(conn).get_table_names():
+        index_project_bodies(conn, dict(conn.execute(
+            select(project_contents.c.project_id, project_contents.c.content_hash).where(project_contents.c.project_id.in_(project_ids))
+        ).all()), {})
+    conn.execute(delete(project_contents).where(project_contents.c.project_id.in_(project_ids)))
+    conn.execute(delete(projects).where(projects.c.id.in_(project_ids)))
+    refresh_student_skill_counts(conn, touched)
+
+
+def dedupe_projects(conn) -> int:
+    """
+    Removes duplicate projects, keeping the oldest row of each: the same
+    (student, platform, external_id), or for rows without an external_id the
+    same (student, platform, title), which is what the old importers matched on.
+    """
+    keyed = projects.c.external_id.is_not(None)
+    groups = [
+        (keyed, (projects.c.student_id, projects.c.source_platform, projects.c.external_id)),
+        (~keyed, (projects.c.student_id, projects.c.source_platform, projects.c.title)),
+    ]
+    duplicates: List[int] = []
+    for condition, key in groups:
+        keep = {
+            tuple(row[:-1]): row[-1]
+            for row in conn.execute(
+                select(*key, func.min(projects.c.id)).where(condition).group_by(*key).having(func.count() > 1)
+            )
+        }
+        if not keep:
+            continue
+        by_key: Dict[Tuple, List[int]] = defaultdict(list)
+        for row in conn.execute(select(*key, projects.c.id).where(condition)):
+            if tuple(row[:-1]) in keep and row[-1] != keep[tuple(row[:-1])]:
+                by_key[tuple(row[:-1])].append(row[-1])
+        duplicates.extend(project_id for ids in by_key.values() for project_id in ids)
+
+    delete_projects(conn, duplicates)
+    return len(duplicates)
+
+
+def upgrade_schema(bind: Engine) -> None:
+    """Brings an existing database up to the current models (see above). Safe to call on every start."""
+    with bind.begin() as conn:
+        existing_tables = set(inspect(conn).get_table_names())
+        _add_missing_columns(conn, existing_tables)
+        missing = _missing_indexes(conn, existing_tables)
+
+        missing_names = {item.name for items in missing.values() for item in items}
+        if TOKEN_DIGEST_INDEX in missing_names:
+            filled = backfill_token_digests(conn)
+            if filled:
+                print(f"Backfilled token_digest for {filled} linked accounts")
+        if PROJECTS_UNIQUE in missing_names:
+            recovered = backfill_notion_external_ids(conn)
+            removed = dedupe_projects(conn)
+            if recovered or removed:
+                print(f"Recovered external_id for {recovered} Notion projects, removed {removed} duplicate projects")
+
+        if _drop_retired_indexes(conn, existing_tables):
+            # A rebuilt table comes back with its constraints but without its indexes
+            missing = _missing_indexes(conn, existing_tables)
+        for table_name, items in missing.items():
+            _create_indexes(conn, table_name, items)
@@ -1,13 +1,7 @@
-from sqlalchemy import create_engine, Table, Column, Integer, String, ForeignKey, JSON, MetaData, UniqueConstraint
-import os
-
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
-engine = create_engine(
-    DATABASE_URL,
-    echo=True,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+from sqlalchemy import Table, Column, Integer, String, CHAR, Boolean, DateTime, ForeignKey, JSON, LargeBinary, MetaData, UniqueConstraint, Index
+from sqlalchemy.dialects.mysql import LONGBLOB
 
+# Table definitions only; the engine lives in db.py and tables are created by db.init_db()
 metadata = MetaData()
 
 students = Table(
@@ -25,8 +19,12 @@ platform_accounts = Table(
     Column("student_id", Integer, ForeignKey("students.id")),
     Column("platform_name", String(255)),
     Column("access_token", String(500)),
+    # sha256 hex of access_token; lookups go through this indexed column (see accounts.py)
+    Column("token_digest", CHAR(64), index=True),
     Column("refresh_token", String(500), nullable=True),
     Column("platform_user_id", String(255)), 
+    # Start time of the last complete import; upstream items not changed since are skipped
+    Column("last_synced_at", DateTime, nullable=True),
     UniqueConstraint("platform_user_id", name="uq_platform_user_id"),
 )
 
@@ -40,6 +38,132 @@ projects = Table(
     Column("context", String(255)),
     Column("type", String(255)),
     Column("source_platform", String(255)),
+    # The item's id on its platform (GitHub repo id, Notion page id)
+    Column("external_id", String(255)),
+    # Upstream change stamp (GitHub pushed_at/updated_at, Notion last_edited_time) as of the last import
+    Column("source_updated_at", String(64), nullable=True),
+    # Set when the item was no longer returned by its platform on the last full sync
+    Column("missing_upstream", Boolean, default=False, nullable=False),
+    UniqueConstraint("student_id", "source_platform", "external_id", name="uq_projects_student_source_external"),
+    # Keyset pages of one student's projects (see project_queries.projects_page_stmt)
+    Index("ix_projects_student_id_id", "student_id", "id"),
+    # Webhooks look a repository up across all students
+    Index("ix_projects_source_external", "source_platform", "external_id"),
+)
+
+# projects.content is a String(2000) preview; longer text is cut to fit, and the
+# full body is kept compressed in content_blobs (see content_store.py)
+CONTENT_MAX_LENGTH = 2000
+
+# Optional key of an imported row carrying the untruncated body; save_projects()
+# moves it to content_blobs instead of the projects table. An empty value removes
+# the stored body; rows without the key leave it as it is
+FULL_CONTENT_KEY = "full_content"
+
+
+def truncate_content(text):
+    if text and len(text) > CONTENT_MAX_LENGTH:
+        return text[:CONTENT_MAX_LENGTH - 3] + "..."
+    return text
+
+# Imported projects are identified by these columns when upserting (see upsert.py)
+PROJECT_KEY_COLUMNS = ("student_id", "source_platform", "external_id")
+
+# Background imports (see jobs.py); persisted so their status survives a restart
+import_jobs = Table(
+    "import_jobs", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("student_id", Integer, ForeignKey("students.id"), index=True),
+    Column("kind", String(64)),
+    Column("state", String(16)),
+    Column("items_processed", Integer, default=0),
+    Column("error", String(2000), nullable=True),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    Column("finished_at", DateTime, nullable=True),
+    # "<student_id>:<kind>" while queued or running, NULL once finished: the unique
+    # constraint lets only one process start a given import at a time
+    Column("active_key", String(80), nullable=True),
+    UniqueConstraint("active_key", name="uq_import_jobs_active_key"),
+)
+
+# Normalized skills (see skills.py): one row per skill found in a project, from its
+# languages and keywords in its title/content, filled in on every import
+project_skills = Table(
+    "project_skills", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("project_id", Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+    Column("student_id", Integer, ForeignKey("students.id"), nullable=False),
+    Column("skill", String(100), nullable=False),
+    # "language" (GitHub language stats) or "keyword" (found in the text)
+    Column("source", String(32), nullable=False),
+    # Bytes of code for languages, number of mentions for keywords
+    Column("weight", Integer, nullable=False, default=0),
+    UniqueConstraint("project_id", "skill", name="uq_project_skills_project_skill"),
+    Index("ix_project_skills_student_skill", "student_id", "skill"),
+)
+
+# Per-student counts of projects showing each skill, kept up to date from project_skills
+student_skills = Table(
+    "student_skills", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("student_id", Integer, ForeignKey("students.id"), nullable=False),
+    Column("skill", String(100), nullable=False),
+    Column("project_count", Integer, nullable=False, default=0),
+    UniqueConstraint("student_id", "skill", name="uq_student_skills_student_skill"),
+    Index("ix_student_skills_skill_count", "skill", "project_count"),
 )
 
-metadata.create_all(engine)
\ No newline at end of file
+# Full README / page bodies, compressed and stored once per distinct content (sha256)
+content_blobs = Table(
+    "content_blobs", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("content_hash", CHAR(64), nullable=False),
+    # Compression of body, e.g. "zlib"
+    Column("encoding", String(16), nullable=False),
+    Column("body", LargeBinary().with_variant(LONGBLOB(), "mysql"), nullable=False),
+    # Uncompressed size in bytes
+    Column("size", Integer, nullable=False),
+    UniqueConstraint("content_hash", name="uq_content_blobs_hash"),
+)
+
+# Which blob holds each project's current full body
+project_contents = Table(
+    "project_contents", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("project_id", Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+    Column("content_hash", CHAR(64), nullable=False, index=True),
+    Column("updated_at", DateTime),
+    UniqueConstraint("project_id", name="uq_project_contents_project"),
+)
+
+# Response cache generations (see response_cache.py): one row per scope, bumped after
+# every write to it so that all workers stop serving responses cached before it
+cache_generations = Table(
+    "cache_generations", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("scope", String(255), nullable=False),
+    Column("generation", Integer, nullable=False, default=0),
+    UniqueConstraint("scope", name="uq_cache_generations_scope"),
+)
+
+# Scheduled resyncs (see sync_scheduler.py): per student and import kind, when the
+# last scheduled run succeeded and how long failing ones are backed off
+sync_schedule = Table(
+    "sync_schedule", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("student_id", Integer, ForeignKey("students.id"), nullable=False),
+    # An import kind from jobs.IMPORTERS
+    Column("kind", String(64), nullable=False),
+    Column("last_attempt_at", DateTime, nullable=True),
+    Column("last_success_at", DateTime, nullable=True),
+    # Not retried before this time after a failure
+    Column("retry_after", DateTime, nullable=True),
+    Column("failures", Integer, nullable=False, default=0),
+    # The last failure was a 401: the token is revoked or expired
+    Column("revoked", Boolean, nullable=False, default=False),
+    # Digest of the token that failed; a new token clears the backoff
+    Column("token_digest", CHAR(64), nullable=True),
+    Column("last_error", String(2000), nullable=True),
+    UniqueConstraint("student_id", "kind", name="uq_sync_schedule_student_kind"),
+)
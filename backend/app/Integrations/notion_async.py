@@ -0,0 +1,148 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from notion_client import AsyncClient
+from typing import Any, AsyncIterator, Dict, List, Optional
+from . import Notion_integration as ni
+from .db import get_async_engine
+from .accounts import get_student_id_from_token_async
+from .http_cache import cached_call_async
+from .http_client import notion_async_http_client
+from .notion_content import get_page_tree_async, render_markdown
+from .project_queries import dumps
+from .project_sync import load_stored_projects
+from .response_cache import NOTION_SCOPE, cached_response_async, invalidate_student_async
+
+# Async versions of the Notion routes (enabled with INTEGRATIONS_ASYNC=1), built on
+# notion_client.AsyncClient and the async engine. Parsing, change detection and
+# upserts are shared with Notion_integration.
+_notion: Optional[AsyncClient] = None
+
+
+def get_notion() -> AsyncClient:
+    """The shared async Notion client, built on first use (503 without NOTION_TOKEN)."""
+    global _notion
+    if _notion is None:
+        _notion = AsyncClient(auth=ni.notion_token(), client=notion_async_http_client(), base_url=ni.NOTION_BASE_URL)
+    return _notion
+
+router = APIRouter()
+
+
+async def search_pages(start_cursor: Optional[str] = None):
+    kwargs = {"query": "", "filter": {"value": "page", "property": "object"}, "page_size": 100}
+    if start_cursor:
+        kwargs["start_cursor"] = start_cursor
+    return await cached_call_async(
+        "notion.search", (ni.notion_cache_scope(), "page", start_cursor), ni.NOTION_CACHE_TTL,
+        lambda: get_notion().search(**kwargs),
+    )
+
+
+async def aiter_search_pages() -> AsyncIterator[List[Dict[str, Any]]]:
+    cursor = None
+    while True:
+        response = await search_pages(cursor)
+        yield response.get("results", [])
+        if not response.get("has_more"):
+            return
+        cursor = response.get("next_cursor")
+
+
+async def page_markdown(page_id: str, last_edited_time: str) -> str:
+    return render_markdown(await get_page_tree_async(get_notion(), ni.notion_cache_scope(), page_id, last_edited_time))
+
+
+async def import_notion_pages(student_id: int) -> int:
+    """Async import_notion_pages: same pagination, incremental sync and upserts."""
+    engine = get_async_engine()
+    async with engine.connect() as conn:
+        stored = await conn.run_sync(load_stored_projects, student_id, "Notion")
+    seen = set()
+
+    processed = 0
+    async for items in aiter_search_pages():
+        seen.update(item["id"] for item in items)
+        changed, reappeared = ni.plan_notion_page(items, stored)
+        rows = [
+            ni.build_page_row(student_id, item, await page_markdown(item["id"], item["last_edited_time"]))
+            for item in changed
+        ]
+
+        async with engine.begin() as conn:
+            await conn.run_sync(ni.save_notion_rows, student_id, rows, reappeared)
+        await invalidate_student_async(student_id)
+        processed += len(items)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(ni.finish_notion_sync, student_id, stored, seen)
+    await invalidate_student_async(student_id)
+
+    return processed
+
+
+@router.get("/notion/test")
+async def notion_test():
+    try:
+        response = await get_notion().search(page_size=1)
+        results = response.get("results", [])
+
+        if results:
+            first_result = results[0]
+            return {
+                "status": "success",
+                "first_result_type": first_result.get("object"),
+                "first_result_id": first_result.get("id")
+            }
+        else:
+            return {"status": "success", "message": "No pages found, but token recognized."}
+
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+
+async def _notion_pages_response() -> Response:
+    try:
+        pages = []
+        async for results in aiter_search_pages():
+            for item in results:
+                pages.append({"id": item["id"], "title": ni.page_title(item)})
+        return Response(content=dumps(pages), media_type="application/json")
+
+    except Exception as e:
+        print("NOTION ERROR:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/notion/pages")
+async def list_notion_pages(request: Request):
+    ni.notion_token()
+    return await cached_response_async(request, NOTION_SCOPE, _notion_pages_response, ttl=ni.NOTION_CACHE_TTL)
+
+
+@router.get("/notion/page/{page_id}")
+async def get_page_content(page_id: str):
+    """All blocks of the page, nested children included, plus the page rendered as markdown."""
+    ni.notion_token()
+    try:
+        page = await cached_call_async(
+            "notion.pages.retrieve", (ni.notion_cache_scope(), page_id), ni.NOTION_CACHE_TTL,
+            lambda: get_notion().pages.retrieve(page_id),
+        )
+        blocks = await get_page_tree_async(get_notion(), ni.notion_cache_scope(), page_id, page["last_edited_time"])
+        return {"object": "list", "results": blocks, "markdown": render_markdown(blocks)}
+    except Exception as e:
+        print("NOTION ERROR:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/notion/load_pages")
+async def load_notion_pages(access_token: str):
+    student_id = await get_student_id_from_token_async(access_token)
+    ni.notion_token()
+
+    try:
+        imported = await import_notion_pages(student_id)
+        return {"message": f"Imported {imported} Notion pages."}
+
+    except Exception as e:
+        print("NOTION ERROR:", e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,180 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from .http_cache import cached_call, cached_call_async
+
+# Notion allows about 3 requests per second per integration, so child blocks are
+# walked a few at a time
+NOTION_FETCH_CONCURRENCY = int(os.getenv("NOTION_FETCH_CONCURRENCY", "3"))
+# Trees are cached under the page's last_edited_time, so an entry can only go stale
+# by being superseded; the TTL just bounds how long unused entries linger
+NOTION_TREE_CACHE_TTL = float(os.getenv("NOTION_TREE_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Blocks whose children are separate pages/databases, imported on their own
+_DETACHED_TYPES = ("child_page", "child_database")
+
+
+def list_all_children(notion, block_id: str) -> List[Dict[str, Any]]:
+    """Every child block of `block_id`, following start_cursor through all result pages."""
+    blocks: List[Dict[str, Any]] = []
+    cursor: Optional[str] = None
+    while True:
+        kwargs = {"page_size": 100}
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        response = notion.blocks.children.list(block_id, **kwargs)
+        blocks.extend(response.get("results", []))
+        if not response.get("has_more"):
+            return blocks
+        cursor = response.get("next_cursor")
+
+
+def fetch_block_tree(notion, page_id: str) -> List[Dict[str, Any]]:
+    """
+    The page's blocks with nested children attached under "children".
+    The tree is walked level by level, fetching each level's children concurrently.
+    """
+    top = list_all_children(notion, page_id)
+    level = top
+    with ThreadPoolExecutor(max_workers=NOTION_FETCH_CONCURRENCY, thread_name_prefix="notion-blocks") as pool:
+        while level:
+            parents = [block for block in level if block.get("has_children") and block.get("type") not in _DETACHED_TYPES]
+            children = pool.map(lambda block: list_all_children(notion, block["id"]), parents)
+            level = []
+            for parent, kids in zip(parents, children):
+                parent["children"] = kids
+                level.extend(kids)
+    return top
+
+
+def get_page_tree(notion, cache_scope: str, page_id: str, last_edited_time: str) -> List[Dict[str, Any]]:
+    """fetch_block_tree, cached by the page's last_edited_time so unchanged pages are walked only once."""
+    return cached_call(
+        "notion.page_tree", (cache_scope, page_id, last_edited_time), NOTION_TREE_CACHE_TTL,
+        lambda: fetch_block_tree(notion, page_id),
+    )
+
+
+async def list_all_children_async(notion, block_id: str) -> List[Dict[str, Any]]:
+    """list_all_children for the async Notion client."""
+    blocks: List[Dict[str, Any]] = []
+    cursor: Optional[str] = None
+    while True:
+        kwargs = {"page_size": 100}
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        response = await notion.blocks.children.list(block_id, **kwargs)
+        blocks.extend(response.get("results", []))
+        if not response.get("has_more"):
+            return blocks
+        cursor = response.get("next_cursor")
+
+
+async def fetch_block_tree_async(notion, page_id: str) -> List[Dict[str, Any]]:
+    """fetch_block_tree for the async Notion client, at most NOTION_FETCH_CONCURRENCY requests in flight."""
+    semaphore = asyncio.Semaphore(NOTION_FETCH_CONCURRENCY)
+
+    async def children_of(block: Dict[str, Any]) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await list_all_children_async(notion, block["id"])
+
+    top = await list_all_children_async(notion, page_id)
+    level = top
+    while level:
+        parents = [block for block in level if block.get("has_children") and block.get("type") not in _DETACHED_TYPES]
+        children = await asyncio.gather(*(children_of(block) for block in parents))
+        level = []
+        for parent, kids in zip(parents, children):
+            parent["children"] = kids
+            level.extend(kids)
+    return top
+
+
+async def get_page_tree_async(notion, cache_scope: str, page_id: str, last_edited_time: str) -> List[Dict[str, Any]]:
+    """get_page_tree for the async Notion client; shares its cache entries."""
+    return await cached_call_async(
+        "notion.page_tree", (cache_scope, page_id, last_edited_time), NOTION_TREE_CACHE_TTL,
+        lambda: fetch_block_tree_async(notion, page_id),
+    )
+
+
+# --------------------------
+# Markdown rendering
+# --------------------------
+def _rich_text(items: List[Dict[str, Any]]) -> str:
+    parts = []
+    for item in items or []:
+        text = item.get("plain_text", "")
+        annotations = item.get("annotations") or {}
+        if annotations.get("code"):
+            text = f"`{text}`"
+        if annotations.get("bold"):
+            text = f"**{text}**"
+        if annotations.get("italic"):
+            text = f"*{text}*"
+        if item.get("href"):
+            text = f"[{text}]({item['href']})"
+        parts.append(text)
+    return "".join(parts)
+
+
+def _file_url(data: Dict[str, Any]) -> str:
+    return (data.get("file") or data.get("external") or {}).get("url", "") or data.get("url", "")
+
+
+def _render_block(block: Dict[str, Any], depth: int, number: int) -> List[str]:
+    block_type = block.get("type", "")
+    data = block.get(block_type) or {}
+    text = _rich_text(data.get("rich_text", []))
+    indent = "  " * depth
+
+    if block_type == "paragraph":
+        line = text
+    elif block_type in ("heading_1", "heading_2", "heading_3"):
+        line = "#" * int(block_type[-1]) + " " + text
+    elif block_type == "bulleted_list_item":
+        line = f"- {text}"
+    elif block_type == "numbered_list_item":
+        line = f"{number}. {text}"
+    elif block_type == "to_do":
+        line = f"- [{'x' if data.get('checked') else ' '}] {text}"
+    elif block_type == "toggle":
+        line = f"- {text}"
+    elif block_type in ("quote", "callout"):
+        line = f"> {text}"
+    elif block_type == "code":
+        line = f"```{data.get('language', '')}\n{text}\n```"
+    elif block_type == "equation":
+        line = f"$${data.get('expression', '')}$$"
+    elif block_type == "divider":
+        line = "---"
+    elif block_type == "child_page":
+        line = f"[{data.get('title', 'Untitled Page')}]"
+    elif block_type == "table_row":
+        line = "| " + " | ".join(_rich_text(cell) for cell in data.get("cells", [])) + " |"
+    elif block_type in ("image", "file", "pdf", "video", "bookmark", "embed", "link_preview"):
+        caption = _rich_text(data.get("caption", [])) or block_type
+        line = f"[{caption}]({_file_url(data)})"
+    else:
+        line = text
+
+    lines = [indent + line] if line else []
+    # List items nest their children; other containers (columns, tables, synced blocks) render inline
+    child_depth = depth + 1 if block_type.endswith("list_item") or block_type in ("to_do", "toggle") else depth
+    lines.extend(render_blocks(block.get("children", []), child_depth))
+    return lines
+
+
+def render_blocks(blocks: List[Dict[str, Any]], depth: int = 0) -> List[str]:
+    lines: List[str] = []
+    number = 0
+    for block in blocks:
+        number = number + 1 if block.get("type") == "numbered_list_item" else 0
+        lines.extend(_render_block(block, depth, number))
+    return lines
+
+
+def render_markdown(blocks: List[Dict[str, Any]]) -> str:
+    """Renders a block tree (as returned by fetch_block_tree) to markdown."""
+    return "\n".join(render_blocks(blocks)).strip()
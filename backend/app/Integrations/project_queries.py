@@ -0,0 +1,83 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from .models import projects, PROJECT_KEY_COLUMNS
+
+# Read-side helpers for listing a student's projects, shared by the sync and async routers
+
+PROJECT_FIELDS = tuple(projects.c.keys())
+LIST_FORMATS = ("json", "ndjson")
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """
+    Column names requested with ?fields=a,b,c (all columns when omitted).
+    "id" is always included since it is the pagination cursor.
+    """
+    if not fields:
+        return list(PROJECT_FIELDS)
+
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PROJECT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown project fields: {', '.join(unknown)}")
+    if "id" not in names:
+        names.insert(0, "id")
+    return names
+
+
+def validate_list_params(format: str, limit: Optional[int]) -> None:
+    if format not in LIST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+
+def project_ids_by_key(conn, rows: List[Dict[str, Any]]) -> Dict[Tuple, int]:
+    """{(student_id, source_platform, external_id): projects.id} for imported rows, in one query."""
+    key_cols = [projects.c[name] for name in PROJECT_KEY_COLUMNS]
+    keys = [tuple(row[name] for name in PROJECT_KEY_COLUMNS) for row in rows]
+    if not keys:
+        return {}
+    return {
+        tuple(found[:-1]): found[-1]
+        for found in conn.execute(select(*key_cols, projects.c.id).where(tuple_(*key_cols).in_(keys)))
+    }
+
+
+def projects_page_stmt(student_id: int, field_names: List[str], after: Optional[int], limit: Optional[int]):
+    """
+    Keyset-paginated select of a student's projects: rows with id > `after`, in id
+    order, so every page is an index range scan no matter how deep the client pages.
+    """
+    stmt = select(*(projects.c[name] for name in field_names)).where(projects.c.student_id == student_id)
+    if after is not None:
+        stmt = stmt.where(projects.c.id > after)
+    stmt = stmt.order_by(projects.c.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def next_cursor_headers(rows: List[Dict[str, Any]], limit: Optional[int]) -> Dict[str, str]:
+    """X-Next-Cursor (the id to pass as ?after=) when the page came back full."""
+    if limit is not None and len(rows) == limit:
+        return {"X-Next-Cursor": str(rows[-1]["id"])}
+    return {}
+
+
+# Column keys come back as sqlalchemy's quoted_name (a str subclass), which orjson
+# only accepts with OPT_NON_STR_KEYS
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, option=_ORJSON_OPTIONS)
+
+
+def ndjson_lines(rows: Iterable[Any]) -> Iterable[bytes]:
+    """One JSON document per row, newline-terminated."""
+    for row in rows:
+        yield dumps(dict(row._mapping)) + b"\n"
@@ -0,0 +1,88 @@
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from sqlalchemy import select, update
+from .models import projects, FULL_CONTENT_KEY, PROJECT_KEY_COLUMNS
+from .upsert import upsert_rows
+from .content_store import delete_project_contents, save_project_contents
+from .project_queries import project_ids_by_key
+from .skills import sync_project_skills
+
+# Shared by the GitHub and Notion importers: how imported items are written to
+# the projects table and reconciled with what the platform still returns.
+
+
+def load_stored_projects(conn, student_id: int, source_platform: str) -> Dict[str, Tuple[Any, bool]]:
+    """The student's stored projects from one platform as {external_id: (source_updated_at, missing_upstream)}."""
+    stmt = select(projects.c.external_id, projects.c.source_updated_at, projects.c.missing_upstream).where(
+        (projects.c.student_id == student_id) & (projects.c.source_platform == source_platform)
+    )
+    return {row.external_id: (row.source_updated_at, row.missing_upstream) for row in conn.execute(stmt)}
+
+
+def adopt_legacy_projects(conn, rows: List[Dict[str, Any]]) -> int:
+    """
+    Gives rows imported before external_id existed (NULL there) the external_id of
+    the incoming row with the same student, platform and title, so the upsert
+    updates them instead of adding a duplicate. One SELECT per student and
+    platform in the batch, which finds nothing once every legacy row is claimed.
+    """
+    incoming: Dict[Tuple[int, str], Dict[str, List[str]]] = {}
+    for row in rows:
+        by_title = incoming.setdefault((row["student_id"], row["source_platform"]), {})
+        by_title.setdefault(row["title"], []).append(row["external_id"])
+
+    claimed = 0
+    for (student_id, source_platform), by_title in incoming.items():
+        legacy = conn.execute(
+            select(projects.c.id, projects.c.title).where(
+                (projects.c.student_id == student_id)
+                & (projects.c.source_platform == source_platform)
+                & projects.c.external_id.is_(None)
+            ).order_by(projects.c.id)
+        ).all()
+        for row in legacy:
+            external_ids = by_title.get(row.title)
+            if external_ids:
+                conn.execute(update(projects).where(projects.c.id == row.id).values(external_id=external_ids.pop(0)))
+                claimed += 1
+    return claimed
+
+
+def save_projects(conn, rows: List[Dict[str, Any]], update_columns: Sequence[str], sync_skills: bool = True) -> None:
+    """
+    Upserts imported projects on (student_id, source_platform, external_id) and
+    refreshes their skills (unless sync_skills is False, for rows whose text is not
+    the real content). Rows may carry their untruncated body under
+    FULL_CONTENT_KEY; it is stored compressed in content_blobs, or removed from
+    there when it is empty. Rows without the key keep their stored body.
+    """
+    if not rows:
+        return
+    adopt_legacy_projects(conn, rows)
+    upsert_rows(
+        conn, projects, [{k: v for k, v in row.items() if k != FULL_CONTENT_KEY} for row in rows],
+        key_columns=PROJECT_KEY_COLUMNS, update_columns=update_columns,
+    )
+    ids = project_ids_by_key(conn, rows)
+    if sync_skills:
+        sync_project_skills(conn, rows, ids)
+    bodies = {
+        ids[key]: row[FULL_CONTENT_KEY]
+        for row in rows
+        if FULL_CONTENT_KEY in row and (key := tuple(row[name] for name in PROJECT_KEY_COLUMNS)) in ids
+    }
+    save_project_contents(conn, {project_id: body for project_id, body in bodies.items() if body})
+    delete_project_contents(conn, [project_id for project_id, body in bodies.items() if not body])
+
+
+def set_missing_upstream(conn, student_id: int, source_platform: str, external_ids: Iterable[str], missing: bool) -> None:
+    """Flags (or unflags) projects whose upstream item disappeared."""
+    external_ids = list(external_ids)
+    if not external_ids:
+        return
+    conn.execute(
+        update(projects).where(
+            (projects.c.student_id == student_id)
+            & (projects.c.source_platform == source_platform)
+            & (projects.c.external_id.in_(external_ids))
+        ).values(missing_upstream=missing)
+    )
@@ -0,0 +1,90 @@
+import importlib
+import os
+import time
+from typing import Dict, List, NamedTuple, Tuple
+from fastapi import APIRouter
+
+# -------------------------------------------------
+# Integration registry: which integrations this process serves. Only enabled
+# integrations are imported, so a disabled one (and its SDK) costs nothing at
+# startup; the SDK clients themselves are built on first use.
+# -------------------------------------------------
+
+# Comma-separated integration names; unknown names are reported and ignored
+ENABLED_INTEGRATIONS = os.getenv("ENABLED_INTEGRATIONS", "github,notion")
+# INTEGRATIONS_ASYNC=1 serves the GitHub/Notion routes from their async versions
+INTEGRATIONS_ASYNC = os.getenv("INTEGRATIONS_ASYNC", "0") == "1"
+
+
+class Integration(NamedTuple):
+    name: str
+    # OpenAPI tag of its routes
+    tag: str
+    # Modules (relative to this package) whose `router` is mounted, sync and async variants
+    modules: Tuple[str, ...]
+    async_modules: Tuple[str, ...]
+    # Import job kinds (see jobs.IMPORTERS) that belong to it
+    job_kinds: Tuple[str, ...]
+
+
+INTEGRATIONS: Dict[str, Integration] = {
+    "github": Integration(
+        "github", "GitHub",
+        modules=("github_integration", "github_webhook"),
+        async_modules=("github_async", "github_webhook"),
+        job_kinds=("github_repos",),
+    ),
+    "notion": Integration(
+        "notion", "Notion",
+        modules=("Notion_integration",),
+        async_modules=("notion_async",),
+        job_kinds=("notion_pages",),
+    ),
+}
+
+
+def _enabled_names() -> List[str]:
+    names = []
+    for name in (part.strip().lower() for part in ENABLED_INTEGRATIONS.split(",")):
+        if not name or name in names:
+            continue
+        if name not in INTEGRATIONS:
+            print(f"Ignoring unknown integration {name!r} in ENABLED_INTEGRATIONS (known: {', '.join(INTEGRATIONS)})")
+            continue
+        names.append(name)
+    return names
+
+
+enabled_integrations: Tuple[str, ...] = tuple(_enabled_names())
+
+# name -> seconds its modules took to import, filled by load_routers()
+import_seconds: Dict[str, float] = {}
+
+
+def is_enabled(name: str) -> bool:
+    return name in enabled_integrations
+
+
+def kind_enabled(kind: str) -> bool:
+    """Whether the integration an import job kind belongs to is enabled."""
+    return any(kind in INTEGRATIONS[name].job_kinds for name in enabled_integrations)
+
+
+def load_routers() -> List[Tuple[APIRouter, str]]:
+    """
+    Imports the enabled integrations and returns (router, tag) for each of their
+    modules. Prints how long each integration took to import.
+    """
+    routers = []
+    for name in enabled_integrations:
+        integration = INTEGRATIONS[name]
+        started = time.perf_counter()
+        for module_name in integration.async_modules if INTEGRATIONS_ASYNC else integration.modules:
+            module = importlib.import_module(f".{module_name}", __package__)
+            routers.append((module.router, integration.tag))
+        import_seconds[name] = time.perf_counter() - started
+
+    report = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in import_seconds.items()) or "none"
+    disabled = [name for name in INTEGRATIONS if name not in enabled_integrations]
+    print(f"Integrations loaded: {report}" + (f" (disabled: {', '.join(disabled)})" if disabled else ""))
+    return routers
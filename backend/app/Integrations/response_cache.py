@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional
+from fastapi import Request, Response
+from sqlalchemy import select
+from .db import engine, get_async_engine
+from .models import cache_generations
+from .ttl_cache import TTLCache
+from .upsert import increment_row
+
+# -------------------------------------------------
+# Server-side cache for read endpoints, with strong ETags and 304s
+#
+# Entries are keyed by scope generation + path + query string. Imports call
+# invalidate_student() once their transaction has committed, which bumps the
+# student's generation so every cached response for that student becomes
+# unreachable (the LRU drops them later). Cached bodies are per process, but the
+# generations live in the cache_generations table of the primary database, so an
+# import run by another worker invalidates this worker's entries too. That costs
+# one primary-key lookup per request.
+# -------------------------------------------------
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+# Larger bodies are still served with an ETag but not kept in memory
+RESPONSE_CACHE_MAX_BODY = int(os.getenv("RESPONSE_CACHE_MAX_BODY", str(1024 * 1024)))
+
+# Browsers keep the body but revalidate with If-None-Match on every use
+CACHE_CONTROL = "private, no-cache"
+
+# Responses built from live Notion reads rather than the student's stored projects
+NOTION_SCOPE = "notion"
+
+# Response headers that are recomputed, not replayed, when serving a cached body
+_RECOMPUTED_HEADERS = {"content-length", "content-type", "etag", "cache-control"}
+
+
+class CachedBody(NamedTuple):
+    etag: str
+    body: bytes
+    media_type: Optional[str]
+    headers: Dict[str, str]
+
+
+_cache: TTLCache[CachedBody] = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+_lock = threading.Lock()
+
+_stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def response_cache_stats() -> Dict[str, int]:
+    with _lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+def student_scope(student_id: int) -> str:
+    return f"student:{student_id}"
+
+
+def _bump_generation(conn, scope: str) -> None:
+    increment_row(conn, cache_generations, {"scope": scope}, "generation")
+
+
+def _read_generation(conn, scope: str) -> int:
+    return conn.execute(select(cache_generations.c.generation).where(cache_generations.c.scope == scope)).scalar() or 0
+
+
+def invalidate(scope: str) -> None:
+    with engine.begin() as conn:
+        _bump_generation(conn, scope)
+
+
+async def invalidate_async(scope: str) -> None:
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(_bump_generation, scope)
+
+
+def invalidate_student(student_id: int) -> None:
+    """Drops every cached response built from the student's data, in every worker. Call after the write has committed."""
+    invalidate(student_scope(student_id))
+
+
+async def invalidate_student_async(student_id: int) -> None:
+    """invalidate_student for async routes."""
+    await invalidate_async(student_scope(student_id))
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (RFC 9110 weak comparison, so W/ prefixes are ignored)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def _cache_key(request: Request, scope: str, generation: int):
+    return (scope, generation, request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+def _remember(key, response: Response, ttl: Optional[float]) -> CachedBody:
+    headers = {name: value for name, value in response.headers.items() if name not in _RECOMPUTED_HEADERS}
+    entry = CachedBody(strong_etag(response.body), response.body, response.media_type, headers)
+    if len(entry.body) <= RESPONSE_CACHE_MAX_BODY:
+        _cache.set(key, entry, ttl)
+    return entry
+
+
+def _serve(request: Request, entry: CachedBody) -> Response:
+    validators = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        _count("not_modified")
+        return Response(status_code=304, headers=validators)
+    return Response(content=entry.body, media_type=entry.media_type, headers={**entry.headers, **validators})
+
+
+def cached_response(request: Request, scope: str, build: Callable[[], Response], ttl: Optional[float] = None) -> Response:
+    """
+    Serves the response for this request from the cache, or calls `build()` (which
+    must return a Response with a body) and caches it. Replies 304 when the client
+    already has the current ETag. `ttl` overrides RESPONSE_CACHE_TTL.
+    """
+    # The key is taken before building, so an invalidation during build() leaves the result unreachable
+    # (read from the primary: a replica could still return the generation from before an import)
+    with engine.connect() as conn:
+        key = _cache_key(request, scope, _read_generation(conn, scope))
+    entry = _cache.get(key)
+    if entry is None:
+        _count("misses")
+        entry = _remember(key, build(), ttl)
+    else:
+        _count("hits")
+    return _serve(request, entry)
+
+
+async def cached_response_async(
+    request: Request, scope: str, build: Callable[[], Awaitable[Response]], ttl: Optional[float] = None
+) -> Response:
+    """cached_response for async routes."""
+    async with get_async_engine().connect() as conn:
+        key = _cache_key(request, scope, await conn.run_sync(_read_generation, scope))
+    entry = _cache.get(key)
+    if entry is None:
+        _count("misses")
+        entry = _remember(key, await build(), ttl)
+    else:
+        _count("hits")
+    return _serve(request, entry)
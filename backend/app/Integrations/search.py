@@ -0,0 +1,245 @@
+import re
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import DDL, Engine, column, event, func, inspect, literal, literal_column, or_, select, table, text, union_all
+from sqlalchemy.dialects.mysql import match as mysql_match
+from .accounts import get_student_id_from_token
+from .db import engine, read_engine
+from .models import content_blobs, project_contents, projects
+
+router = APIRouter()
+
+# -------------------------------------------------
+# Full-text index over projects.title / projects.content
+#
+# SQLite: an FTS5 external-content table (projects_fts) kept in sync by triggers on
+#         projects, so every insert/upsert/delete done by the importers is indexed
+#         in the same transaction without any code on the write path.
+#         projects.content is only a 2000-character preview, so the full bodies
+#         (content_blobs, see content_store.py) get a second, contentless FTS5
+#         table (project_bodies_fts, rowid = project id). Triggers cannot read the
+#         compressed blobs, so save_project_contents() updates it instead.
+# MySQL:  a FULLTEXT index on projects(title, content), maintained by InnoDB. It
+#         covers the preview only.
+# Other dialects fall back to a LIKE scan of the preview.
+# -------------------------------------------------
+
+FTS_TABLE = "projects_fts"
+BODY_FTS_TABLE = "project_bodies_fts"
+MYSQL_FULLTEXT_INDEX = "ft_projects_title_content"
+
+# bm25 column weights: a match in the title counts for more than one in the body
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(title, content, content='projects', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON projects BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON projects BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    # Only re-index when the text changed, not on e.g. missing_upstream flips
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON projects BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    # Contentless: the index only, the text stays compressed in content_blobs
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {BODY_FTS_TABLE}
+        USING fts5(body, content='', tokenize='unicode61 remove_diacritics 2')""",
+]
+
+# Bodies decompressed per batch when building project_bodies_fts for an existing database
+BODY_INDEX_BATCH = 200
+
+_MYSQL_DDL = f"ALTER TABLE projects ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} (title, content)"
+
+# New databases get the index together with the projects table
+for _statement in _SQLITE_DDL:
+    event.listen(projects, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(projects, "after_create", DDL(_MYSQL_DDL).execute_if(dialect="mysql"))
+
+
+def ensure_search_index(bind: Engine = engine) -> None:
+    """
+    Adds the full-text index to an existing database that predates it, and fills it
+    from the rows already there. Safe to call on every start.
+    """
+    dialect = bind.dialect.name
+    if dialect == "sqlite":
+        with bind.begin() as conn:
+            existed = set(conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (:fts, :bodies)"),
+                {"fts": FTS_TABLE, "bodies": BODY_FTS_TABLE},
+            ).scalars())
+            for statement in _SQLITE_DDL:
+                conn.exec_driver_sql(statement)
+            if FTS_TABLE not in existed:
+                conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                print(f"Built {FTS_TABLE} from existing projects")
+            if BODY_FTS_TABLE not in existed:
+                print(f"Built {BODY_FTS_TABLE} from {_index_stored_bodies(conn)} stored project bodies")
+    elif dialect == "mysql":
+        indexes = {index["name"] for index in inspect(bind).get_indexes("projects")}
+        if MYSQL_FULLTEXT_INDEX not in indexes:
+            with bind.begin() as conn:
+                conn.exec_driver_sql(_MYSQL_DDL)
+            print(f"Added FULLTEXT index {MYSQL_FULLTEXT_INDEX}")
+
+
+def _load_bodies(conn, hashes: Dict[int, str]) -> Dict[int, str]:
+    """{project_id: decompressed body} for {project_id: content_hash}."""
+    from .content_store import decompress
+
+    blobs = {
+        row.content_hash: decompress(row.body, row.encoding)
+        for row in conn.execute(
+            select(content_blobs.c.content_hash, content_blobs.c.encoding, content_blobs.c.body)
+            .where(content_blobs.c.content_hash.in_(set(hashes.values())))
+        )
+    }
+    return {project_id: blobs[digest] for project_id, digest in hashes.items() if digest in blobs}
+
+
+def _index_stored_bodies(conn) -> int:
+    last_id, total = 0, 0
+    while True:
+        hashes = dict(conn.execute(
+            select(project_contents.c.project_id, project_contents.c.content_hash)
+            .where(project_contents.c.project_id > last_id)
+            .order_by(project_contents.c.project_id)
+            .limit(BODY_INDEX_BATCH)
+        ).all())
+        if not hashes:
+            return total
+        index_project_bodies(conn, {}, _load_bodies(conn, hashes))
+        last_id, total = max(hashes), total + len(hashes)
+
+
+def index_project_bodies(conn, previous_hashes: Dict[int, str], bodies: Dict[int, str]) -> None:
+    """
+    Updates project_bodies_fts for projects whose full body changed (SQLite only).
+    `previous_hashes` ({project_id: content_hash}) are the bodies currently indexed,
+    which must still be in content_blobs: a contentless index can only drop an entry
+    given the text it was built from. `bodies` ({project_id: text}) are indexed in their place.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    previous = _load_bodies(conn, previous_hashes) if previous_hashes else {}
+    if previous:
+        conn.exec_driver_sql(
+            f"INSERT INTO {BODY_FTS_TABLE}({BODY_FTS_TABLE}, rowid, body) VALUES ('delete', ?, ?)", list(previous.items())
+        )
+    if bodies:
+        conn.exec_driver_sql(f"INSERT INTO {BODY_FTS_TABLE}(rowid, body) VALUES (?, ?)", list(bodies.items()))
+
+
+# -------------------------------------------------
+# Query parsing
+# -------------------------------------------------
+
+_TERM_RE = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+
+def parse_search_terms(q: str) -> List[tuple]:
+    """
+    Splits free text into (word, is_prefix) terms. A trailing * makes a term a
+    prefix match ("pyth*"); everything else that is not a word character is dropped,
+    so user input never reaches the engine's own query syntax.
+    """
+    return [(word, bool(star)) for word, star in _TERM_RE.findall(q)]
+
+
+def fts5_query(terms: List[tuple]) -> str:
+    # All terms must match; each is quoted so FTS5 operators (AND, NEAR, ...) are literal
+    return " ".join(f'"{word}"' + ("*" if prefix else "") for word, prefix in terms)
+
+
+def mysql_boolean_query(terms: List[tuple]) -> str:
+    return " ".join(f"+{word}" + ("*" if prefix else "") for word, prefix in terms)
+
+
+# -------------------------------------------------
+# Search
+# -------------------------------------------------
+
+RESULT_COLUMNS = ("id", "title", "context", "type", "source_platform", "external_id")
+
+def _fts_hits(fts_table: str, rank_args: str, query: str):
+    # bm25() is lower for better matches, so it is negated for the shared `score` convention
+    return (
+        select(literal_column("rowid").label("project_id"), (-literal_column(f"bm25({fts_table}{rank_args})")).label("score"))
+        .select_from(table(fts_table))
+        .where(literal_column(fts_table).op("MATCH")(query))
+    )
+
+
+def build_search_stmt(dialect: str, student_id: int, terms: List[tuple], filters: Dict[str, Optional[str]], limit: int, offset: int):
+    """Ranked search over one student's projects. `score` is higher for better matches."""
+    result_columns = [projects.c[name] for name in RESULT_COLUMNS]
+
+    if dialect == "sqlite":
+        # A project matches when its title + preview or its full body contains every term
+        query = fts5_query(terms)
+        hits = union_all(
+            _fts_hits(FTS_TABLE, f", {TITLE_WEIGHT}, {CONTENT_WEIGHT}", query),
+            _fts_hits(BODY_FTS_TABLE, f", {CONTENT_WEIGHT}", query),
+        ).subquery()
+        best = select(hits.c.project_id, func.max(hits.c.score).label("score")).group_by(hits.c.project_id).subquery()
+        stmt = (
+            select(*result_columns, best.c.score)
+            .select_from(projects.join(best, best.c.project_id == projects.c.id))
+            .order_by(best.c.score.desc(), projects.c.id)
+        )
+    elif dialect == "mysql":
+        score = mysql_match(projects.c.title, projects.c.content, against=mysql_boolean_query(terms)).in_boolean_mode()
+        stmt = (
+            select(*result_columns, score.label("score"))
+            .where(score > 0)
+            .order_by(score.desc(), projects.c.id)
+        )
+    else:
+        conditions = [
+            or_(projects.c.title.ilike(f"%{word}%"), projects.c.content.ilike(f"%{word}%")) for word, _ in terms
+        ]
+        stmt = select(*result_columns, literal(0.0).label("score")).where(*conditions).order_by(projects.c.id)
+
+    stmt = stmt.where(projects.c.student_id == student_id)
+    for name, value in filters.items():
+        if value is not None:
+            stmt = stmt.where(projects.c[name] == value)
+    return stmt.limit(limit).offset(offset)
+
+
+@router.get("/projects/search", response_model=List[Dict[str, Any]])
+def search_projects(
+    access_token: str,
+    q: str,
+    source_platform: Optional[str] = None,
+    type: Optional[str] = None,
+    context: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Full-text search over the titles and content of the student's imported projects,
+    best matches first. End a word with * for a prefix match (e.g. `q=pyth*`).
+    On SQLite the full README / page body is searched; on other databases only the
+    first 2000 characters stored in projects.content are.
+    """
+    terms = parse_search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query must contain at least one word.")
+
+    current_student_id = get_student_id_from_token(access_token)
+    filters = {"source_platform": source_platform, "type": type, "context": context}
+    stmt = build_search_stmt(read_engine.dialect.name, current_student_id, terms, filters, limit, offset)
+
+    try:
+        with read_engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(stmt)]
+    except Exception as e:
+        print(f"Error searching projects for student {current_student_id}: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while searching projects.")
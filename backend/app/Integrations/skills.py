@@ -0,0 +1,301 @@
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Engine, bindparam, delete, func, select
+from ..auth.security import get_current_user, optional_oauth2_scheme
+from .accounts import get_student_id_from_token
+from .db import engine, read_engine
+from .models import projects, project_skills, student_skills, students, FULL_CONTENT_KEY, PROJECT_KEY_COLUMNS
+from .project_queries import project_ids_by_key
+from .upsert import upsert_rows
+
+router = APIRouter()
+
+# -------------------------------------------------
+# Skill extraction
+# -------------------------------------------------
+
+# Canonical skill name -> spellings found in text (lowercase). Only these are
+# picked up by keyword extraction; GitHub languages are kept whatever they are.
+# Spellings are matched as whole words, and ones that are also common words or
+# abbreviations ("node", "spring", "git", "js", "ml") are left out: they tagged
+# students with skills their projects never mention.
+SKILL_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "Python": ("python", "python3"),
+    "JavaScript": ("javascript",),
+    "TypeScript": ("typescript",),
+    "Java": ("java",),
+    "Kotlin": ("kotlin",),
+    "C": ("c",),
+    "C++": ("c++", "cpp"),
+    "C#": ("c#", "csharp"),
+    "Go": ("golang",),
+    "Rust": ("rust",),
+    "Ruby": ("ruby",),
+    "PHP": ("php",),
+    "Swift": ("swift",),
+    "R": ("r",),
+    "SQL": ("sql",),
+    "HTML": ("html", "html5"),
+    "CSS": ("css", "css3"),
+    "Shell": ("bash", "shell"),
+    "React": ("react", "reactjs", "react.js"),
+    "Vue": ("vue", "vuejs", "vue.js"),
+    "Angular": ("angular",),
+    "Node.js": ("nodejs", "node.js"),
+    "Django": ("django",),
+    "Flask": ("flask",),
+    "FastAPI": ("fastapi",),
+    "Spring": ("spring boot", "springboot", "spring framework"),
+    "Docker": ("docker", "dockerfile"),
+    "Kubernetes": ("kubernetes", "k8s"),
+    "AWS": ("aws",),
+    "Azure": ("azure",),
+    "GCP": ("gcp",),
+    "Linux": ("linux",),
+    "MySQL": ("mysql",),
+    "PostgreSQL": ("postgresql", "postgres"),
+    "SQLite": ("sqlite",),
+    "MongoDB": ("mongodb", "mongo"),
+    "Redis": ("redis",),
+    "GraphQL": ("graphql",),
+    "TensorFlow": ("tensorflow",),
+    "PyTorch": ("pytorch",),
+    "Pandas": ("pandas",),
+    "NumPy": ("numpy",),
+    "scikit-learn": ("scikit-learn", "sklearn"),
+    "Machine Learning": ("machine learning",),
+    "Data Analysis": ("data analysis",),
+}
+
+_ALIAS_TO_SKILL = {alias: skill for skill, aliases in SKILL_ALIASES.items() for alias in aliases}
+# Single-letter names (C, R) only count when written as such, not as a stray letter in prose
+_CASE_SENSITIVE_ALIASES = {"c", "r"}
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9+#.\-]*")
+
+
+def canonical_skill(name: str) -> str:
+    """The canonical spelling of a skill name (e.g. "golang" -> "Go"); unknown names are returned unchanged."""
+    return _ALIAS_TO_SKILL.get(name.strip().lower(), name.strip())
+
+
+def extract_keywords(text: Optional[str]) -> Counter:
+    """Counts mentions of known skills in free text (single words and two-word names)."""
+    counts: Counter = Counter()
+    if not text:
+        return counts
+
+    tokens = [token.rstrip(".-") for token in _TOKEN_RE.findall(text)]
+    previous = None
+    for token in tokens:
+        lower = token.lower()
+        if lower in _CASE_SENSITIVE_ALIASES:
+            skill = _ALIAS_TO_SKILL[lower] if token.isupper() else None
+        else:
+            skill = _ALIAS_TO_SKILL.get(lower)
+        if skill:
+            counts[skill] += 1
+        if previous is not None:
+            pair = _ALIAS_TO_SKILL.get(f"{previous} {lower}")
+            if pair:
+                counts[pair] += 1
+        previous = lower
+    return counts
+
+
+def skills_for_row(row: Dict[str, Any]) -> Dict[str, Tuple[str, int]]:
+    """{skill: (source, weight)} for a projects row: its language stats, then keywords in its title and body."""
+    found: Dict[str, Tuple[str, int]] = {}
+
+    stored = row.get("skills") or {}
+    languages = stored.get("languages") or {}
+    if not languages and stored.get("language"):
+        languages = {stored["language"]: 0}
+    for language, size in languages.items():
+        found[canonical_skill(language)] = ("language", int(size or 0))
+
+    # The full body when the importer provided it, not just the stored preview
+    text = row.get(FULL_CONTENT_KEY) or row.get("content") or ""
+    for skill, mentions in extract_keywords(f"{row.get('title') or ''}\n{text}").items():
+        found.setdefault(skill, ("keyword", mentions))
+    return found
+
+
+# -------------------------------------------------
+# Keeping project_skills / student_skills in step with projects
+# -------------------------------------------------
+
+def refresh_student_skill_counts(conn, pairs: Iterable[Tuple[int, str]]) -> None:
+    """
+    Recounts student_skills for the given (student_id, skill) pairs only, from the
+    (student_id, skill) index on project_skills, so an import touching a few
+    projects never rescans a student's whole history.
+    """
+    by_student: Dict[int, Set[str]] = defaultdict(set)
+    for student_id, skill in pairs:
+        by_student[student_id].add(skill)
+
+    for student_id, skill_names in by_student.items():
+        counts = {
+            row.skill: row.project_count
+            for row in conn.execute(
+                select(project_skills.c.skill, func.count().label("project_count"))
+                .where((project_skills.c.student_id == student_id) & (project_skills.c.skill.in_(skill_names)))
+                .group_by(project_skills.c.skill)
+            )
+        }
+        upsert_rows(
+            conn, student_skills,
+            [{"student_id": student_id, "skill": skill, "project_count": count} for skill, count in counts.items()],
+            key_columns=("student_id", "skill"), update_columns=("project_count",),
+        )
+        gone = skill_names - counts.keys()
+        if gone:
+            conn.execute(
+                delete(student_skills).where(
+                    (student_skills.c.student_id == student_id) & (student_skills.c.skill.in_(gone))
+                )
+            )
+
+
+def sync_project_skills(conn, rows: List[Dict[str, Any]], ids: Optional[Dict[Tuple, int]] = None) -> None:
+    """
+    Brings project_skills in line with freshly upserted projects rows and updates the
+    affected student_skills counts. Only skills that were added to or dropped from a
+    project are written; unchanged projects cost one SELECT for the whole batch.
+    `ids` is project_ids_by_key() for the rows, when the caller already has it.
+    """
+    if not rows:
+        return
+
+    if ids is None:
+        ids = project_ids_by_key(conn, rows)
+    wanted: Dict[int, Dict[str, Tuple[str, int]]] = {}
+    owner: Dict[int, int] = {}
+    for row in rows:
+        project_id = ids.get(tuple(row[name] for name in PROJECT_KEY_COLUMNS))
+        if project_id is not None:
+            wanted[project_id] = skills_for_row(row)
+            owner[project_id] = row["student_id"]
+
+    current: Dict[int, Dict[str, Tuple[str, int]]] = defaultdict(dict)
+    for found in conn.execute(
+        select(project_skills.c.project_id, project_skills.c.skill, project_skills.c.source, project_skills.c.weight)
+        .where(project_skills.c.project_id.in_(list(wanted)))
+    ):
+        current[found.project_id][found.skill] = (found.source, found.weight)
+
+    changed_rows, removed, touched = [], [], set()
+    for project_id, skill_map in wanted.items():
+        before = current.get(project_id, {})
+        for skill, (source, weight) in skill_map.items():
+            if before.get(skill) != (source, weight):
+                changed_rows.append({
+                    "project_id": project_id, "student_id": owner[project_id],
+                    "skill": skill, "source": source, "weight": weight,
+                })
+            if skill not in before:
+                touched.add((owner[project_id], skill))
+        for skill in before.keys() - skill_map.keys():
+            removed.append({"p_id": project_id, "p_skill": skill})
+            touched.add((owner[project_id], skill))
+
+    upsert_rows(conn, project_skills, changed_rows, key_columns=("project_id", "skill"), update_columns=("source", "weight"))
+    if removed:
+        conn.execute(
+            delete(project_skills).where(
+                (project_skills.c.project_id == bindparam("p_id")) & (project_skills.c.skill == bindparam("p_skill"))
+            ),
+            removed,
+        )
+    refresh_student_skill_counts(conn, touched)
+
+
+SKILL_BACKFILL_BATCH = 500
+
+
+def ensure_skill_index(bind: Engine = engine) -> None:
+    """Fills project_skills/student_skills from projects imported before they existed. Safe to call on every start."""
+    with bind.begin() as conn:
+        if conn.execute(select(project_skills.c.id).limit(1)).first() is not None:
+            return
+        if conn.execute(select(projects.c.id).limit(1)).first() is None:
+            return
+
+        columns = [projects.c.id] + [projects.c[name] for name in (*PROJECT_KEY_COLUMNS, "title", "content", "skills")]
+        last_id, total = 0, 0
+        while True:
+            batch = [
+                dict(row._mapping)
+                for row in conn.execute(
+                    select(*columns)
+                    .where((projects.c.id > last_id) & projects.c.external_id.is_not(None))
+                    .order_by(projects.c.id)
+                    .limit(SKILL_BACKFILL_BATCH)
+                )
+            ]
+            if not batch:
+                break
+            sync_project_skills(conn, batch)
+            last_id, total = batch[-1]["id"], total + len(batch)
+        print(f"Built project_skills for {total} existing projects")
+
+
+# -------------------------------------------------
+# Queries
+# -------------------------------------------------
+
+@router.get("/skills", response_model=List[Dict[str, Any]])
+def query_skills(
+    skill: Optional[str] = None,
+    access_token: Optional[str] = None,
+    min_projects: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    staff_token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    """
+    - `skill=Rust`: students with that skill, by number of projects showing it (staff login required)
+    - `access_token=...`: the linked student's skills, most used first
+    - neither: the most common skills across all students
+    """
+    if skill is not None and access_token is not None:
+        raise HTTPException(status_code=400, detail="Pass either skill or access_token, not both.")
+
+    if skill is not None:
+        # Lists students by name, so it needs a staff token from /token, not just any caller
+        if staff_token is None:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        get_current_user(staff_token)
+        stmt = (
+            select(
+                student_skills.c.student_id, students.c.name, students.c.surname, students.c.university,
+                student_skills.c.project_count,
+            )
+            .join(students, students.c.id == student_skills.c.student_id)
+            .where((student_skills.c.skill == canonical_skill(skill)) & (student_skills.c.project_count >= min_projects))
+            .order_by(student_skills.c.project_count.desc(), student_skills.c.student_id)
+        )
+    elif access_token is not None:
+        current_student_id = get_student_id_from_token(access_token)
+        stmt = (
+            select(student_skills.c.skill, student_skills.c.project_count)
+            .where((student_skills.c.student_id == current_student_id) & (student_skills.c.project_count >= min_projects))
+            .order_by(student_skills.c.project_count.desc(), student_skills.c.skill)
+        )
+    else:
+        student_count = func.count().label("students")
+        stmt = (
+            select(student_skills.c.skill, student_count, func.sum(student_skills.c.project_count).label("projects"))
+            .where(student_skills.c.project_count >= min_projects)
+            .group_by(student_skills.c.skill)
+            .order_by(student_count.desc(), student_skills.c.skill)
+        )
+
+    try:
+        with read_engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(stmt.limit(limit))]
+    except Exception as e:
+        print(f"Error querying skills: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while querying skills.")
@@ -0,0 +1,446 @@
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+from fastapi import APIRouter
+from sqlalchemy import or_, select, true
+from .accounts import token_digest
+from .db import engine, read_engine, init_db, utcnow
+from .http_client import limiter_key, rate_limiter
+from .jobs import JOB_FAILED, JOB_SUCCEEDED, JOB_WORKERS, start_job
+from .metrics import observe_sync
+from .models import platform_accounts, projects, sync_schedule
+from .registry import kind_enabled
+from .upsert import upsert_rows
+
+router = APIRouter()
+
+# -------------------------------------------------
+# Scheduled resyncs of every linked account, through the same imports as
+# /api/jobs (so a scheduled run and a user's "Fetch Repos" never overlap).
+#
+# - Sharding: each scheduler process owns the students with
+#   student_id % SYNC_SHARD_COUNT == SYNC_SHARD_INDEX.
+# - Ordering: due accounts are started stalest first (never synced before all).
+# - Fairness: at most one scheduled run per token at a time, and a GitHub
+#   token whose remaining hourly quota is below SYNC_MIN_REMAINING is skipped
+#   until its reset, so the owner's own requests keep working.
+# - Backoff: failures are retried with exponential backoff; a 401 (revoked or
+#   expired token) backs off for days, until the account links a new token.
+# - Throughput: starts are paced to SYNC_TARGET_PER_HOUR; /api/sync/status
+#   reports how far behind the fleet is against SYNC_INTERVAL_SECONDS.
+# -------------------------------------------------
+
+# SYNC_SCHEDULER=1 runs a scheduler inside each API worker (single-process deployments);
+# otherwise run `python -m app.Integrations.sync_scheduler --shard I --shards N` per shard
+SYNC_SCHEDULER_ENABLED = os.getenv("SYNC_SCHEDULER", "0") == "1"
+SYNC_SHARD_INDEX = int(os.getenv("SYNC_SHARD_INDEX", "0"))
+SYNC_SHARD_COUNT = int(os.getenv("SYNC_SHARD_COUNT", "1"))
+# An account is due once its last successful sync is this old
+SYNC_INTERVAL = timedelta(seconds=float(os.getenv("SYNC_INTERVAL_SECONDS", str(6 * 3600))))
+# Scheduled runs started per hour by one scheduler process
+SYNC_TARGET_PER_HOUR = float(os.getenv("SYNC_TARGET_PER_HOUR", "600"))
+# Scheduled runs in flight at once; the rest of the job pool stays free for user-triggered imports
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", str(max(1, JOB_WORKERS // 2))))
+SYNC_TICK_SECONDS = float(os.getenv("SYNC_TICK_SECONDS", "5"))
+# GitHub API calls of each token's hourly quota left for the user's own requests
+SYNC_MIN_REMAINING = int(os.getenv("SYNC_MIN_REMAINING", "500"))
+SYNC_RETRY_BACKOFF = timedelta(seconds=float(os.getenv("SYNC_RETRY_BACKOFF_SECONDS", "300")))
+SYNC_REVOKED_BACKOFF = timedelta(seconds=float(os.getenv("SYNC_REVOKED_BACKOFF_SECONDS", str(24 * 3600))))
+SYNC_REVOKED_BACKOFF_MAX = timedelta(days=30)
+
+GITHUB_KIND = "github_repos"
+NOTION_KIND = "notion_pages"
+# All Notion imports share the one integration token, so they share one budget
+NOTION_BUDGET = "notion"
+
+
+class SyncWork(NamedTuple):
+    kind: str
+    student_id: int
+    access_token: str
+    # What the run counts against: the token's limiter key, or NOTION_BUDGET
+    budget: str
+    last_success_at: Optional[datetime]
+
+
+def _staleness_key(work: SyncWork):
+    # Never synced first, then oldest success first
+    return (work.last_success_at is not None, work.last_success_at or datetime.min)
+
+
+def retry_delay(failures: int, revoked: bool) -> timedelta:
+    """Backoff after `failures` consecutive failed runs (1-based)."""
+    if revoked:
+        return min(SYNC_REVOKED_BACKOFF_MAX, SYNC_REVOKED_BACKOFF * 2 ** (failures - 1))
+    return min(SYNC_INTERVAL, SYNC_RETRY_BACKOFF * 2 ** (failures - 1))
+
+
+# --------------------------
+# Due accounts
+# --------------------------
+def _in_shard(column, shard: int, shards: int):
+    return column % shards == shard if shards > 1 else true()
+
+
+def _github_due(conn, now: datetime, shard: int, shards: int, limit: int) -> List[SyncWork]:
+    if not kind_enabled(GITHUB_KIND):
+        return []
+    # Advanced by every complete GitHub import, scheduled or not
+    last_success = platform_accounts.c.last_synced_at
+    stmt = (
+        select(platform_accounts.c.student_id, platform_accounts.c.access_token, last_success.label("last_success_at"))
+        .select_from(platform_accounts.outerjoin(
+            sync_schedule,
+            (sync_schedule.c.student_id == platform_accounts.c.student_id) & (sync_schedule.c.kind == GITHUB_KIND),
+        ))
+        .where(platform_accounts.c.platform_name == "GitHub")
+        .where(_in_shard(platform_accounts.c.student_id, shard, shards))
+        .where(or_(last_success.is_(None), last_success < now - SYNC_INTERVAL))
+        .where(or_(
+            sync_schedule.c.retry_after.is_(None),
+            sync_schedule.c.retry_after <= now,
+            # A re-linked account gets a fresh start
+            sync_schedule.c.token_digest != platform_accounts.c.token_digest,
+        ))
+        .order_by(last_success.is_not(None), last_success)
+        .limit(limit)
+    )
+    return [
+        SyncWork(GITHUB_KIND, row.student_id, row.access_token, limiter_key(row.access_token), row.last_success_at)
+        for row in conn.execute(stmt)
+    ]
+
+
+def _notion_due(conn, now: datetime, shard: int, shards: int, limit: int) -> List[SyncWork]:
+    notion_token = os.getenv("NOTION_TOKEN")
+    if not notion_token or not kind_enabled(NOTION_KIND):
+        return []
+    # Students who imported Notion pages before
+    students = (
+        select(projects.c.student_id)
+        .where((projects.c.source_platform == "Notion") & _in_shard(projects.c.student_id, shard, shards))
+        .distinct()
+        .subquery()
+    )
+    stmt = (
+        select(students.c.student_id, sync_schedule.c.last_success_at)
+        .select_from(students.outerjoin(
+            sync_schedule,
+            (sync_schedule.c.student_id == students.c.student_id) & (sync_schedule.c.kind == NOTION_KIND),
+        ))
+        .where(or_(sync_schedule.c.last_success_at.is_(None), sync_schedule.c.last_success_at < now - SYNC_INTERVAL))
+        .where(or_(
+            sync_schedule.c.retry_after.is_(None),
+            sync_schedule.c.retry_after <= now,
+            sync_schedule.c.token_digest != token_digest(notion_token),
+        ))
+        .order_by(sync_schedule.c.last_success_at.is_not(None), sync_schedule.c.last_success_at)
+        .limit(limit)
+    )
+    return [
+        SyncWork(NOTION_KIND, row.student_id, notion_token, NOTION_BUDGET, row.last_success_at)
+        for row in conn.execute(stmt)
+    ]
+
+
+def _budget_exhausted(work: SyncWork) -> bool:
+    """Whether the token's known GitHub quota is too low to spend on a background run right now."""
+    if work.kind != GITHUB_KIND:
+        return False
+    budget = rate_limiter.primary_budget(work.budget)
+    return budget is not None and budget[0] < SYNC_MIN_REMAINING and budget[1] > time.time()
+
+
+def record_outcome(work: SyncWork, outcome: Dict[str, Any]) -> None:
+    """Stores the result of a scheduled run: clears the backoff on success, extends it on failure."""
+    now = utcnow()
+    digest = token_digest(work.access_token)
+    if outcome["state"] == JOB_SUCCEEDED:
+        values = {
+            "last_attempt_at": now, "last_success_at": now, "retry_after": None,
+            "failures": 0, "revoked": False, "token_digest": None, "last_error": None,
+        }
+    else:
+        with engine.connect() as conn:
+            previous = conn.execute(
+                select(sync_schedule.c.failures, sync_schedule.c.token_digest).where(
+                    (sync_schedule.c.student_id == work.student_id) & (sync_schedule.c.kind == work.kind)
+                )
+            ).first()
+        failures = (previous.failures if previous is not None and previous.token_digest == digest else 0) + 1
+        revoked = outcome["status_code"] == 401
+        values = {
+            "last_attempt_at": now, "retry_after": now + retry_delay(failures, revoked),
+            "failures": failures, "revoked": revoked, "token_digest": digest, "last_error": outcome["error"],
+        }
+    with engine.begin() as conn:
+        upsert_rows(
+            conn, sync_schedule, [{"student_id": work.student_id, "kind": work.kind, **values}],
+            key_columns=("student_id", "kind"), update_columns=tuple(values),
+        )
+
+
+def mark_revoked(student_id: int, kind: str, access_token: str, error: str) -> None:
+    """Records a 401 seen outside a scheduled run (e.g. by a webhook), so scheduled runs back off too."""
+    work = SyncWork(kind, student_id, access_token, limiter_key(access_token), None)
+    record_outcome(work, {"state": JOB_FAILED, "status_code": 401, "error": error})
+
+
+# --------------------------
+# Scheduler
+# --------------------------
+class SyncScheduler:
+    def __init__(
+        self,
+        shard: int = SYNC_SHARD_INDEX,
+        shards: int = SYNC_SHARD_COUNT,
+        target_per_hour: float = SYNC_TARGET_PER_HOUR,
+        concurrency: int = SYNC_CONCURRENCY,
+    ):
+        if not 0 <= shard < shards:
+            raise ValueError(f"Shard index {shard} is outside 0..{shards - 1}")
+        self.shard = shard
+        self.shards = shards
+        self.target_per_hour = target_per_hour
+        self.concurrency = concurrency
+        # Starts still allowed by the throughput target (refills at target_per_hour)
+        self._allowance = float(concurrency)
+        self._refilled_at = time.monotonic()
+        # (student_id, kind) -> work, and budget -> runs in flight
+        self._in_flight: Dict[Tuple[int, str], SyncWork] = {}
+        self._budgets: Dict[str, int] = {}
+        self._started: Dict[Tuple[int, str], float] = {}
+        # monotonic finish time of runs completed in the last hour
+        self._finished: Deque[float] = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Set when a run finishes, so the freed slot is filled without waiting for the next tick
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._allowance = min(float(self.concurrency), self._allowance + (now - self._refilled_at) * self.target_per_hour / 3600)
+        self._refilled_at = now
+
+    def due_work(self, limit: int) -> List[SyncWork]:
+        """Due accounts of this shard, stalest first."""
+        now = utcnow()
+        with engine.connect() as conn:
+            work = _github_due(conn, now, self.shard, self.shards, limit) + _notion_due(conn, now, self.shard, self.shards, limit)
+        return sorted(work, key=_staleness_key)[:limit]
+
+    def tick(self) -> int:
+        """Starts as many due runs as the concurrency, pacing and per-token limits allow. Returns how many started."""
+        with self._lock:
+            self._refill()
+            slots = min(self.concurrency - len(self._in_flight), int(self._allowance))
+        if slots <= 0:
+            return 0
+
+        started = 0
+        # Look past the first few: some are skipped for budget reasons
+        for work in self.due_work(limit=slots * 4 + len(self._in_flight)):
+            if started >= slots:
+                break
+            key = (work.student_id, work.kind)
+            with self._lock:
+                if key in self._in_flight or self._budgets.get(work.budget, 0) >= 1:
+                    continue
+            if _budget_exhausted(work):
+                continue
+            if self._start(key, work):
+                started += 1
+        return started
+
+    def _start(self, key: Tuple[int, str], work: SyncWork) -> bool:
+        with self._lock:
+            self._in_flight[key] = work
+            self._budgets[work.budget] = self._budgets.get(work.budget, 0) + 1
+            self._started[key] = time.monotonic()
+        try:
+            _, created = start_job(work.kind, work.student_id, work.access_token, on_finish=lambda outcome: self._done(key, work, outcome))
+        except Exception as e:
+            print(f"Error starting scheduled {work.kind} sync for student {work.student_id}: {e}")
+            created = False
+        if not created:
+            # Already running (user-triggered, or another process); it will advance the account itself
+            self._release(key, work)
+            return False
+        with self._lock:
+            self._allowance -= 1
+        return True
+
+    def _release(self, key: Tuple[int, str], work: SyncWork) -> Optional[float]:
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._budgets[work.budget] -= 1
+            if not self._budgets[work.budget]:
+                del self._budgets[work.budget]
+            started_at = self._started.pop(key, None)
+        return None if started_at is None else time.monotonic() - started_at
+
+    def _done(self, key: Tuple[int, str], work: SyncWork, outcome: Dict[str, Any]) -> None:
+        elapsed = self._release(key, work)
+        result = "succeeded" if outcome["state"] == JOB_SUCCEEDED else ("revoked" if outcome["status_code"] == 401 else "failed")
+        observe_sync(work.kind, result, elapsed)
+        with self._lock:
+            self._finished.append(time.monotonic())
+        if result != "succeeded":
+            print(f"Scheduled {work.kind} sync for student {work.student_id} {result}: {outcome['error']}")
+        record_outcome(work, outcome)
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        cutoff = time.monotonic() - 3600
+        with self._lock:
+            while self._finished and self._finished[0] < cutoff:
+                self._finished.popleft()
+            return {
+                "shard": self.shard,
+                "shards": self.shards,
+                "in_flight": len(self._in_flight),
+                "concurrency": self.concurrency,
+                "target_per_hour": self.target_per_hour,
+                "completed_last_hour": len(self._finished),
+            }
+
+    # --- running ---
+    def run_forever(self) -> None:
+        print(f"Sync scheduler started: shard {self.shard}/{self.shards}, {self.target_per_hour:g} runs/hour, {self.concurrency} at a time")
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Error in sync scheduler tick: {e}")
+            self._wakeup.wait(SYNC_TICK_SECONDS)
+            self._wakeup.clear()
+
+    def start(self) -> "SyncScheduler":
+        self._thread = threading.Thread(target=self.run_forever, daemon=True, name=f"sync-scheduler-{self.shard}")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=SYNC_TICK_SECONDS + 1)
+
+
+_scheduler: Optional[SyncScheduler] = None
+
+
+def start_scheduler() -> Optional[SyncScheduler]:
+    """Starts this process's scheduler when SYNC_SCHEDULER=1 (called from the app lifespan)."""
+    global _scheduler
+    if SYNC_SCHEDULER_ENABLED and _scheduler is None:
+        _scheduler = SyncScheduler().start()
+    return _scheduler
+
+
+def stop_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def current_scheduler() -> Optional[SyncScheduler]:
+    return _scheduler
+
+
+# --------------------------
+# Fleet report
+# --------------------------
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _kind_report(last_successes: List[Optional[datetime]], schedule_rows, now: datetime) -> Dict[str, Any]:
+    """How far behind one kind of account is: lag = time past its due date (last success + interval)."""
+    lags = [(now - (last + SYNC_INTERVAL)).total_seconds() for last in last_successes if last is not None]
+    behind = [lag for lag in lags if lag > 0]
+    synced = [last for last in last_successes if last is not None]
+    return {
+        "accounts": len(last_successes),
+        "never_synced": len(last_successes) - len(synced),
+        "due": len(behind) + len(last_successes) - len(synced),
+        "backing_off": sum(1 for row in schedule_rows if row.retry_after is not None and row.retry_after > now),
+        "revoked": sum(1 for row in schedule_rows if row.revoked),
+        "lag_p50_seconds": _percentile(behind, 50),
+        "lag_p95_seconds": _percentile(behind, 95),
+        "lag_max_seconds": max(behind) if behind else None,
+        "oldest_success_at": min(synced).isoformat() if synced else None,
+    }
+
+
+def fleet_report() -> Dict[str, Any]:
+    """Sync freshness of every linked account (all shards), plus this process's scheduler if it runs one."""
+    now = utcnow()
+    with read_engine.connect() as conn:
+        github = conn.execute(
+            select(platform_accounts.c.last_synced_at).where(platform_accounts.c.platform_name == "GitHub")
+        ).scalars().all()
+        notion_students = select(projects.c.student_id).where(projects.c.source_platform == "Notion").distinct().subquery()
+        notion = conn.execute(
+            select(sync_schedule.c.last_success_at)
+            .select_from(notion_students.outerjoin(
+                sync_schedule,
+                (sync_schedule.c.student_id == notion_students.c.student_id) & (sync_schedule.c.kind == NOTION_KIND),
+            ))
+        ).scalars().all()
+        schedule_rows = conn.execute(
+            select(sync_schedule.c.kind, sync_schedule.c.retry_after, sync_schedule.c.revoked)
+        ).all()
+
+    kinds = {
+        GITHUB_KIND: _kind_report(github, [row for row in schedule_rows if row.kind == GITHUB_KIND], now),
+        NOTION_KIND: _kind_report(notion, [row for row in schedule_rows if row.kind == NOTION_KIND], now),
+    }
+    accounts = sum(kind["accounts"] for kind in kinds.values())
+    due = sum(kind["due"] for kind in kinds.values())
+    fleet_target = SYNC_TARGET_PER_HOUR * SYNC_SHARD_COUNT
+    scheduler = current_scheduler()
+    return {
+        "interval_seconds": SYNC_INTERVAL.total_seconds(),
+        # Runs per hour needed to sync every account once per interval
+        "required_per_hour": round(accounts * 3600 / SYNC_INTERVAL.total_seconds(), 1),
+        "target_per_hour": fleet_target,
+        # At the target rate, how long the current backlog takes to clear
+        "catch_up_seconds": round(due * 3600 / fleet_target) if fleet_target else None,
+        "kinds": kinds,
+        "scheduler": scheduler.stats() if scheduler is not None else None,
+    }
+
+
+@router.get("/sync/status")
+def sync_status():
+    """How far behind scheduled resyncs are, per import kind."""
+    return fleet_report()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the scheduled resync of one shard of linked accounts.")
+    parser.add_argument("--shard", type=int, default=SYNC_SHARD_INDEX, help="This process's shard index")
+    parser.add_argument("--shards", type=int, default=SYNC_SHARD_COUNT, help="Total number of shards")
+    args = parser.parse_args(argv)
+
+    init_db()
+    scheduler = SyncScheduler(shard=args.shard, shards=args.shards)
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+import os
+from typing import Any, Dict, List, Sequence
+from sqlalchemy import Table, and_, select, update, insert, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Rows per executemany round trip
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "500"))
+
+
+def build_upsert_stmt(dialect_name: str, table: Table, key_columns: Sequence[str], update_columns: Sequence[str]):
+    """
+    Builds the dialect's native "insert or update" statement for `table`, or None
+    when the dialect has no native upsert. `key_columns` must be covered by a
+    unique constraint on the table.
+    """
+    if dialect_name == "mysql" or dialect_name == "mariadb":
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in update_columns})
+
+    if dialect_name in ("sqlite", "postgresql"):
+        stmt = (sqlite_insert if dialect_name == "sqlite" else postgresql_insert)(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: stmt.excluded[name] for name in update_columns},
+        )
+
+    return None
+
+
+def _upsert_fallback(conn, table: Table, rows: List[Dict[str, Any]], key_columns: Sequence[str], update_columns: Sequence[str]) -> None:
+    """SELECT the existing keys of a batch in one query, then UPDATE or INSERT each row."""
+    key_cols = [table.c[name] for name in key_columns]
+    keys = [tuple(row[name] for name in key_columns) for row in rows]
+    existing = {
+        tuple(found[:-1]): found[-1]
+        for found in conn.execute(select(*key_cols, table.c.id).where(tuple_(*key_cols).in_(keys)))
+    }
+
+    new_rows = []
+    for key, row in zip(keys, rows):
+        row_id = existing.get(key)
+        if row_id is None:
+            new_rows.append(row)
+        else:
+            conn.execute(update(table).where(table.c.id == row_id).values({name: row[name] for name in update_columns}))
+    if new_rows:
+        conn.execute(insert(table), new_rows)
+
+
+def upsert_rows(conn, table: Table, rows: List[Dict[str, Any]], key_columns: Sequence[str], update_columns: Sequence[str]) -> None:
+    """
+    Inserts `rows`, updating `update_columns` of rows whose `key_columns` already exist.
+
+    Uses MySQL's ON DUPLICATE KEY UPDATE or SQLite/PostgreSQL's ON CONFLICT DO UPDATE,
+    sent as batched executemany calls, so an import costs one round trip per batch
+    instead of a SELECT plus an UPDATE/INSERT per row.
+    """
+    if not rows:
+        return
+
+    stmt = build_upsert_stmt(conn.dialect.name, table, key_columns, update_columns)
+
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        if stmt is None:
+            _upsert_fallback(conn, table, batch, key_columns, update_columns)
+        else:
+            conn.execute(stmt, batch)
+
+
+def increment_row(conn, table: Table, key: Dict[str, Any], column: str) -> None:
+    """
+    Adds 1 to `column` of the row identified by `key` (covered by a unique constraint),
+    inserting it with 1 when it does not exist. A single statement on MySQL, SQLite and
+    PostgreSQL, so concurrent callers never both insert the starting value.
+    """
+    row = {**key, column: 1}
+    bumped = {column: table.c[column] + 1}
+    dialect_name = conn.dialect.name
+    if dialect_name == "mysql" or dialect_name == "mariadb":
+        conn.execute(mysql_insert(table).values(row).on_duplicate_key_update(bumped))
+    elif dialect_name in ("sqlite", "postgresql"):
+        stmt = (sqlite_insert if dialect_name == "sqlite" else postgresql_insert)(table).values(row)
+        conn.execute(stmt.on_conflict_do_update(index_elements=list(key), set_=bumped))
+    else:
+        matches = and_(*(table.c[name] == value for name, value in key.items()))
+        if not conn.execute(update(table).where(matches).values(bumped)).rowcount:
+            conn.execute(insert(table).values(row))
@@ -1,20 +1,41 @@
+import asyncio
+import hashlib
+import multiprocessing
 import os
+import threading
 import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Annotated, Any
+from typing import Annotated, Any, Callable, Dict, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from ..Integrations.metrics import observe_password_hash, password_hash_rejected_total
+from ..Integrations.ttl_cache import TTLCache
 
 # Configuration
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your_super_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# bcrypt is deliberately slow (a few hundred ms of CPU per call), so hashing and
+# verification run in a small process pool instead of on the event loop or the
+# request threadpool. 0 workers uses a single thread instead of processes.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Calls queued or running at once; beyond that, logins are refused with 503 instead of piling up
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", str(max(1, PASSWORD_HASH_WORKERS) * 8)))
+
+# Decoded access tokens, so repeated requests with the same token skip signature checks.
+# Entries never outlive the token's own exp.
+JWT_CACHE_SIZE = int(os.environ.get("JWT_CACHE_SIZE", "4096"))
+JWT_CACHE_TTL = float(os.environ.get("JWT_CACHE_TTL", "60"))
+
 # OAuth2PasswordBearer is used to handle the Bearer token scheme in the Authorization header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# For endpoints where only some requests need a login; they check for None themselves
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -29,6 +50,94 @@ def get_password_hash(password: str) -> str:
     """Hashes a password."""
     return pwd_context.hash(password)
 
+# --- Hashing pool ---
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = 0
+
+
+def _password_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if PASSWORD_HASH_WORKERS > 0:
+                # spawn, not fork: forking a threaded server can copy a lock some other thread holds
+                _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-hash")
+        return _pool
+
+
+def _timed(fn: Callable[..., Any], *args: Any):
+    # Runs in the pool; the duration lets the caller tell queue wait from hashing time
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+def submit_password_work(fn: Callable[..., Any], *args: Any) -> Future:
+    """
+    Queues fn(*args) (verify_password or get_password_hash) on the hashing pool and
+    returns a future of its result. Raises 503 when PASSWORD_HASH_MAX_PENDING calls
+    are already queued or running.
+    """
+    global _pending
+    with _pool_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            password_hash_rejected_total.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress; try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+
+    submitted = time.perf_counter()
+    result: Future = Future()
+
+    def finished(inner: Future) -> None:
+        global _pending
+        with _pool_lock:
+            _pending -= 1
+        try:
+            value, seconds = inner.result()
+        except BaseException as e:
+            result.set_exception(e)
+            return
+        observe_password_hash(fn.__name__, time.perf_counter() - submitted - seconds, seconds)
+        result.set_result(value)
+
+    try:
+        _password_pool().submit(_timed, fn, *args).add_done_callback(finished)
+    except BaseException:
+        with _pool_lock:
+            _pending -= 1
+        raise
+    return result
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool."""
+    return await asyncio.wrap_future(submit_password_work(verify_password, plain_password, hashed_password))
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing pool."""
+    return await asyncio.wrap_future(submit_password_work(get_password_hash, password))
+
+
+def password_pool_pending() -> int:
+    with _pool_lock:
+        return _pending
+
+
+def shutdown_password_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
 # --- JWT Token Functions ---
 
 def create_access_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
@@ -42,24 +151,56 @@ def create_access_token(data: dict[str, Any], expires_delta: timedelta | None =
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# --- Decoded token cache ---
+
+# sha256(token) -> username; keyed by digest so raw tokens are not kept in memory
+_decoded_tokens: TTLCache[str] = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL)
+_jwt_stats = {"hits": 0, "misses": 0}
+_jwt_stats_lock = threading.Lock()
+
+
+def _count_jwt(event: str) -> None:
+    with _jwt_stats_lock:
+        _jwt_stats[event] += 1
+
+
+def jwt_cache_stats() -> Dict[str, int]:
+    with _jwt_stats_lock:
+        return dict(_jwt_stats)
+
+
+def _remember_token(digest: str, username: str, exp: Optional[float]) -> None:
+    ttl = JWT_CACHE_TTL if exp is None else min(JWT_CACHE_TTL, float(exp) - time.time())
+    if ttl > 0:
+        _decoded_tokens.set(digest, username, ttl)
+
 # --- Dependency to get current user ---
 
 def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     """
     Dependency that returns the current user from a JWT token.
     Raises an HTTPException if the token is invalid or expired.
+    Tokens verified in the last JWT_CACHE_TTL seconds (and not yet expired) are not verified again.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    username = _decoded_tokens.get(digest)
+    if username is not None:
+        _count_jwt("hits")
+        return username
+    _count_jwt("misses")
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
         # You can add more checks here, like if the user is active, etc.
+        _remember_token(digest, username, payload.get("exp"))
         return username
     except JWTError:
         raise credentials_exception
@@ -1,13 +1,26 @@
 #------------------------------
 # for autentication
-from fastapi import FastAPI, Depends, HTTPException, status, Form
+import asyncio
+import os
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
-from .auth.security import get_current_user, verify_password, get_password_hash, create_access_token
-from .Integrations.github_integration import router as github_router
-from .Integrations.Notion_integration import router as Notion_router
-from .Integrations.models import metadata
-from .Integrations.db import engine
+from .auth.security import (
+    get_current_user, verify_password_async, get_password_hash, submit_password_work, shutdown_password_pool, create_access_token,
+)
+from .Integrations.jobs import router as jobs_router
+from .Integrations.sync_scheduler import router as sync_router, start_scheduler, stop_scheduler
+from .Integrations.search import router as search_router
+from .Integrations.skills import router as skills_router
+from .Integrations.content_store import router as content_router
+from .Integrations.metrics import observe_request, render_metrics
+from .Integrations.db import init_db, dispose_engines
+# Imported last so each integration's reported import time is its own
+from .Integrations.registry import load_routers
 #----------------------------
 
 #----------------------------
@@ -15,21 +28,95 @@ from .Integrations.db import engine
 from .scripts.test1 import test1 as test1_script
 #----------------------------
 
-import os
-
 #----------------------------
-# Dummy user store for example purposes
+# Dummy user store for example purposes. Hashes are computed on the hashing pool
+# when the app starts (or on first login), not at import: see seed_fake_users()
 fake_users_db = {
     "johndoe": {
         "username": "johndoe",
-        "hashed_password": get_password_hash("secret"),
+        "hashed_password": None,
     }
 }
+_fake_user_passwords = {"johndoe": "secret"}
+# username -> future of its password hash, while it is being computed
+_seeding: dict = {}
+
+
+def seed_fake_users() -> None:
+    """Starts hashing the dummy users' passwords in the background; idempotent."""
+    for username, password in _fake_user_passwords.items():
+        if fake_users_db[username]["hashed_password"] is None and username not in _seeding:
+            _seeding[username] = submit_password_work(get_password_hash, password)
+
+
+async def _hashed_password(username: str):
+    seed_fake_users()
+    pending: Future = _seeding.get(username)
+    if pending is not None:
+        try:
+            fake_users_db[username]["hashed_password"] = await asyncio.wrap_future(pending)
+        finally:
+            # On failure the next login starts a new hash
+            _seeding.pop(username, None)
+    return fake_users_db[username]["hashed_password"]
 #----------------------------
 
-app = FastAPI();
-app.include_router(github_router,prefix="/api", tags=["GitHub"])
-app.include_router(Notion_router,prefix="/api",tags=["Notion"])
+# Schema setup runs when each worker starts serving, not when the module is imported
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    seed_fake_users()
+    start_scheduler()
+    yield
+    stop_scheduler()
+    shutdown_password_pool()
+    await dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan);
+
+
+def route_template(request: Request) -> str:
+    """The matched route's path template with its router prefix, e.g. /api/projects/{project_id}/content."""
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    template = getattr(route, "path_format", route.path)
+    # Included routers may report their routes without the prefix; recover it from the request path
+    try:
+        rendered = template.format(**request.path_params)
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = request.scope["path"]
+    return path[:len(path) - len(rendered)] + template if path.endswith(rendered) else template
+
+
+# Per-route latency for /metrics; labelled by route template so ids and tokens don't explode the series
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        observe_request(request.method, route_template(request), status_code, time.perf_counter() - started)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text-format metrics of this process."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# GitHub/Notion routes of the integrations enabled in ENABLED_INTEGRATIONS
+for integration_router, tag in load_routers():
+    app.include_router(integration_router,prefix="/api",tags=[tag])
+app.include_router(jobs_router,prefix="/api",tags=["Jobs"])
+app.include_router(sync_router,prefix="/api",tags=["Sync"])
+app.include_router(search_router,prefix="/api",tags=["Search"])
+app.include_router(skills_router,prefix="/api",tags=["Skills"])
+app.include_router(content_router,prefix="/api",tags=["Projects"])
 # Simple home endpoint to verify service is running
 @app.get("/")
 def hello_world():
@@ -42,9 +129,9 @@ def test1():
 
 
 @app.post("/token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     print(form_data)
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,10 +152,10 @@ def validate_token(user: str = Depends(get_current_user)):
 
 # test jwt token
 
-def authenticate_user(username: str, password: str):
+async def authenticate_user(username: str, password: str):
+    # bcrypt runs on the hashing pool, so a burst of logins never blocks the event loop
     user = fake_users_db.get(username)
-    if not user or not verify_password(password, user["hashed_password"]):
+    if not user or not await verify_password_async(password, await _hashed_password(username)):
         return None
-    #return userdocker network create shared_network
-
-metadata.create_all(bind=engine)
\ No newline at end of file
+    return user
+    #docker network create shared_network
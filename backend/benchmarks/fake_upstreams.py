@@ -0,0 +1,290 @@
+"""
+Local stand-ins for the GitHub REST/GraphQL and Notion APIs, serving a synthetic
+account with a configurable number of repositories and pages.
+
+Both run on one ThreadingHTTPServer on 127.0.0.1. Point the app at it with
+GITHUB_API_URL=<url>/github and NOTION_BASE_URL=<url>/notion.
+"""
+import base64
+import json
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+LANGUAGES = ["Python", "TypeScript", "Go", "Rust", "Java", "C++"]
+KEYWORDS = ["Docker", "React", "PostgreSQL", "FastAPI", "Kubernetes", "Redis", "machine learning"]
+EDITED_AT = "2024-01-01T00:00:00.000Z"
+
+
+@dataclass
+class FakeConfig:
+    repos: int = 250
+    pages: int = 100
+    # Paragraphs per README / Notion page (sets body size)
+    paragraphs: int = 12
+    # Added to every response
+    latency_ms: float = 0.0
+    # Answer every Nth request with 429 + Retry-After (0 disables)
+    rate_limit_every: int = 0
+    # Whole seconds, as both upstreams send it
+    retry_after: int = 0
+    # GitHub tokens answered with 401 Bad credentials
+    revoked_tokens: Tuple[str, ...] = ()
+
+
+def _paragraph(i: int, n: int) -> str:
+    return (
+        f"Section {n} of project {i}. Built with {LANGUAGES[(i + n) % len(LANGUAGES)]} "
+        f"and {KEYWORDS[(i + n) % len(KEYWORDS)]}; see the docs for setup and deployment notes."
+    )
+
+
+def readme_text(i: int, paragraphs: int) -> str:
+    return f"# repo{i}\n\n" + "\n\n".join(_paragraph(i, n) for n in range(paragraphs))
+
+
+def rest_repo(i: int) -> Dict[str, Any]:
+    return {
+        "id": 100000 + i,
+        "name": f"repo{i}",
+        "full_name": f"bench/repo{i}",
+        "owner": {"login": "bench", "id": 1},
+        "description": f"Synthetic repository {i}",
+        "language": LANGUAGES[i % len(LANGUAGES)],
+        "pushed_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-01T00:00:00Z",
+    }
+
+
+def graphql_repo(i: int, paragraphs: int) -> Dict[str, Any]:
+    repo = rest_repo(i)
+    return {
+        "databaseId": repo["id"],
+        "name": repo["name"],
+        "description": repo["description"],
+        "pushedAt": repo["pushed_at"],
+        "updatedAt": repo["updated_at"],
+        "owner": {"login": "bench"},
+        "primaryLanguage": {"name": repo["language"]},
+        "languages": {"edges": [
+            {"size": 5000, "node": {"name": repo["language"]}},
+            {"size": 800, "node": {"name": "Shell"}},
+        ]},
+        "readmeMd": {"text": readme_text(i, paragraphs)},
+        "readmeLowerMd": None,
+        "readmeRst": None,
+        "readmePlain": None,
+    }
+
+
+def notion_page(i: int) -> Dict[str, Any]:
+    # A standalone page: its title property is named "title" and holds a rich-text array
+    return {
+        "object": "page",
+        "id": f"page-{i:06d}",
+        "last_edited_time": EDITED_AT,
+        "properties": {
+            "title": {"id": "title", "type": "title", "title": [{"type": "text", "plain_text": f"Notes {i}"}]},
+        },
+    }
+
+
+def notion_blocks(page_id: str, paragraphs: int) -> List[Dict[str, Any]]:
+    i = int(page_id.rsplit("-", 1)[-1])
+    blocks = [{
+        "object": "block", "id": f"{page_id}-h", "type": "heading_1", "has_children": False,
+        "heading_1": {"rich_text": [{"plain_text": f"Notes {i}"}]},
+    }]
+    for n in range(paragraphs):
+        blocks.append({
+            "object": "block", "id": f"{page_id}-p{n}", "type": "paragraph", "has_children": False,
+            "paragraph": {"rich_text": [{"plain_text": _paragraph(i, n)}]},
+        })
+    return blocks
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeUpstreams"
+
+    def log_message(self, *args):
+        pass
+
+    # --- plumbing ---
+    def _send(self, status: int, body: Any = None, headers: Optional[Dict[str, str]] = None, raw: Optional[bytes] = None):
+        payload = raw if raw is not None else (b"" if body is None else json.dumps(body).encode())
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if raw is None and body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _begin(self, endpoint: str) -> bool:
+        """Counts the call, applies latency and 429 injection. False when a 429 was sent."""
+        upstreams = self.server
+        config = upstreams.config
+        with upstreams.lock:
+            upstreams.calls[endpoint] += 1
+            upstreams.total += 1
+            throttle = config.rate_limit_every and upstreams.total % config.rate_limit_every == 0
+            if throttle:
+                upstreams.calls["429"] += 1
+        if config.latency_ms:
+            time.sleep(config.latency_ms / 1000)
+        if endpoint.startswith("github."):
+            token = (self.headers.get("Authorization") or "").split(" ")[-1]
+            if not token or token in config.revoked_tokens:
+                self._send(401, {"message": "Bad credentials"})
+                return False
+        if throttle:
+            # Each in its upstream's error shape: the Notion SDK only retries code == "rate_limited"
+            if endpoint.startswith("notion."):
+                body = {"object": "error", "status": 429, "code": "rate_limited", "message": "Rate limited"}
+            else:
+                body = {"message": "API rate limit exceeded"}
+            self._send(429, body, {"Retry-After": str(config.retry_after)})
+            return False
+        return True
+
+    def _json_body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    # --- routes ---
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        config = self.server.config
+
+        if url.path == "/github/user":
+            if self._begin("github.user"):
+                self._send(200, {"id": 1, "login": "bench", "name": "Bench Mark"})
+            return
+
+        if url.path == "/github/user/repos":
+            if not self._begin("github.repos"):
+                return
+            per_page = int(query.get("per_page", ["30"])[0])
+            page = int(query.get("page", ["1"])[0])
+            etag = f'"repos-{page}-{per_page}-{config.repos}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, headers={"ETag": etag})
+                return
+            items = [rest_repo(i) for i in range((page - 1) * per_page, min(page * per_page, config.repos))]
+            headers = {"ETag": etag}
+            if page * per_page < config.repos:
+                next_url = f"{self.server.url}/github/user/repos?per_page={per_page}&page={page + 1}"
+                headers["Link"] = f'<{next_url}>; rel="next"'
+            self._send(200, items, headers)
+            return
+
+        match = re.fullmatch(r"/github/repositories/(\d+)", url.path)
+        if match:
+            if not self._begin("github.repository"):
+                return
+            index = int(match.group(1)) - 100000
+            if 0 <= index < config.repos:
+                self._send(200, rest_repo(index))
+            else:
+                self._send(404, {"message": "Not Found"})
+            return
+
+        match = re.fullmatch(r"/github/repos/bench/repo(\d+)/readme", url.path)
+        if match:
+            if not self._begin("github.readme"):
+                return
+            etag = f'"readme-{match.group(1)}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, headers={"ETag": etag})
+                return
+            text = readme_text(int(match.group(1)), config.paragraphs)
+            if "raw" in (self.headers.get("Accept") or ""):
+                self._send(200, headers={"ETag": etag, "Content-Type": "text/plain"}, raw=text.encode())
+            else:
+                self._send(200, {"content": base64.b64encode(text.encode()).decode(), "encoding": "base64"}, {"ETag": etag})
+            return
+
+        match = re.fullmatch(r"/notion/v1/blocks/([^/]+)/children", url.path)
+        if match:
+            if self._begin("notion.blocks"):
+                self._send(200, {
+                    "object": "list", "results": notion_blocks(match.group(1), config.paragraphs),
+                    "has_more": False, "next_cursor": None,
+                })
+            return
+
+        match = re.fullmatch(r"/notion/v1/pages/([^/]+)", url.path)
+        if match:
+            if self._begin("notion.pages"):
+                self._send(200, notion_page(int(match.group(1).rsplit("-", 1)[-1])))
+            return
+
+        self._send(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        config = self.server.config
+
+        if url.path == "/github/graphql":
+            if not self._begin("github.graphql"):
+                return
+            cursor = self._json_body().get("variables", {}).get("cursor")
+            start = int(cursor) if cursor else 0
+            end = min(start + 100, config.repos)
+            self._send(200, {"data": {"viewer": {"repositories": {
+                "pageInfo": {"hasNextPage": end < config.repos, "endCursor": str(end)},
+                "nodes": [graphql_repo(i, config.paragraphs) for i in range(start, end)],
+            }}}})
+            return
+
+        if url.path == "/notion/v1/search":
+            if not self._begin("notion.search"):
+                return
+            body = self._json_body()
+            start = int(body.get("start_cursor") or 0)
+            end = min(start + int(body.get("page_size") or 100), config.pages)
+            self._send(200, {
+                "object": "list",
+                "results": [notion_page(i) for i in range(start, end)],
+                "has_more": end < config.pages,
+                "next_cursor": str(end) if end < config.pages else None,
+            })
+            return
+
+        self._send(404, {"message": "Not Found"})
+
+
+class FakeUpstreams(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: FakeConfig):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.config = config
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.total = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self) -> "FakeUpstreams":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True, name="fake-upstreams")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.calls)
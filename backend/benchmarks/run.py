@@ -0,0 +1,232 @@
+"""
+Offline benchmark: runs the app in-process against the local GitHub/Notion
+stand-ins in fake_upstreams.py and prints (or writes) the results as JSON.
+
+    cd backend
+    python -m benchmarks.run --repos 500 --pages 200 --latency-ms 20 --output bench.json
+
+Nothing here talks to the real APIs or to DATABASE_URL: every run uses a fresh
+SQLite database and HTTP cache in a temporary directory.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+from .fake_upstreams import FakeConfig, FakeUpstreams
+
+BENCH_TOKEN = "bench-token"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile, in milliseconds rounded to 0.01."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[index] * 1000, 2)
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "requests": len(samples),
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+    }
+
+
+class StatementCounter:
+    """Counts SQL statements per operation on the given engines while active."""
+
+    def __init__(self, *engines):
+        from sqlalchemy import event
+        from app.Integrations.metrics import _sql_operation
+
+        self.counts: Counter = Counter()
+        self._operation = _sql_operation
+        # The same engine may be passed twice (e.g. no read replica); listen once
+        for engine in {id(engine): engine for engine in engines}.values():
+            event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.counts[self._operation(statement)] += 1
+
+    def take(self) -> Dict[str, int]:
+        counts = dict(self.counts)
+        self.counts.clear()
+        return {"total": sum(counts.values()), **dict(sorted(counts.items()))}
+
+
+def configure_environment(args, upstreams: FakeUpstreams, workdir: str) -> None:
+    # Must run before anything under app/ is imported: settings are read at import time
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "HTTP_CACHE_PATH": os.path.join(workdir, "http_cache.db"),
+        "GITHUB_API_URL": f"{upstreams.url}/github",
+        "NOTION_BASE_URL": f"{upstreams.url}/notion",
+        "NOTION_TOKEN": "bench-notion-token",
+        "GITHUB_INGEST_MODE": args.mode,
+        "HTTP_TOKEN_RATE": str(args.token_rate),
+        "HTTP_TOKEN_BURST": str(args.token_rate),
+        "HTTP_BACKOFF_BASE": "0",
+        "INTEGRATIONS_ASYNC": "1" if args.use_async else "0",
+    })
+
+
+def seed_student() -> int:
+    from sqlalchemy import insert
+    from app.Integrations.accounts import token_digest
+    from app.Integrations.db import engine
+    from app.Integrations.models import platform_accounts, students
+
+    with engine.begin() as conn:
+        student_id = conn.execute(
+            insert(students).values(name="Bench", surname="Mark", email="bench@example.com")
+        ).inserted_primary_key[0]
+        conn.execute(insert(platform_accounts).values(
+            student_id=student_id, platform_name="GitHub", access_token=BENCH_TOKEN,
+            token_digest=token_digest(BENCH_TOKEN), platform_user_id="1",
+        ))
+    return student_id
+
+
+def measure_import(client, path: str, items: int, statements: StatementCounter, upstreams: FakeUpstreams) -> Dict[str, Any]:
+    calls_before = upstreams.snapshot()
+    started = time.perf_counter()
+    response = client.get(path, params={"access_token": BENCH_TOKEN})
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} failed with {response.status_code}: {response.text}")
+    calls_after = upstreams.snapshot()
+    return {
+        "items": items,
+        "seconds": round(elapsed, 4),
+        "items_per_second": round(items / elapsed, 1) if elapsed else None,
+        "db_statements": statements.take(),
+        "upstream_calls": {name: calls_after[name] - calls_before.get(name, 0) for name in sorted(calls_after)
+                           if calls_after[name] != calls_before.get(name, 0)},
+    }
+
+
+def measure_latency(call: Callable[[], Any], requests: int, statements: StatementCounter, warmup: int = 3) -> Dict[str, Any]:
+    for _ in range(warmup):
+        call()
+    statements.take()
+    samples, statuses = [], Counter()
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = call()
+        samples.append(time.perf_counter() - started)
+        if response.status_code >= 500:
+            raise RuntimeError(f"Request failed with {response.status_code}: {response.text}")
+        statuses[str(response.status_code)] += 1
+    db = statements.take()
+    return {
+        **latency_summary(samples),
+        "status_codes": dict(statuses),
+        "db_statements_per_request": round(db["total"] / requests, 2),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    config = FakeConfig(
+        repos=args.repos, pages=args.pages, paragraphs=args.paragraphs,
+        latency_ms=args.latency_ms, rate_limit_every=args.rate_limit_every,
+    )
+    upstreams = FakeUpstreams(config).start()
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    configure_environment(args, upstreams, workdir)
+
+    from fastapi.testclient import TestClient
+    from app.Integrations.db import engine, get_async_engine, get_async_read_engine, read_engine
+    from app.Integrations.response_cache import invalidate_student
+    from app.main import app
+
+    # The async routes run their SQL on the async engines, whose statements go through their sync_engine
+    engines = [engine, read_engine]
+    if args.use_async:
+        engines += [get_async_engine().sync_engine, get_async_read_engine().sync_engine]
+    statements = StatementCounter(*engines)
+    results: Dict[str, Any] = {}
+    try:
+        with TestClient(app) as client:
+            statements.take()  # schema setup
+            student_id = seed_student()
+            statements.take()
+
+            # Imports: the first run writes everything, the resync should be (mostly) no-ops
+            results["import_github_repos"] = measure_import(client, "/api/github/repos", args.repos, statements, upstreams)
+            results["resync_github_repos"] = measure_import(client, "/api/github/repos", args.repos, statements, upstreams)
+            results["import_notion_pages"] = measure_import(client, "/api/notion/load_pages", args.pages, statements, upstreams)
+            results["resync_notion_pages"] = measure_import(client, "/api/notion/load_pages", args.pages, statements, upstreams)
+
+            projects_url = "/api/github/projects"
+            params = {"access_token": BENCH_TOKEN}
+            etag = client.get(projects_url, params=params).headers.get("etag")
+            results["github_projects"] = measure_latency(
+                lambda: client.get(projects_url, params=params), args.requests, statements)
+            # Same request with the response cache dropped first, i.e. the query + encode path
+            results["github_projects_uncached"] = measure_latency(
+                lambda: (invalidate_student(student_id), client.get(projects_url, params=params))[1],
+                args.requests, statements)
+            results["github_projects_page"] = measure_latency(
+                lambda: client.get(projects_url, params={**params, "limit": 100, "fields": "id,title,source_platform"}),
+                args.requests, statements)
+            results["github_projects_not_modified"] = measure_latency(
+                lambda: client.get(projects_url, params=params, headers={"If-None-Match": etag}), args.requests, statements)
+            results["token"] = measure_latency(
+                lambda: client.post("/token", data={"username": "johndoe", "password": "secret"}),
+                args.token_requests, statements)
+    finally:
+        upstreams.stop()
+
+    return {
+        "benchmark": "integrations",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "repos": args.repos, "pages": args.pages, "paragraphs": args.paragraphs,
+            "latency_ms": args.latency_ms, "rate_limit_every": args.rate_limit_every,
+            "mode": args.mode, "async": args.use_async, "requests": args.requests,
+        },
+        "upstream_calls": upstreams.snapshot(),
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark imports and read endpoints against local GitHub/Notion stand-ins.")
+    parser.add_argument("--repos", type=int, default=250, help="Synthetic GitHub repositories")
+    parser.add_argument("--pages", type=int, default=100, help="Synthetic Notion pages")
+    parser.add_argument("--paragraphs", type=int, default=12, help="Paragraphs per README / page")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every upstream response")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth upstream call with 429")
+    parser.add_argument("--mode", choices=("rest", "graphql"), default="rest", help="GitHub ingest mode")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Serve the async integration routes")
+    parser.add_argument("--requests", type=int, default=200, help="Samples per read endpoint")
+    parser.add_argument("--token-requests", type=int, default=20, help="Samples for /token (bcrypt is slow)")
+    parser.add_argument("--token-rate", type=float, default=10000, help="Outbound requests/s allowed per token")
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())